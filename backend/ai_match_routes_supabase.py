@@ -11,7 +11,7 @@ import uuid
 import json
 import random
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
 
 router = APIRouter(prefix="/ai-match", tags=["AI Match"])
 
@@ -155,13 +155,13 @@ class AIMatchingService:
         supabase = get_supabase_admin()
         
         # Get job details
-        job_result = supabase.table('jobs').select('*').eq('id', job_id).execute()
+        job_result = await run_query(supabase.table('jobs').select('*').eq('id', job_id))
         if not job_result.data:
             return None
         job = job_result.data[0]
         
         # Get worker profile
-        worker_result = supabase.table('worker_profiles').select('*').eq('user_id', talent_id).execute()
+        worker_result = await run_query(supabase.table('worker_profiles').select('*').eq('user_id', talent_id))
         worker = worker_result.data[0] if worker_result.data else {}
         
         # Calculate match scores
@@ -216,7 +216,7 @@ class AIMatchingService:
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table('ai_matches').insert(match_data).execute()
+        result = await run_query(supabase.table('ai_matches').insert(match_data))
         return result.data[0] if result.data else None
 
 # ============================================================================
@@ -243,7 +243,7 @@ async def get_ai_matches(
         if status:
             query = query.eq('status', status)
         
-        result = query.order('created_at', desc=True).limit(limit).execute()
+        result = await run_query(query.order('created_at', desc=True).limit(limit))
         
         matches = result.data if result.data else []
         
@@ -276,7 +276,7 @@ async def get_quickhire_matches(
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('ai_matches').select('*').eq('talent_id', talent_id).eq('is_quickhire', True).eq('status', 'pending').order('urgency', desc=True).order('created_at', desc=True).limit(limit).execute()
+        result = await run_query(supabase.table('ai_matches').select('*').eq('talent_id', talent_id).eq('is_quickhire', True).eq('status', 'pending').order('urgency', desc=True).order('created_at', desc=True).limit(limit))
         
         matches = result.data if result.data else []
         
@@ -302,7 +302,7 @@ async def get_match_details(match_id: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('ai_matches').select('*').eq('id', match_id).execute()
+        result = await run_query(supabase.table('ai_matches').select('*').eq('id', match_id))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="Match not found")
@@ -321,11 +321,11 @@ async def get_match_details(match_id: str):
         
         # Get job details
         if match.get('job_id'):
-            job_result = supabase.table('jobs').select('*').eq('id', match['job_id']).execute()
+            job_result = await run_query(supabase.table('jobs').select('*').eq('id', match['job_id']))
             match['job_details'] = job_result.data[0] if job_result.data else None
         
         # Get talent details
-        talent_result = supabase.table('users').select('id, name, email').eq('id', match['talent_id']).execute()
+        talent_result = await run_query(supabase.table('users').select('id, name, email').eq('id', match['talent_id']))
         match['talent_details'] = talent_result.data[0] if talent_result.data else None
         
         return {
@@ -345,7 +345,7 @@ async def apply_to_match(match_id: str, request: ApplyToMatchRequest):
         supabase = get_supabase_admin()
         
         # Get match
-        match_result = supabase.table('ai_matches').select('*').eq('id', match_id).execute()
+        match_result = await run_query(supabase.table('ai_matches').select('*').eq('id', match_id))
         
         if not match_result.data or len(match_result.data) == 0:
             raise HTTPException(status_code=404, detail="Match not found")
@@ -364,13 +364,13 @@ async def apply_to_match(match_id: str, request: ApplyToMatchRequest):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        supabase.table('applications').insert(application_data).execute()
+        await run_query(supabase.table('applications').insert(application_data))
         
         # Update match status
-        supabase.table('ai_matches').update({
+        await run_query(supabase.table('ai_matches').update({
             "status": "applied",
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq('id', match_id).execute()
+        }).eq('id', match_id))
         
         return {
             "success": True,
@@ -390,7 +390,7 @@ async def get_match_stats(user_id: str = Query(...)):
         supabase = get_supabase_admin()
         
         # Get all matches for user (as talent)
-        matches_result = supabase.table('ai_matches').select('*').eq('talent_id', user_id).execute()
+        matches_result = await run_query(supabase.table('ai_matches').select('*').eq('talent_id', user_id))
         
         matches = matches_result.data if matches_result.data else []
         
@@ -1,10 +1,16 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-import os
+import asyncio
 import json
-import uuid
+
+from llm_cache import stream_json_events
+from llm_gateway import send_prompt
+from match_scoring import (
+    MATCH_CACHE_TTL_SECONDS, match_score_cache, match_cache_key,
+    shortlist, local_match_data, chunk_by_tokens
+)
 
 router = APIRouter(prefix="/api/ai-matching", tags=["AI Matching"])
 
@@ -14,6 +20,12 @@ class MatchRequest(BaseModel):
     gig_details: dict
     worker_profile: dict
 
+class BatchMatchRequest(BaseModel):
+    worker_id: str
+    worker_profile: dict
+    gigs: List[dict] = Field(..., min_length=1, max_length=2000)
+    shortlist_size: int = Field(30, ge=1, le=200)
+
 class SuggestGigsRequest(BaseModel):
     worker_id: str
     worker_profile: dict
@@ -24,14 +36,7 @@ class ForecastRequest(BaseModel):
     category: str
     date: str
 
-@router.post("/calculate-match")
-async def calculate_ai_match(request: MatchRequest):
-    """Use AI to calculate match score and provide insights"""
-    try:
-        session_id = str(uuid.uuid4())
-        api_key = os.getenv('EMERGENT_LLM_KEY')
-        
-        system_message = """You are an expert job-matching AI for Hapployed, a gig marketplace.
+MATCH_SYSTEM_MESSAGE = """You are an expert job-matching AI for Hapployed, a gig marketplace.
         Analyze the gig requirements and worker profile to provide a detailed match assessment.
         
         Consider:
@@ -52,12 +57,90 @@ async def calculate_ai_match(request: MatchRequest):
             "key_insights": ["insight1", "insight2"]
         }
         """
+
+BATCH_MATCH_SYSTEM_MESSAGE = """You are an expert job-matching AI for Hapployed, a gig marketplace.
+        Score EVERY listed gig against the one worker profile.
+        
+        Consider:
+        - Skills match
+        - Location preferences
+        - Availability alignment
+        - Experience level
+        - Past performance
+        
+        Respond in JSON format, one entry per gig, using each gig_id exactly as given:
+        {
+            "matches": [
+                {
+                    "gig_id": "123",
+                    "match_score": 85,  // 0-100
+                    "confidence": "high",  // high, medium, low
+                    "strengths": ["skill1"],
+                    "concerns": ["concern1"],
+                    "recommendation": "Strong match! This worker has...",
+                    "key_insights": ["insight1"]
+                }
+            ]
+        }
+        """
+
+FALLBACK_MATCH_DATA = {
+    "match_score": 75,
+    "confidence": "medium",
+    "strengths": ["Available", "In area"],
+    "concerns": [],
+    "recommendation": "Good match based on basic criteria",
+    "key_insights": ["Worker is available now"]
+}
+
+def worker_profile_summary(worker_profile: dict) -> str:
+    return f"""
+        WORKER PROFILE:
+        - Skills: {worker_profile.get('skills', [])}
+        - Experience Level: {worker_profile.get('experience')}
+        - Preferred Areas: {worker_profile.get('preferred_areas', [])}
+        - Preferred Days: {worker_profile.get('preferred_days', [])}
+        - Rating: {worker_profile.get('rating', 0)}
+        - Completed Gigs: {worker_profile.get('completed_gigs', 0)}
+        - Available Now: {worker_profile.get('available_now', False)}
+        """
+
+def gig_summary(gig_id: str, gig: dict) -> str:
+    """One compact line per gig for batch prompts"""
+    return json.dumps({
+        "gig_id": gig_id,
+        "title": gig.get('title'),
+        "category": gig.get('category'),
+        "location": gig.get('location'),
+        "budget": gig.get('budget'),
+        "urgent": gig.get('urgent', False),
+        "requirements": gig.get('requirements', [])
+    }, default=str)
+
+async def score_match_chunk(worker_profile: dict, chunk: list) -> dict:
+    """LLM match_data for one chunk of (gig_id, gig, ...) entries, keyed by gig_id"""
+    gig_lines = "\n".join(gig_summary(entry[0], entry[1]) for entry in chunk)
+    prompt = f"""{worker_profile_summary(worker_profile)}
+        GIGS (one JSON object per line):
+{gig_lines}
         
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
+        Score all {len(chunk)} gigs.
+        """
+    response = await send_prompt(BATCH_MATCH_SYSTEM_MESSAGE, prompt)
+    matches = json.loads(response).get('matches', [])
+    return {str(match.pop('gig_id', '')): match for match in matches if isinstance(match, dict)}
+
+@router.post("/calculate-match")
+async def calculate_ai_match(request: MatchRequest):
+    """Use AI to calculate match score and provide insights (cached per gig and profile version)"""
+    try:
+        cache_key = match_cache_key(request.gig_id, request.gig_details, request.worker_id, request.worker_profile)
+        cached = await match_score_cache.get(cache_key)
+        if cached is not None:
+            return {
+                "success": True,
+                "match_data": json.loads(cached)
+            }
         
         prompt = f"""
         GIG DETAILS:
@@ -67,23 +150,14 @@ async def calculate_ai_match(request: MatchRequest):
         - Budget: {request.gig_details.get('budget')}
         - Urgency: {request.gig_details.get('urgent', False)}
         - Requirements: {request.gig_details.get('requirements', [])}
-        
-        WORKER PROFILE:
-        - Skills: {request.worker_profile.get('skills', [])}
-        - Experience Level: {request.worker_profile.get('experience')}
-        - Preferred Areas: {request.worker_profile.get('preferred_areas', [])}
-        - Preferred Days: {request.worker_profile.get('preferred_days', [])}
-        - Rating: {request.worker_profile.get('rating', 0)}
-        - Completed Gigs: {request.worker_profile.get('completed_gigs', 0)}
-        - Available Now: {request.worker_profile.get('available_now', False)}
-        
+        {worker_profile_summary(request.worker_profile)}
         Provide detailed match analysis.
         """
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        response = await send_prompt(MATCH_SYSTEM_MESSAGE, prompt)
         
         match_data = json.loads(response)
+        await match_score_cache.set(cache_key, json.dumps(match_data), MATCH_CACHE_TTL_SECONDS)
         
         return {
             "success": True,
@@ -94,24 +168,67 @@ async def calculate_ai_match(request: MatchRequest):
         # Fallback to basic scoring
         return {
             "success": True,
-            "match_data": {
-                "match_score": 75,
-                "confidence": "medium",
-                "strengths": ["Available", "In area"],
-                "concerns": [],
-                "recommendation": "Good match based on basic criteria",
-                "key_insights": ["Worker is available now"]
-            }
+            "match_data": dict(FALLBACK_MATCH_DATA)
         }
 
-@router.post("/suggest-gigs")
-async def suggest_gigs_for_worker(request: SuggestGigsRequest):
-    """AI suggests best gigs for a worker"""
+@router.post("/calculate-match/batch")
+async def calculate_ai_match_batch(request: BatchMatchRequest):
+    """
+    Score one worker against many gigs: a local pre-ranker shortlists the best
+    candidates, cached results are reused per (gig version, profile version), and
+    the rest are scored several gigs per LLM prompt, chunks running concurrently.
+    Gigs the LLM does not score fall back to the pre-rank estimate.
+    """
     try:
-        session_id = str(uuid.uuid4())
-        api_key = os.getenv('EMERGENT_LLM_KEY')
+        candidates = [
+            {**gig, "_gig_id": str(gig.get('id') or gig.get('gig_id') or index)}
+            for index, gig in enumerate(request.gigs)
+        ]
+        shortlisted = shortlist(candidates, request.worker_profile, request.shortlist_size)
+        
+        matches = []
+        pending = []
+        for gig, prescore in shortlisted:
+            gig_id = gig.pop('_gig_id')
+            cache_key = match_cache_key(gig_id, gig, request.worker_id, request.worker_profile)
+            cached = await match_score_cache.get(cache_key)
+            if cached is not None:
+                matches.append({"gig_id": gig_id, "prescore": prescore, "source": "cache", "match_data": json.loads(cached)})
+            else:
+                pending.append((gig_id, gig, prescore, cache_key))
+        
+        chunks = chunk_by_tokens(pending, lambda entry: gig_summary(entry[0], entry[1]))
+        chunk_results = await asyncio.gather(
+            *(score_match_chunk(request.worker_profile, chunk) for chunk in chunks),
+            return_exceptions=True
+        )
         
-        system_message = """You are a career advisor AI for gig workers.
+        for chunk, scored in zip(chunks, chunk_results):
+            if isinstance(scored, BaseException):
+                print(f"Error in batch AI matching: {scored}")
+                scored = {}
+            for gig_id, gig, prescore, cache_key in chunk:
+                match_data = scored.get(gig_id)
+                if match_data and 'match_score' in match_data:
+                    await match_score_cache.set(cache_key, json.dumps(match_data), MATCH_CACHE_TTL_SECONDS)
+                    matches.append({"gig_id": gig_id, "prescore": prescore, "source": "llm", "match_data": match_data})
+                else:
+                    matches.append({"gig_id": gig_id, "prescore": prescore, "source": "local", "match_data": local_match_data(prescore)})
+        
+        matches.sort(key=lambda match: match['match_data'].get('match_score', 0), reverse=True)
+        
+        return {
+            "success": True,
+            "worker_id": request.worker_id,
+            "matches": matches,
+            "total_gigs": len(request.gigs),
+            "shortlisted": len(shortlisted),
+            "llm_calls": len(chunks)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to score matches: {str(e)}")
+
+SUGGEST_GIGS_SYSTEM_MESSAGE = """You are a career advisor AI for gig workers.
         Analyze available gigs and recommend the best matches for the worker.
         
         Prioritize:
@@ -133,25 +250,40 @@ async def suggest_gigs_for_worker(request: SuggestGigsRequest):
             "career_advice": "Consider taking more commercial gigs to increase your rate"
         }
         """
-        
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
-        prompt = f"""
+
+# Gigs sent to the LLM for suggestions, best pre-ranked first
+SUGGEST_GIGS_SHORTLIST = 10
+
+def suggest_gigs_prompt(request: SuggestGigsRequest) -> str:
+    gigs = [gig for gig, _ in shortlist(request.available_gigs, request.worker_profile, SUGGEST_GIGS_SHORTLIST)]
+    return f"""
         WORKER PROFILE:
         {json.dumps(request.worker_profile, indent=2)}
         
-        AVAILABLE GIGS:
-        {json.dumps(request.available_gigs[:5], indent=2)}  # Top 5 gigs
+        AVAILABLE GIGS (best {len(gigs)} of {len(request.available_gigs)} by skills, location and availability):
+        {json.dumps(gigs, indent=2)}
         
         Which gigs should this worker apply to and why?
         """
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+
+@router.post("/suggest-gigs")
+async def suggest_gigs_for_worker(request: SuggestGigsRequest, stream: bool = False):
+    """
+    AI suggests best gigs for a worker
+    With ?stream=true, fields are sent as server-sent events as the model produces them.
+    """
+    if stream:
+        return StreamingResponse(
+            stream_json_events(
+                SUGGEST_GIGS_SYSTEM_MESSAGE,
+                suggest_gigs_prompt(request),
+                lambda suggestions: {"success": True, "suggestions": suggestions}
+            ),
+            media_type="text/event-stream"
+        )
+    
+    try:
+        response = await send_prompt(SUGGEST_GIGS_SYSTEM_MESSAGE, suggest_gigs_prompt(request))
         
         suggestions = json.loads(response)
         
@@ -170,9 +302,6 @@ async def suggest_gigs_for_worker(request: SuggestGigsRequest):
 async def forecast_gig_demand(request: ForecastRequest):
     """AI forecasts demand for specific category/location"""
     try:
-        session_id = str(uuid.uuid4())
-        api_key = os.getenv('EMERGENT_LLM_KEY')
-        
         system_message = """You are a demand forecasting AI for gig economy.
         Predict demand based on historical patterns, weather, events, and seasonality.
         
@@ -187,12 +316,6 @@ async def forecast_gig_demand(request: ForecastRequest):
         }
         """
         
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
         prompt = f"""
         Forecast gig demand for:
         - Location: {request.location}
@@ -202,8 +325,7 @@ async def forecast_gig_demand(request: ForecastRequest):
         Consider weather, local events, historical patterns, and seasonality.
         """
         
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        response = await send_prompt(system_message, prompt)
         
         forecast = json.loads(response)
         
@@ -0,0 +1,237 @@
+"""
+Analytics Event Ingest
+Accepts analytics events into a bounded in-memory queue and bulk-inserts them
+into analytics_events in the background, by batch size or time. When the queue
+is full or the database is slow/unavailable, events are spilled to a local
+JSON-lines file and replayed once inserts succeed again.
+
+Rows carry their own id and are written with an upsert that ignores
+duplicates, so a batch that timed out but still landed is safe to replay.
+Each process spills to its own file ("{pid}" in ANALYTICS_SPILL_PATH), and
+spilled lines that cannot be decoded are moved to a ".bad" file instead of
+blocking the replay.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from supabase_client import get_supabase_admin, run_query
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+ANALYTICS_QUEUE_SIZE = int(os.environ.get("ANALYTICS_QUEUE_SIZE", "10000"))
+ANALYTICS_BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE", "500"))
+ANALYTICS_FLUSH_INTERVAL_SECONDS = float(os.environ.get("ANALYTICS_FLUSH_INTERVAL_SECONDS", "1"))
+ANALYTICS_INSERT_TIMEOUT_SECONDS = float(os.environ.get("ANALYTICS_INSERT_TIMEOUT_SECONDS", "5"))
+# "{pid}" is replaced with the process id, so workers never share a spill file
+ANALYTICS_SPILL_PATH = os.environ.get("ANALYTICS_SPILL_PATH", str(ROOT_DIR / "analytics_spill.{pid}.jsonl"))
+
+class IngestOverloaded(Exception):
+    """Raised when an event can neither be queued nor spilled"""
+
+class AnalyticsIngest:
+    """Bounded event queue with a background batch writer and file spill-over"""
+
+    def __init__(
+        self,
+        queue_size: int = ANALYTICS_QUEUE_SIZE,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        flush_interval: float = ANALYTICS_FLUSH_INTERVAL_SECONDS,
+        insert_timeout: float = ANALYTICS_INSERT_TIMEOUT_SECONDS,
+        spill_path: Optional[str] = ANALYTICS_SPILL_PATH
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.insert_timeout = insert_timeout
+        self.spill_path = Path(str(spill_path).replace("{pid}", str(os.getpid()))) if spill_path else None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._writer: Optional[asyncio.Task] = None
+        # Batch taken off the queue but not yet written (recovered on stop)
+        self._current: List[dict] = []
+        self._spill_lock = asyncio.Lock()
+        self.stats = {"queued": 0, "spilled": 0, "inserted": 0, "failed_batches": 0, "replayed": 0, "quarantined": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, rows: List[dict]) -> str:
+        """
+        Accept events for writing. Returns "queued", or "spilled" when the queue
+        is full (backpressure). Raises IngestOverloaded if spilling is impossible.
+        """
+        self._ensure_writer()
+
+        if self._queue.maxsize - self._queue.qsize() >= len(rows):
+            for row in rows:
+                self._queue.put_nowait(row)
+            self.stats["queued"] += len(rows)
+            return "queued"
+
+        if self.spill_path is None:
+            raise IngestOverloaded("Analytics queue is full")
+        try:
+            await self._spill(rows)
+        except OSError as e:
+            raise IngestOverloaded(f"Analytics queue is full and spill failed: {e}")
+        return "spilled"
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._run())
+
+    async def _next_batch(self) -> List[dict]:
+        """Wait for the first event, then collect up to batch_size or until the interval ends"""
+        batch = self._current = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            written = await self._write(batch)
+            self._current = []
+            if written:
+                try:
+                    await self._replay_spill()
+                except Exception as e:
+                    # Never let a replay problem stop the writer; retried after the next good batch
+                    logger.error(f"Analytics spill replay failed, will retry: {e}")
+
+    async def _write(self, batch: List[dict]) -> bool:
+        """Insert one batch; spill it to disk if the database is slow or failing"""
+        try:
+            await self._insert(batch)
+            self.stats["inserted"] += len(batch)
+            return True
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            logger.error(f"Analytics batch insert failed ({len(batch)} events): {e}")
+            if self.spill_path is not None:
+                try:
+                    await self._spill(batch)
+                except OSError as spill_error:
+                    logger.error(f"Dropping {len(batch)} analytics events, spill failed: {spill_error}")
+            return False
+
+    async def _insert(self, batch: List[dict]) -> None:
+        supabase = get_supabase_admin()
+        await asyncio.wait_for(
+            run_query(supabase.table('analytics_events').upsert(batch, on_conflict='id', ignore_duplicates=True)),
+            timeout=self.insert_timeout
+        )
+
+    def _append_lines(self, rows: List[dict]) -> None:
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as spill_file:
+            for row in rows:
+                spill_file.write(json.dumps(row, default=str) + "\n")
+
+    async def _spill(self, rows: List[dict]) -> None:
+        async with self._spill_lock:
+            await asyncio.to_thread(self._append_lines, rows)
+        self.stats["spilled"] += len(rows)
+
+    async def _replay_spill(self) -> None:
+        """Re-insert spilled events in batches; stops at the first failure"""
+        if self.spill_path is None:
+            return
+        replay_path = self.spill_path.with_suffix(".replaying")
+        if not self.spill_path.exists() and not replay_path.exists():
+            return
+
+        async with self._spill_lock:
+            try:
+                if not replay_path.exists():
+                    await asyncio.to_thread(self.spill_path.replace, replay_path)
+                text = await asyncio.to_thread(replay_path.read_text, encoding="utf-8", errors="replace")
+            except FileNotFoundError:
+                return
+
+        rows = await self._decode_spill(text)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                logger.error(f"Analytics spill replay failed, will retry: {e}")
+                # Keep what is left for the next replay
+                async with self._spill_lock:
+                    await asyncio.to_thread(self._rewrite_replay, replay_path, rows[start:])
+                return
+            self.stats["replayed"] += len(batch)
+
+        await asyncio.to_thread(replay_path.unlink, missing_ok=True)
+
+    async def _decode_spill(self, text: str) -> List[dict]:
+        """Spilled rows, with undecodable lines moved to the quarantine file"""
+        rows, bad_lines = [], []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                bad_lines.append(line)
+                continue
+            if isinstance(row, dict):
+                rows.append(row)
+            else:
+                bad_lines.append(line)
+
+        if bad_lines:
+            quarantine_path = self.spill_path.with_suffix(".bad")
+            logger.error(f"Quarantining {len(bad_lines)} undecodable analytics spill lines to {quarantine_path}")
+            try:
+                await asyncio.to_thread(self._append_quarantine, quarantine_path, bad_lines)
+            except OSError as e:
+                logger.error(f"Dropping {len(bad_lines)} undecodable analytics spill lines: {e}")
+            self.stats["quarantined"] += len(bad_lines)
+        return rows
+
+    @staticmethod
+    def _append_quarantine(quarantine_path: Path, lines: List[str]) -> None:
+        with open(quarantine_path, "a", encoding="utf-8") as quarantine_file:
+            for line in lines:
+                quarantine_file.write(line + "\n")
+
+    @staticmethod
+    def _rewrite_replay(replay_path: Path, rows: List[dict]) -> None:
+        with open(replay_path, "w", encoding="utf-8") as replay_file:
+            for row in rows:
+                replay_file.write(json.dumps(row, default=str) + "\n")
+
+    async def stop(self) -> None:
+        """Stop the writer and persist everything still queued"""
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+        remaining, self._current = self._current, []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[start:start + self.batch_size])
+
+analytics_ingest = AnalyticsIngest()
@@ -3,16 +3,22 @@ Analytics Routes - Supabase PostgreSQL Version
 Event tracking and analytics for user behavior analysis
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Response, status
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime, timezone
+import os
 import uuid
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
+from analytics_ingest import analytics_ingest, IngestOverloaded
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+# "buffered": queue events and answer 202; "direct": insert before answering
+ANALYTICS_INGEST_MODE = os.environ.get("ANALYTICS_INGEST_MODE", "buffered")
+MAX_EVENTS_PER_BATCH = 500
+
 # ============================================================================
 # MODELS
 # ============================================================================
@@ -33,39 +39,108 @@ class EventResponse(BaseModel):
     timestamp: str
     message: str
 
+class EventBatch(BaseModel):
+    events: List[AnalyticsEvent] = Field(..., min_length=1, max_length=MAX_EVENTS_PER_BATCH)
+
+class EventBatchResponse(BaseModel):
+    accepted: int
+    ids: List[str]
+    message: str
+
 class EventStats(BaseModel):
     totalEvents: int
     eventsByName: Dict[str, int]
     conversionRate: Optional[float] = None
 
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def build_event_row(event: AnalyticsEvent, timestamp: str) -> dict:
+    """analytics_events row for an incoming event, with a client-side id"""
+    return {
+        "id": str(uuid.uuid4()),
+        "event_name": event.eventName,
+        "user_id": event.userId if event.userId else None,
+        "anonymous_id": event.anonymousId,
+        "last_intent": event.lastIntent,
+        "metadata": event.metadata,
+        "device": event.device,
+        "referrer": event.referrer,
+        "page": event.page,
+        "timestamp": timestamp,
+        "created_at": timestamp
+    }
+
+async def enqueue_events(rows: List[dict]) -> None:
+    """Hand rows to the background writer; 503 if the ingest can take no more"""
+    try:
+        await analytics_ingest.submit(rows)
+    except IngestOverloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Analytics ingest overloaded: {str(e)}"
+        )
+
+async def count_events_by_name(
+    intent: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> Dict[str, int]:
+    """Exact event counts by name, aggregated in the database (see ADD_ANALYTICS_ROLLUPS.sql)"""
+    supabase = get_supabase_admin()
+    
+    result = await run_query(supabase.rpc('analytics_event_counts', {
+        "p_intent": intent,
+        "p_start": start_date,
+        "p_end": end_date
+    }))
+    
+    return {
+        (row.get('event_name') or 'unknown'): int(row['event_count'])
+        for row in (result.data or [])
+    }
+
+def funnel_stage(event_name: str) -> Optional[str]:
+    """Funnel stage an event counts towards, or None"""
+    if 'landing' in event_name or 'homepage_view' in event_name:
+        return 'landing'
+    elif 'browse' in event_name or 'view_listings' in event_name:
+        return 'browse'
+    elif 'click_apply' in event_name or 'click_post' in event_name or 'click_message' in event_name:
+        return 'intent_action'
+    elif 'open_auth_modal' in event_name:
+        return 'auth_modal_open'
+    elif 'signup_complete' in event_name:
+        return 'signup_complete'
+    return None
+
 # ============================================================================
 # ROUTES
 # ============================================================================
 
 @router.post("/events", response_model=EventResponse, status_code=status.HTTP_201_CREATED)
-async def track_event(event: AnalyticsEvent):
-    """Track analytics event for user or guest"""
+async def track_event(event: AnalyticsEvent, response: Response):
+    """
+    Track analytics event for user or guest
+    In buffered mode the event is queued for a batched insert and 202 is returned.
+    """
     try:
-        supabase = get_supabase_admin()
-        
-        event_id = str(uuid.uuid4())
         timestamp = datetime.now(timezone.utc).isoformat()
+        event_data = build_event_row(event, timestamp)
         
-        event_data = {
-            "id": event_id,
-            "event_name": event.eventName,
-            "user_id": event.userId if event.userId else None,
-            "anonymous_id": event.anonymousId,
-            "last_intent": event.lastIntent,
-            "metadata": event.metadata,
-            "device": event.device,
-            "referrer": event.referrer,
-            "page": event.page,
-            "timestamp": timestamp,
-            "created_at": timestamp
-        }
+        if ANALYTICS_INGEST_MODE == "buffered":
+            await enqueue_events([event_data])
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {
+                "id": event_data["id"],
+                "eventName": event.eventName,
+                "timestamp": timestamp,
+                "message": "Event accepted"
+            }
         
-        result = supabase.table('analytics_events').insert(event_data).execute()
+        supabase = get_supabase_admin()
+        result = await run_query(supabase.table('analytics_events').insert(event_data))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -74,7 +149,7 @@ async def track_event(event: AnalyticsEvent):
             )
         
         return {
-            "id": event_id,
+            "id": event_data["id"],
             "eventName": event.eventName,
             "timestamp": timestamp,
             "message": "Event tracked successfully"
@@ -88,6 +163,29 @@ async def track_event(event: AnalyticsEvent):
             detail=f"Failed to track event: {str(e)}"
         )
 
+@router.post("/events/batch", response_model=EventBatchResponse, status_code=status.HTTP_202_ACCEPTED)
+async def track_events_batch(batch: EventBatch):
+    """Track many analytics events in one request (queued for batched insert)"""
+    try:
+        timestamp = datetime.now(timezone.utc).isoformat()
+        rows = [build_event_row(event, timestamp) for event in batch.events]
+        
+        await enqueue_events(rows)
+        
+        return {
+            "accepted": len(rows),
+            "ids": [row["id"] for row in rows],
+            "message": f"Accepted {len(rows)} events"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to track events: {str(e)}"
+        )
+
 @router.post("/alias")
 async def alias_user(anonymous_id: str = None, user_id: str = None):
     """Alias anonymous guest ID to authenticated user ID for funnel tracking"""
@@ -101,7 +199,7 @@ async def alias_user(anonymous_id: str = None, user_id: str = None):
         supabase = get_supabase_admin()
         
         # Get events to update
-        events_result = supabase.table('analytics_events').select('id').eq('anonymous_id', anonymous_id).is_('user_id', 'null').execute()
+        events_result = await run_query(supabase.table('analytics_events').select('id').eq('anonymous_id', anonymous_id).is_('user_id', 'null'))
         
         if not events_result.data:
             return {
@@ -112,10 +210,10 @@ async def alias_user(anonymous_id: str = None, user_id: str = None):
             }
         
         # Update all matching events
-        update_result = supabase.table('analytics_events').update({
+        update_result = await run_query(supabase.table('analytics_events').update({
             "user_id": user_id,
             "aliased_at": datetime.now(timezone.utc).isoformat()
-        }).eq('anonymous_id', anonymous_id).is_('user_id', 'null').execute()
+        }).eq('anonymous_id', anonymous_id).is_('user_id', 'null'))
         
         count = len(update_result.data) if update_result.data else 0
         
@@ -140,29 +238,8 @@ async def get_event_stats(
 ):
     """Get analytics statistics"""
     try:
-        supabase = get_supabase_admin()
-        
-        # Build query
-        query = supabase.table('analytics_events').select('*')
-        
-        if intent:
-            query = query.eq('last_intent', intent)
-        if start_date:
-            query = query.gte('timestamp', start_date)
-        if end_date:
-            query = query.lte('timestamp', end_date)
-        
-        # Get events (limit to 10000 for performance)
-        result = query.limit(10000).execute()
-        
-        events = result.data if result.data else []
-        
-        # Calculate stats
-        total_events = len(events)
-        events_by_name = {}
-        for event in events:
-            event_name = event.get('event_name', 'unknown')
-            events_by_name[event_name] = events_by_name.get(event_name, 0) + 1
+        events_by_name = await count_events_by_name(intent, start_date, end_date)
+        total_events = sum(events_by_name.values())
         
         # Calculate conversion rate (guest_open_auth_modal → signup)
         conversion_rate = None
@@ -188,17 +265,7 @@ async def get_event_stats(
 async def get_conversion_funnel(intent: Optional[str] = None):
     """Get conversion funnel metrics by intent"""
     try:
-        supabase = get_supabase_admin()
-        
-        # Build query
-        query = supabase.table('analytics_events').select('event_name')
-        
-        if intent:
-            query = query.eq('last_intent', intent)
-        
-        result = query.limit(10000).execute()
-        
-        events = result.data if result.data else []
+        events_by_name = await count_events_by_name(intent)
         
         # Calculate funnel stages
         funnel = {
@@ -209,18 +276,10 @@ async def get_conversion_funnel(intent: Optional[str] = None):
             "signup_complete": 0
         }
         
-        for event in events:
-            event_name = event.get('event_name', '')
-            if 'landing' in event_name or 'homepage_view' in event_name:
-                funnel['landing'] += 1
-            elif 'browse' in event_name or 'view_listings' in event_name:
-                funnel['browse'] += 1
-            elif 'click_apply' in event_name or 'click_post' in event_name or 'click_message' in event_name:
-                funnel['intent_action'] += 1
-            elif 'open_auth_modal' in event_name:
-                funnel['auth_modal_open'] += 1
-            elif 'signup_complete' in event_name:
-                funnel['signup_complete'] += 1
+        for event_name, count in events_by_name.items():
+            stage = funnel_stage(event_name)
+            if stage:
+                funnel[stage] += count
         
         # Calculate conversion rates
         conversion_rates = {
@@ -9,7 +9,7 @@ from typing import Optional, List
 from datetime import datetime
 import uuid
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
 
 router = APIRouter(prefix="/applications", tags=["Applications"])
 
@@ -31,7 +31,7 @@ async def create_application(application: ApplicationCreate):
         supabase = get_supabase_admin()
         
         # Check if application already exists
-        existing = supabase.table('applications').select('id').eq('job_id', application.job_id).eq('worker_id', application.worker_id).execute()
+        existing = await run_query(supabase.table('applications').select('id').eq('job_id', application.job_id).eq('worker_id', application.worker_id))
         
         if existing.data and len(existing.data) > 0:
             raise HTTPException(
@@ -53,7 +53,7 @@ async def create_application(application: ApplicationCreate):
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table('applications').insert(app_data).execute()
+        result = await run_query(supabase.table('applications').insert(app_data))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -77,7 +77,7 @@ async def get_job_applications(job_id: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('applications').select('*').eq('job_id', job_id).order('created_at', desc=True).execute()
+        result = await run_query(supabase.table('applications').select('*').eq('job_id', job_id).order('created_at', desc=True))
         
         return {"success": True, "applications": result.data if result.data else []}
         
@@ -93,7 +93,7 @@ async def get_worker_applications(worker_id: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('applications').select('*').eq('worker_id', worker_id).order('created_at', desc=True).execute()
+        result = await run_query(supabase.table('applications').select('*').eq('worker_id', worker_id).order('created_at', desc=True))
         
         return {"success": True, "applications": result.data if result.data else []}
         
@@ -109,7 +109,7 @@ async def get_single_application(application_id: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('applications').select('*').eq('id', application_id).execute()
+        result = await run_query(supabase.table('applications').select('*').eq('id', application_id))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -136,7 +136,7 @@ async def update_application(application_id: str, updates: ApplicationUpdate):
         update_data = updates.dict(exclude_unset=True, exclude_none=True)
         update_data['updated_at'] = datetime.utcnow().isoformat()
         
-        result = supabase.table('applications').update(update_data).eq('id', application_id).execute()
+        result = await run_query(supabase.table('applications').update(update_data).eq('id', application_id))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -161,7 +161,7 @@ async def delete_application(application_id: str):
         supabase = get_supabase_admin()
         
         # Get application first to decrement job count
-        app_result = supabase.table('applications').select('job_id').eq('id', application_id).execute()
+        app_result = await run_query(supabase.table('applications').select('job_id').eq('id', application_id))
         
         if not app_result.data or len(app_result.data) == 0:
             raise HTTPException(
@@ -172,7 +172,7 @@ async def delete_application(application_id: str):
         job_id = app_result.data[0]['job_id']
         
         # Delete application
-        result = supabase.table('applications').delete().eq('id', application_id).execute()
+        result = await run_query(supabase.table('applications').delete().eq('id', application_id))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -181,10 +181,10 @@ async def delete_application(application_id: str):
             )
         
         # Decrement application count
-        job = supabase.table('jobs').select('application_count').eq('id', job_id).execute()
+        job = await run_query(supabase.table('jobs').select('application_count').eq('id', job_id))
         if job.data and len(job.data) > 0:
             new_count = max(0, job.data[0]['application_count'] - 1)
-            supabase.table('jobs').update({"application_count": new_count}).eq('id', job_id).execute()
+            await run_query(supabase.table('jobs').update({"application_count": new_count}).eq('id', job_id))
         
         return None
         
@@ -203,7 +203,7 @@ async def get_application_stats(job_id: str):
         supabase = get_supabase_admin()
         
         # Get all applications for the job
-        result = supabase.table('applications').select('status').eq('job_id', job_id).execute()
+        result = await run_query(supabase.table('applications').select('status').eq('job_id', job_id))
         
         applications = result.data if result.data else []
         
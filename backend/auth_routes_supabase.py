@@ -8,14 +8,15 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 import jwt
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 import os
 import uuid
 
 # Import Supabase client
-from supabase_client import supabase, get_supabase_client, get_supabase_admin
+from supabase_client import supabase, get_supabase_admin, run_query
+from password_hashing import password_hasher, PasswordHashingBusy
+from user_cache import user_cache
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
@@ -27,8 +28,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 USE_MOCK_AUTH = os.environ.get('USE_MOCK_AUTH', 'false').lower() == 'true'
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing runs on password_hasher's bounded pool (see password_hashing.py)
+PASSWORD_BUSY_RETRY_AFTER_SECONDS = 2
 
 # Pydantic Models
 class UserRegister(BaseModel):
@@ -51,11 +52,19 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    """(valid, new_hash); new_hash is set when the stored hash should be upgraded"""
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
+
+def password_busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests, please retry shortly",
+        headers={"Retry-After": str(PASSWORD_BUSY_RETRY_AFTER_SECONDS)}
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -74,8 +83,60 @@ def create_refresh_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def access_token_claims(user: dict) -> dict:
+    """Claims embedded in access tokens so most requests need no users lookup"""
+    return {
+        "sub": user["id"],
+        "roles": user.get("roles", []),
+        "current_mode": user.get("current_mode")
+    }
+
+def decode_access_token(credentials: HTTPAuthorizationCredentials) -> dict:
+    try:
+        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    
+    if payload.get("type") != "access":
+        raise HTTPException(status_code=401, detail="Invalid token type")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return payload
+
+async def load_user(user_id: str) -> Optional[dict]:
+    """users row (without password_hash) from the user cache, or the database on a miss"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    # Get user from Supabase (use admin client to bypass RLS)
+    supabase_client = get_supabase_admin()
+    response = await run_query(supabase_client.table('users').select('*').eq('id', user_id))
+    if not response.data or len(response.data) == 0:
+        return None
+    return user_cache.set(response.data[0])
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Dependency for endpoints that only need id, roles and current_mode
+    Answered from the access token alone, with no database round trip.
+    Tokens issued before claims were embedded fall back to the cached user row.
+    Claims are not rechecked against users.is_active before the token expires.
+    """
+    if USE_MOCK_AUTH:
+        return {"id": "mock-user-id", "roles": ["worker", "employer"], "current_mode": "worker"}
+    
+    payload = decode_access_token(credentials)
+    if "roles" in payload:
+        return {"id": payload["sub"], "roles": payload["roles"], "current_mode": payload.get("current_mode")}
+    
+    user = await get_current_user(credentials)
+    return {"id": user["id"], "roles": user.get("roles", []), "current_mode": user.get("current_mode")}
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Dependency to get current authenticated user from JWT token"""
+    """Dependency to get current authenticated user (full row) from JWT token, via the user cache"""
     if USE_MOCK_AUTH:
         # Mock mode for local dev
         return {
@@ -87,30 +148,18 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         }
     
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        if payload.get("type") != "access":
-            raise HTTPException(status_code=401, detail="Invalid token type")
-        
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
+        payload = decode_access_token(credentials)
         
-        # Get user from Supabase (use admin client to bypass RLS)
-        supabase_client = get_supabase_admin()
-        response = supabase_client.table('users').select('*').eq('id', user_id).execute()
-        
-        if not response.data or len(response.data) == 0:
+        user = await load_user(payload["sub"])
+        if user is None:
             raise HTTPException(status_code=401, detail="User not found")
+        if not user.get("is_active", True):
+            raise HTTPException(status_code=403, detail="Account has been deactivated")
         
-        user = response.data[0]
         return user
         
-    except ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}")
 
@@ -126,7 +175,7 @@ async def register(user_data: UserRegister):
         supabase_client = get_supabase_admin()  # Use admin client to bypass RLS
         
         # Check if user already exists
-        existing_user = supabase_client.table('users').select('id').eq('email', user_data.email).execute()
+        existing_user = await run_query(supabase_client.table('users').select('id').eq('email', user_data.email))
         
         if existing_user.data and len(existing_user.data) > 0:
             raise HTTPException(
@@ -136,7 +185,7 @@ async def register(user_data: UserRegister):
         
         # Create new user
         user_id = str(uuid.uuid4())
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash(user_data.password)
         
         # Determine roles array based on role
         roles = [user_data.role]
@@ -155,7 +204,7 @@ async def register(user_data: UserRegister):
         }
         
         # Insert user into database
-        result = supabase_client.table('users').insert(new_user).execute()
+        result = await run_query(supabase_client.table('users').insert(new_user))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -181,10 +230,10 @@ async def register(user_data: UserRegister):
                 "created_at": datetime.utcnow().isoformat(),
                 "updated_at": datetime.utcnow().isoformat()
             }
-            supabase_client.table('worker_profiles').insert(worker_profile).execute()
+            await run_query(supabase_client.table('worker_profiles').insert(worker_profile))
         
         # Generate tokens
-        access_token = create_access_token(data={"sub": user_id})
+        access_token = create_access_token(data=access_token_claims(created_user))
         refresh_token = create_refresh_token(data={"sub": user_id})
         
         # Prepare user response (exclude password_hash)
@@ -205,6 +254,8 @@ async def register(user_data: UserRegister):
         
     except HTTPException:
         raise
+    except PasswordHashingBusy:
+        raise password_busy_error()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -220,7 +271,7 @@ async def login(credentials: UserLogin):
         supabase_client = get_supabase_admin()  # Use admin client to bypass RLS
         
         # Get user by email
-        response = supabase_client.table('users').select('*').eq('email', credentials.email).execute()
+        response = await run_query(supabase_client.table('users').select('*').eq('email', credentials.email))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -231,7 +282,8 @@ async def login(credentials: UserLogin):
         user = response.data[0]
         
         # Verify password
-        if not verify_password(credentials.password, user["password_hash"]):
+        valid, new_password_hash = await verify_password(credentials.password, user["password_hash"])
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
@@ -244,19 +296,21 @@ async def login(credentials: UserLogin):
                 detail="Account has been deactivated"
             )
         
-        # Update last login
-        supabase_client.table('users').update({
-            "last_login": datetime.utcnow().isoformat()
-        }).eq('id', user["id"]).execute()
+        # Update last login, upgrading the stored hash if the bcrypt cost changed
+        login_update = {"last_login": datetime.utcnow().isoformat()}
+        if new_password_hash:
+            login_update["password_hash"] = new_password_hash
+        await run_query(supabase_client.table('users').update(login_update).eq('id', user["id"]))
+        user_cache.invalidate(user["id"])
         
         # Check if worker profile exists
         worker_profile_complete = False
         if 'worker' in user.get("roles", []):
-            profile_response = supabase_client.table('worker_profiles').select('id').eq('user_id', user["id"]).execute()
+            profile_response = await run_query(supabase_client.table('worker_profiles').select('id').eq('user_id', user["id"]))
             worker_profile_complete = len(profile_response.data) > 0
         
         # Generate tokens
-        access_token = create_access_token(data={"sub": user["id"]})
+        access_token = create_access_token(data=access_token_claims(user))
         refresh_token = create_refresh_token(data={"sub": user["id"]})
         
         # Prepare user response (exclude password_hash)
@@ -280,6 +334,8 @@ async def login(credentials: UserLogin):
         
     except HTTPException:
         raise
+    except PasswordHashingBusy:
+        raise password_busy_error()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -301,17 +357,13 @@ async def refresh_token(request: RefreshTokenRequest):
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token payload")
         
-        # Get user from database
-        supabase_client = get_supabase_client()
-        response = supabase_client.table('users').select('*').eq('id', user_id).execute()
-        
-        if not response.data or len(response.data) == 0:
+        # Get user (cached; writers to users invalidate it) so the new token carries current claims
+        user = await load_user(user_id)
+        if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         
-        user = response.data[0]
-        
         # Generate new tokens
-        new_access_token = create_access_token(data={"sub": user_id})
+        new_access_token = create_access_token(data=access_token_claims(user))
         new_refresh_token = create_refresh_token(data={"sub": user_id})
         
         # Prepare user response
@@ -360,10 +412,11 @@ class AddRoleRequest(BaseModel):
 @router.post("/add-role")
 async def add_secondary_role(
     request: AddRoleRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_token_claims)
 ):
     """
     Add secondary role to user (worker can become employer, vice versa)
+    Roles and mode come from the access token claims.
     """
     try:
         role = request.role
@@ -399,11 +452,18 @@ async def add_secondary_role(
         if len(current_roles) == 1:
             update_data["current_mode"] = role
         
-        supabase_client.table('users').update(update_data).eq('id', user_id).execute()
+        await run_query(supabase_client.table('users').update(update_data).eq('id', user_id))
+        user_cache.invalidate(user_id)
         
+        # The caller's access token still carries the old roles; hand back one with the new claims
         return {
             "message": f"Successfully added {role} role",
-            "roles": new_roles
+            "roles": new_roles,
+            "access_token": create_access_token(data=access_token_claims({
+                "id": user_id,
+                "roles": new_roles,
+                "current_mode": update_data.get("current_mode", current_user.get("current_mode"))
+            }))
         }
         
     except HTTPException:
@@ -10,7 +10,7 @@ from datetime import datetime, timezone
 import uuid
 import json
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
 
 router = APIRouter(prefix="", tags=["Badges"])
 
@@ -82,7 +82,7 @@ async def assign_badge(request: BadgeRequest):
         }
         
         # Check if worker already has badges
-        existing = supabase.table('worker_badges').select('*').eq('worker_id', request.worker_id).execute()
+        existing = await run_query(supabase.table('worker_badges').select('*').eq('worker_id', request.worker_id))
         
         if existing.data and len(existing.data) > 0:
             current_badges = existing.data[0].get('badges', [])
@@ -96,10 +96,10 @@ async def assign_badge(request: BadgeRequest):
             
             # Add new badge
             current_badges.append(new_badge)
-            supabase.table('worker_badges').update({
+            await run_query(supabase.table('worker_badges').update({
                 "badges": json.dumps(current_badges),
                 "updated_at": datetime.now(timezone.utc).isoformat()
-            }).eq('worker_id', request.worker_id).execute()
+            }).eq('worker_id', request.worker_id))
         else:
             # Create new worker badge record
             worker_badge_data = {
@@ -109,7 +109,7 @@ async def assign_badge(request: BadgeRequest):
                 "created_at": datetime.now(timezone.utc).isoformat(),
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }
-            supabase.table('worker_badges').insert(worker_badge_data).execute()
+            await run_query(supabase.table('worker_badges').insert(worker_badge_data))
         
         return {"message": "Badge assigned successfully", "badge": new_badge}
         
@@ -124,7 +124,7 @@ async def get_worker_badges(worker_id: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('worker_badges').select('*').eq('worker_id', worker_id).execute()
+        result = await run_query(supabase.table('worker_badges').select('*').eq('worker_id', worker_id))
         
         if not result.data or len(result.data) == 0:
             return {"worker_id": worker_id, "badges": [], "verification_status": {}}
@@ -193,10 +193,10 @@ async def submit_verification(request: VerificationRequest):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        supabase.table('verifications').insert(verification_data).execute()
+        await run_query(supabase.table('verifications').insert(verification_data))
         
         # Update worker badge record with verification status
-        existing = supabase.table('worker_badges').select('verification_status').eq('worker_id', request.worker_id).execute()
+        existing = await run_query(supabase.table('worker_badges').select('verification_status').eq('worker_id', request.worker_id))
         
         if existing.data and len(existing.data) > 0:
             status = existing.data[0].get('verification_status', {})
@@ -204,10 +204,10 @@ async def submit_verification(request: VerificationRequest):
                 status = json.loads(status)
             status[request.verification_type] = "pending"
             
-            supabase.table('worker_badges').update({
+            await run_query(supabase.table('worker_badges').update({
                 "verification_status": json.dumps(status),
                 "updated_at": datetime.now(timezone.utc).isoformat()
-            }).eq('worker_id', request.worker_id).execute()
+            }).eq('worker_id', request.worker_id))
         else:
             # Create new record
             worker_badge_data = {
@@ -217,7 +217,7 @@ async def submit_verification(request: VerificationRequest):
                 "created_at": datetime.now(timezone.utc).isoformat(),
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }
-            supabase.table('worker_badges').insert(worker_badge_data).execute()
+            await run_query(supabase.table('worker_badges').insert(worker_badge_data))
         
         return {
             "message": "Verification submitted successfully",
@@ -235,7 +235,7 @@ async def get_verified_workers(badge_type: Optional[str] = None):
         supabase = get_supabase_admin()
         
         # Get all worker badges
-        badges_result = supabase.table('worker_badges').select('*').execute()
+        badges_result = await run_query(supabase.table('worker_badges').select('*'))
         
         workers_with_badges = badges_result.data if badges_result.data else []
         
@@ -256,7 +256,7 @@ async def get_verified_workers(badge_type: Optional[str] = None):
                     continue
             
             # Get worker details
-            worker_result = supabase.table('users').select('id, name, email').eq('id', worker_badge['worker_id']).execute()
+            worker_result = await run_query(supabase.table('users').select('id, name, email').eq('id', worker_badge['worker_id']))
             
             if worker_result.data and len(worker_result.data) > 0:
                 worker_info = worker_result.data[0]
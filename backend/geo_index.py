@@ -0,0 +1,74 @@
+"""
+Geo Grid Index
+In-process spatial index for nearby lookups when the database has no geo index
+(used by the MongoDB QuickHire routes). Points are bucketed into fixed-size
+lat/lon cells so a radius query only touches the cells its bounding box covers.
+"""
+
+import math
+from typing import Dict, List, Set, Tuple
+
+MILES_PER_DEGREE_LAT = 69.0
+
+class GeoGridIndex:
+    """Uniform grid of lat/lon cells mapping cell -> keys of the points inside it"""
+
+    def __init__(self, cell_size_deg: float = 0.05):
+        # 0.05 degrees is roughly 3.5 miles of latitude
+        self.cell_size_deg = cell_size_deg
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._points: Dict[str, Tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._points
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size_deg), math.floor(lon / self.cell_size_deg))
+
+    def upsert(self, key: str, lat: float, lon: float) -> None:
+        """Add a point or move an existing one"""
+        self.remove(key)
+        self._points[key] = (lat, lon)
+        self._cells.setdefault(self._cell(lat, lon), set()).add(key)
+
+    def remove(self, key: str) -> None:
+        """Drop a point if it is indexed"""
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+
+        cell = self._cell(*point)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def candidates(self, lat: float, lon: float, radius_miles: float) -> List[str]:
+        """
+        Keys of all points inside the bounding box of the radius around (lat, lon).
+        Callers apply their own exact distance check to the (small) result.
+        """
+        lat_span = radius_miles / MILES_PER_DEGREE_LAT
+        # Longitude degrees shrink towards the poles; never narrower than the
+        # latitude span so flat "1 degree = 69 miles" distance checks stay covered
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        lon_span = max(lat_span, radius_miles / (MILES_PER_DEGREE_LAT * cos_lat))
+
+        min_lat, max_lat = lat - lat_span, lat + lat_span
+        min_lon, max_lon = lon - lon_span, lon + lon_span
+        min_cell = self._cell(min_lat, min_lon)
+        max_cell = self._cell(max_lat, max_lon)
+
+        results = []
+        for cell_lat in range(min_cell[0], max_cell[0] + 1):
+            for cell_lon in range(min_cell[1], max_cell[1] + 1):
+                for key in self._cells.get((cell_lat, cell_lon), ()):
+                    point_lat, point_lon = self._points[key]
+                    if min_lat <= point_lat <= max_lat and min_lon <= point_lon <= max_lon:
+                        results.append(key)
+
+        return results
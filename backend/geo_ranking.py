@@ -0,0 +1,210 @@
+"""
+Geo Ranking Engine
+Vectorized (NumPy) distance, ETA, price and top-k ranking for QuickHire
+candidate sets. Produces the same numbers as the scalar helpers in
+quickhire_routes_supabase.py (haversine_distance, calculate_eta,
+generate_price) but scores a whole candidate list in one pass.
+
+Run `python geo_ranking.py` for a micro-benchmark against the scalar path.
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+EARTH_RADIUS_MILES = 3959
+AVERAGE_SPEED_MPH = 30
+MIN_ETA_MINUTES = 5
+PRICE_PER_MILE = 2
+
+BASE_PRICES: Dict[str, float] = {
+    "Plumber": 120, "Electrician": 100, "Cleaning": 80,
+    "Handyman": 90, "Moving": 150, "Locksmith": 95,
+    "HVAC": 130, "Painting": 85, "Carpentry": 110, "Landscaping": 75
+}
+DEFAULT_BASE_PRICE = 100
+
+URGENCY_MULTIPLIERS: Dict[str, float] = {"ASAP": 1.3, "Today": 1.1, "Later": 1.0}
+DEFAULT_URGENCY_MULTIPLIER = 1.0
+
+# ============================================================================
+# ARRAY KERNELS
+# ============================================================================
+
+def haversine_miles(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distance in miles (rounded to 2 places) from one point to many"""
+    lat_rad = np.radians(lat)
+    lats_rad = np.radians(lats)
+    delta_lat = lats_rad - lat_rad
+    delta_lon = np.radians(lons - lon)
+
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat_rad) * np.cos(lats_rad) * np.sin(delta_lon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return np.round(EARTH_RADIUS_MILES * c, 2)
+
+def eta_minutes(distances: np.ndarray) -> np.ndarray:
+    """ETA in whole minutes at average city speed, never below the minimum"""
+    minutes = np.floor(distances / AVERAGE_SPEED_MPH * 60).astype(np.int64)
+    return np.maximum(MIN_ETA_MINUTES, minutes)
+
+def price_estimates(categories: Sequence[str], distances: np.ndarray, urgencies: Sequence[str]) -> np.ndarray:
+    """Dynamic price per candidate: (category base + distance fee) * urgency multiplier"""
+    base = np.fromiter(
+        (BASE_PRICES.get(category, DEFAULT_BASE_PRICE) for category in categories),
+        dtype=np.float64,
+        count=len(distances)
+    )
+    multiplier = np.fromiter(
+        (URGENCY_MULTIPLIERS.get(urgency, DEFAULT_URGENCY_MULTIPLIER) for urgency in urgencies),
+        dtype=np.float64,
+        count=len(distances)
+    )
+    return np.round((base + distances * PRICE_PER_MILE) * multiplier, 2)
+
+def top_k_indices(values: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """
+    Indices of the k smallest values in ascending order. Uses a partial sort
+    (argpartition) so only the k winners are fully sorted.
+    """
+    n = len(values)
+    if k is None or k >= n:
+        return np.argsort(values, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    head = np.argpartition(values, k - 1)[:k]
+    return head[np.argsort(values[head], kind="stable")]
+
+# ============================================================================
+# ROW-LEVEL RANKING
+# ============================================================================
+
+def rank_nearby(
+    rows: List[dict],
+    lat: float,
+    lon: float,
+    coords: Optional[Tuple[Sequence[float], Sequence[float]]] = None,
+    distances: Optional[Sequence[float]] = None,
+    radius: Optional[Union[float, Sequence[float]]] = None,
+    limit: Optional[int] = None,
+    with_eta: bool = True,
+    with_price: bool = False
+) -> Tuple[List[dict], int]:
+    """
+    Score candidate rows against (lat, lon) and return (nearest rows, total in radius).
+
+    coords     (lats, lons) per row; defaults to each row's latitude/longitude
+    distances  precomputed distances in miles (e.g. from PostGIS); skips haversine
+    radius     one radius for all rows or one per row; None keeps every row
+    limit      number of rows to return; the total still counts every row in radius
+
+    Only the returned rows are annotated with distance / eta / estimated_price.
+    """
+    if not rows:
+        return [], 0
+
+    if distances is not None:
+        dist = np.asarray(distances, dtype=np.float64)
+    else:
+        if coords is None:
+            lats = np.fromiter((float(row['latitude']) for row in rows), dtype=np.float64, count=len(rows))
+            lons = np.fromiter((float(row['longitude']) for row in rows), dtype=np.float64, count=len(rows))
+        else:
+            lats = np.asarray(coords[0], dtype=np.float64)
+            lons = np.asarray(coords[1], dtype=np.float64)
+        dist = haversine_miles(lat, lon, lats, lons)
+
+    if radius is None:
+        in_radius = np.arange(len(rows))
+    else:
+        in_radius = np.flatnonzero(dist <= np.asarray(radius, dtype=np.float64))
+
+    order = in_radius[top_k_indices(dist[in_radius], limit)]
+    selected = dist[order]
+    etas = eta_minutes(selected) if with_eta else None
+    prices = None
+    if with_price:
+        prices = price_estimates(
+            [rows[i].get('category') for i in order],
+            selected,
+            [rows[i].get('urgency') for i in order]
+        )
+
+    ranked = []
+    for position, index in enumerate(order.tolist()):
+        row = rows[index]
+        row['distance'] = float(selected[position])
+        if etas is not None:
+            row['eta'] = int(etas[position])
+        if prices is not None:
+            row['estimated_price'] = float(prices[position])
+        ranked.append(row)
+
+    return ranked, int(len(in_radius))
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _benchmark(sizes: Sequence[int] = (1_000, 10_000, 100_000), limit: int = 20, repeat: int = 5) -> None:
+    """Compare the scalar per-gig loop with rank_nearby on synthetic gigs"""
+    import random
+    import time
+
+    from quickhire_routes_supabase import haversine_distance, calculate_eta, generate_price
+
+    categories = list(BASE_PRICES) + ["Other"]
+    urgencies = list(URGENCY_MULTIPLIERS)
+    origin_lat, origin_lon = 40.7128, -74.0060
+    radius = 25
+
+    def make_gigs(n: int) -> List[dict]:
+        rng = random.Random(n)
+        return [
+            {
+                "id": str(i),
+                "latitude": origin_lat + rng.uniform(-0.5, 0.5),
+                "longitude": origin_lon + rng.uniform(-0.5, 0.5),
+                "category": rng.choice(categories),
+                "urgency": rng.choice(urgencies)
+            }
+            for i in range(n)
+        ]
+
+    def scalar(gigs: List[dict]) -> List[dict]:
+        nearby = []
+        for gig in gigs:
+            distance = haversine_distance(origin_lat, origin_lon, float(gig['latitude']), float(gig['longitude']))
+            if distance <= radius:
+                gig['distance'] = distance
+                gig['eta'] = calculate_eta(distance)
+                gig['estimated_price'] = generate_price(gig['category'], distance, gig['urgency'])
+                nearby.append(gig)
+        nearby.sort(key=lambda x: x['distance'])
+        return nearby[:limit]
+
+    def vectorized(gigs: List[dict]) -> List[dict]:
+        ranked, _ = rank_nearby(gigs, origin_lat, origin_lon, radius=radius, limit=limit, with_price=True)
+        return ranked
+
+    def best_of(func, gigs: List[dict]) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(gigs)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    print(f"{'gigs':>8} {'scalar ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for n in sizes:
+        gigs = make_gigs(n)
+        expected = [g['distance'] for g in scalar([dict(g) for g in gigs])]
+        actual = [g['distance'] for g in vectorized([dict(g) for g in gigs])]
+        assert np.allclose(expected, actual, atol=0.01), "vectorized results differ from scalar path"
+
+        scalar_time = best_of(scalar, gigs)
+        vector_time = best_of(vectorized, gigs)
+        print(f"{n:>8} {scalar_time * 1000:>10.2f} {vector_time * 1000:>10.2f} {scalar_time / vector_time:>7.1f}x")
+
+if __name__ == "__main__":
+    _benchmark()
@@ -10,7 +10,8 @@ from datetime import datetime, timezone
 import uuid
 import json
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
+import search_index
 
 router = APIRouter(prefix="/jobs", tags=["Jobs"])
 
@@ -112,7 +113,7 @@ async def create_job(job: JobCreate):
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table('jobs').insert(job_data).execute()
+        result = await run_query(supabase.table('jobs').insert(job_data))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -121,6 +122,7 @@ async def create_job(job: JobCreate):
             )
         
         created_job = result.data[0]
+        search_index.index_job(created_job)
         
         # Create role definitions if Multi-Role hiring
         if job.hiringType == "Multi-Role" and job.roles:
@@ -144,7 +146,7 @@ async def create_job(job: JobCreate):
                 })
             
             if role_data:
-                supabase.table('role_definitions').insert(role_data).execute()
+                await run_query(supabase.table('role_definitions').insert(role_data))
         
         return {
             "success": True,
@@ -188,7 +190,7 @@ async def list_jobs(
         # Apply pagination and ordering
         query = query.range(offset, offset + limit - 1).order('created_at', desc=True)
         
-        result = query.execute()
+        result = await run_query(query)
         
         jobs = result.data if result.data else []
         
@@ -218,7 +220,7 @@ async def get_user_jobs(userId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('jobs').select('*').eq('user_id', userId).order('created_at', desc=True).execute()
+        result = await run_query(supabase.table('jobs').select('*').eq('user_id', userId).order('created_at', desc=True))
         
         jobs = result.data if result.data else []
         
@@ -248,7 +250,7 @@ async def get_job(jobId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('jobs').select('*').eq('id', jobId).execute()
+        result = await run_query(supabase.table('jobs').select('*').eq('id', jobId))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -259,9 +261,9 @@ async def get_job(jobId: str):
         job = result.data[0]
         
         # Increment view count
-        supabase.table('jobs').update({
+        await run_query(supabase.table('jobs').update({
             "views": job['views'] + 1
-        }).eq('id', jobId).execute()
+        }).eq('id', jobId))
         
         job['views'] = job['views'] + 1
         
@@ -274,7 +276,7 @@ async def get_job(jobId: str):
         
         # Get role definitions if Multi-Role
         if job.get('hiring_type') == 'Multi-Role':
-            roles_result = supabase.table('role_definitions').select('*').eq('job_id', jobId).execute()
+            roles_result = await run_query(supabase.table('role_definitions').select('*').eq('job_id', jobId))
             job['roles'] = roles_result.data if roles_result.data else []
         
         return {
@@ -325,7 +327,7 @@ async def update_job(jobId: str, updates: JobUpdate):
         
         converted_data['updated_at'] = datetime.now(timezone.utc).isoformat()
         
-        result = supabase.table('jobs').update(converted_data).eq('id', jobId).execute()
+        result = await run_query(supabase.table('jobs').update(converted_data).eq('id', jobId))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -333,10 +335,12 @@ async def update_job(jobId: str, updates: JobUpdate):
                 detail="Job not found"
             )
         
+        search_index.index_job(result.data[0])
+        
         # Update roles if provided
         if roles_data is not None:
             # Delete existing roles
-            supabase.table('role_definitions').delete().eq('job_id', jobId).execute()
+            await run_query(supabase.table('role_definitions').delete().eq('job_id', jobId))
             
             # Insert new roles
             if roles_data:
@@ -360,7 +364,7 @@ async def update_job(jobId: str, updates: JobUpdate):
                     })
                 
                 if role_records:
-                    supabase.table('role_definitions').insert(role_records).execute()
+                    await run_query(supabase.table('role_definitions').insert(role_records))
         
         return {
             "success": True,
@@ -382,7 +386,7 @@ async def delete_job(jobId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('jobs').delete().eq('id', jobId).execute()
+        result = await run_query(supabase.table('jobs').delete().eq('id', jobId))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -390,6 +394,7 @@ async def delete_job(jobId: str):
                 detail="Job not found"
             )
         
+        search_index.remove_job(jobId)
         return None
         
     except HTTPException:
@@ -406,11 +411,11 @@ async def publish_job(jobId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('jobs').update({
+        result = await run_query(supabase.table('jobs').update({
             "status": "published",
             "published_at": datetime.now(timezone.utc).isoformat(),
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq('id', jobId).execute()
+        }).eq('id', jobId))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -418,6 +423,8 @@ async def publish_job(jobId: str):
                 detail="Job not found"
             )
         
+        search_index.index_job(result.data[0])
+        
         return {
             "success": True,
             "message": "Job published successfully",
@@ -438,10 +445,10 @@ async def close_job(jobId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('jobs').update({
+        result = await run_query(supabase.table('jobs').update({
             "status": "closed",
             "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq('id', jobId).execute()
+        }).eq('id', jobId))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -449,6 +456,8 @@ async def close_job(jobId: str):
                 detail="Job not found"
             )
         
+        search_index.index_job(result.data[0])
+        
         return {
             "success": True,
             "message": "Job closed successfully",
@@ -0,0 +1,101 @@
+"""
+Incremental JSON Parsing and SSE helpers
+Parses a JSON object as it streams in from an LLM and reports each top-level
+field as soon as its value is complete, so endpoints can send partial results
+before the model has finished. Text before the first "{" (e.g. a ```json fence)
+and after the closing "}" is ignored.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+class IncrementalJSONParser:
+    """Feed chunks of a JSON object; get back the top-level fields they complete"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start: Optional[int] = None
+        self._object_end: Optional[int] = None
+        # At depth 1: "key" -> reading a key, "colon", "value", or None between fields
+        self._expect: Optional[str] = None
+        self._key_start = 0
+        self._key: Optional[str] = None
+        self._value_start = 0
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Consume a chunk; returns fields completed by it (in order)"""
+        self.buffer += chunk
+        completed: Dict[str, Any] = {}
+        buffer = self.buffer
+
+        while self._pos < len(buffer) and not self.complete:
+            ch = buffer[self._pos]
+            i = self._pos
+            self._pos += 1
+
+            if self._object_start is None:
+                if ch == "{":
+                    self._object_start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = json.loads(buffer[self._key_start:i + 1])
+                        self._expect = "colon"
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect in (None, "key"):
+                    self._expect = "key"
+                    self._key_start = i
+                continue
+
+            if self._depth == 1 and self._expect == "colon" and ch == ":":
+                self._expect = "value"
+                self._value_start = i + 1
+                continue
+
+            if ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_field(buffer[self._value_start:i], completed)
+                    self._object_end = i + 1
+                    self.complete = True
+            elif ch == "," and self._depth == 1:
+                self._finish_field(buffer[self._value_start:i], completed)
+
+        return completed
+
+    def _finish_field(self, raw_value: str, completed: Dict[str, Any]) -> None:
+        if self._expect == "value" and self._key is not None and raw_value.strip():
+            value = json.loads(raw_value)
+            self.fields[self._key] = value
+            completed[self._key] = value
+        self._expect = None
+        self._key = None
+
+    def result(self) -> dict:
+        """The whole object; raises ValueError if it never completed"""
+        if not self.complete:
+            raise ValueError("Could not parse JSON from AI response")
+        return json.loads(self.buffer[self._object_start:self._object_end])
+
+def sse_event(event: str, data: Any) -> str:
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
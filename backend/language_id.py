@@ -0,0 +1,180 @@
+"""
+Local Language Identification
+Character trigram (naive Bayes) language identifier for short voice commands.
+Profiles are built at import time from small built-in samples of the kind of
+requests Hapployed gets; non-Latin scripts are recognised from the script
+alone. Used to skip the LLM language-detection round trip when confident.
+The posterior only ranks the known languages, so text whose trigrams are
+mostly unseen in the winning profile (a language outside the set) is never
+reported as confident.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+MIN_CONFIDENCE = 0.99
+MIN_TRIGRAMS = 8
+# Share of the text's trigrams the winning profile must have seen
+MIN_COVERAGE = 0.3
+
+# Language subtag plus optional region/script/variant subtags ("en", "pt-br", "zh-hant-tw")
+LANGUAGE_TAG_PATTERN = re.compile(r"^[a-z]{2,8}(-[a-z0-9]{1,8})*$")
+SMOOTHING = 0.5
+
+LANGUAGE_NAMES = {
+    "en": "English", "es": "Spanish", "fr": "French", "pt": "Portuguese",
+    "de": "German", "sw": "Swahili", "zh": "Chinese", "ja": "Japanese",
+    "ko": "Korean", "ar": "Arabic", "ru": "Russian", "hi": "Hindi"
+}
+
+# Reply languages with cached confirmation templates (ISO 639-1); other
+# well-formed tags are still translated by the LLM, just not cached
+REPLY_LANGUAGES = {
+    **LANGUAGE_NAMES,
+    "it": "Italian", "nl": "Dutch", "pl": "Polish", "tr": "Turkish", "uk": "Ukrainian",
+    "ro": "Romanian", "el": "Greek", "sv": "Swedish", "he": "Hebrew", "fa": "Persian",
+    "ur": "Urdu", "bn": "Bengali", "th": "Thai", "vi": "Vietnamese", "id": "Indonesian",
+    "tl": "Tagalog", "am": "Amharic", "yo": "Yoruba", "ha": "Hausa", "zu": "Zulu"
+}
+
+SAMPLES: Dict[str, str] = {
+    "en": """I need a plumber right now, my kitchen pipe is leaking everywhere.
+        Find me someone to fix my door today. Please help, the power went out in the house.
+        Post a job for cleaning tomorrow morning. Show my jobs. Find an electrician near me.
+        Can you send somebody to help me move furniture this weekend? I locked myself out of my car.
+        The water heater is broken and there is no hot water. How much would it cost to paint the bedroom?
+        Who is available to mow the lawn and trim the hedges? I want to hire a handyman for small repairs.""",
+    "es": """Necesito un plomero ahora mismo, la tubería de la cocina está goteando por todas partes.
+        Búscame a alguien que arregle mi puerta hoy. Por favor ayuda, se fue la luz en la casa.
+        Publica un trabajo de limpieza para mañana por la mañana. Muéstrame mis trabajos. Busca un electricista cerca de mí.
+        ¿Puedes enviar a alguien para ayudarme a mover los muebles este fin de semana? Me quedé afuera de mi carro.
+        El calentador de agua está roto y no hay agua caliente. ¿Cuánto costaría pintar la habitación?
+        ¿Quién está disponible para cortar el césped? Quiero contratar a un técnico para pequeñas reparaciones.""",
+    "fr": """J'ai besoin d'un plombier tout de suite, le tuyau de la cuisine fuit partout.
+        Trouve-moi quelqu'un pour réparer ma porte aujourd'hui. Aidez-moi s'il vous plaît, il n'y a plus de courant dans la maison.
+        Publie une offre de ménage pour demain matin. Montre mes missions. Trouve un électricien près de chez moi.
+        Pouvez-vous envoyer quelqu'un pour m'aider à déménager les meubles ce week-end? Je suis enfermé dehors.
+        Le chauffe-eau est cassé et il n'y a pas d'eau chaude. Combien coûterait la peinture de la chambre?
+        Qui est disponible pour tondre la pelouse? Je veux engager un bricoleur pour des petites réparations.""",
+    "pt": """Preciso de um encanador agora mesmo, o cano da cozinha está vazando por todo lado.
+        Encontre alguém para consertar minha porta hoje. Por favor me ajude, acabou a luz em casa.
+        Publique um trabalho de limpeza para amanhã de manhã. Mostre meus trabalhos. Encontre um eletricista perto de mim.
+        Você pode mandar alguém para me ajudar a mudar os móveis neste fim de semana? Fiquei trancado do lado de fora.
+        O aquecedor de água quebrou e não tem água quente. Quanto custaria pintar o quarto?
+        Quem está disponível para cortar a grama? Quero contratar um faz-tudo para pequenos reparos.""",
+    "de": """Ich brauche sofort einen Klempner, das Rohr in der Küche ist überall undicht.
+        Finde jemanden, der heute meine Tür repariert. Bitte helfen Sie mir, im Haus ist der Strom ausgefallen.
+        Erstelle einen Auftrag für die Reinigung morgen früh. Zeige meine Aufträge. Finde einen Elektriker in meiner Nähe.
+        Kannst du jemanden schicken, der mir am Wochenende beim Möbelumzug hilft? Ich habe mich ausgesperrt.
+        Der Warmwasserbereiter ist kaputt und es gibt kein warmes Wasser. Wie viel würde es kosten, das Schlafzimmer zu streichen?
+        Wer hat Zeit, den Rasen zu mähen? Ich möchte einen Handwerker für kleine Reparaturen einstellen.""",
+    "sw": """Nahitaji fundi bomba sasa hivi, bomba la jikoni linavuja kila mahali.
+        Nitafutie mtu wa kutengeneza mlango wangu leo. Tafadhali nisaidie, umeme umekatika nyumbani.
+        Weka kazi ya usafi kwa kesho asubuhi. Nionyeshe kazi zangu. Nitafutie fundi umeme karibu nami.
+        Unaweza kutuma mtu wa kunisaidia kuhamisha samani wikendi hii? Nimejifungia nje ya gari langu.
+        Hita ya maji imeharibika na hakuna maji ya moto. Itagharimu kiasi gani kupaka rangi chumba cha kulala?
+        Nani yupo kukata nyasi? Nataka kuajiri fundi kwa matengenezo madogo. Habari yako, asante sana.""",
+}
+
+# Unicode name prefix -> language, for scripts that identify the language on their own
+SCRIPT_LANGUAGES = (
+    ("HIRAGANA", "ja"), ("KATAKANA", "ja"), ("HANGUL", "ko"),
+    ("CJK", "zh"), ("ARABIC", "ar"), ("CYRILLIC", "ru"), ("DEVANAGARI", "hi")
+)
+
+def _normalize(text: str) -> str:
+    text = re.sub(r"[^\w']+", " ", text.lower())
+    return f" {' '.join(text.split())} "
+
+def _trigrams(text: str) -> Counter:
+    normalized = _normalize(text)
+    return Counter(normalized[i:i + 3] for i in range(len(normalized) - 2))
+
+def _build_profiles() -> Dict[str, Tuple[Dict[str, float], float]]:
+    """Per language: smoothed log-probabilities of seen trigrams, plus the unseen one"""
+    counts = {code: _trigrams(sample) for code, sample in SAMPLES.items()}
+    vocabulary = set().union(*counts.values())
+    profiles = {}
+    for code, grams in counts.items():
+        denominator = sum(grams.values()) + SMOOTHING * (len(vocabulary) + 1)
+        profiles[code] = (
+            {gram: math.log((count + SMOOTHING) / denominator) for gram, count in grams.items()},
+            math.log(SMOOTHING / denominator)
+        )
+    return profiles
+
+PROFILES = _build_profiles()
+
+def _script_language(text: str) -> Optional[str]:
+    letters = [ch for ch in text if ch.isalpha()]
+    if not letters:
+        return None
+    votes = Counter()
+    for ch in letters:
+        name = unicodedata.name(ch, "")
+        for prefix, code in SCRIPT_LANGUAGES:
+            if name.startswith(prefix):
+                votes[code] += 1
+                break
+    if not votes:
+        return None
+    code = votes.most_common(1)[0][0]
+    # Any kana means Japanese even when kanji dominate
+    if votes.get("ja"):
+        code = "ja"
+    return code if sum(votes.values()) >= len(letters) / 2 else None
+
+def identify(text: str) -> Tuple[str, float]:
+    """Most likely language code and its posterior probability (0-1)"""
+    script_code = _script_language(text)
+    if script_code:
+        return script_code, 1.0
+
+    grams = _trigrams(text)
+    if sum(grams.values()) == 0:
+        return "en", 0.0
+
+    scores = {}
+    for code, (log_probs, unseen) in PROFILES.items():
+        scores[code] = sum(count * log_probs.get(gram, unseen) for gram, count in grams.items())
+
+    best = max(scores, key=scores.get)
+    total = sum(math.exp(score - scores[best]) for score in scores.values())
+    confidence = 1.0 / total
+
+    # Too little text to trust the posterior, or most likely not one of the known languages
+    total_grams = sum(grams.values())
+    seen = sum(count for gram, count in grams.items() if gram in PROFILES[best][0])
+    if total_grams < MIN_TRIGRAMS or seen / total_grams < MIN_COVERAGE:
+        confidence = min(confidence, MIN_CONFIDENCE - 0.01)
+    return best, confidence
+
+def detect_language_locally(text: str, min_confidence: float = MIN_CONFIDENCE) -> Optional[dict]:
+    """detect-language style result when the local model is confident, else None"""
+    code, confidence = identify(text)
+    if confidence < min_confidence:
+        return None
+    return {
+        "language": LANGUAGE_NAMES.get(code, code),
+        "languageCode": code,
+        "confidence": "high",
+        "source": "local"
+    }
+
+def language_tag(value: Optional[str]) -> Optional[str]:
+    """Lower-cased BCP 47 style language tag ("pt_BR" -> "pt-br"), or None if malformed"""
+    if not isinstance(value, str):
+        return None
+    tag = value.strip().lower().replace("_", "-")
+    return tag if LANGUAGE_TAG_PATTERN.match(tag) else None
+
+def reply_language_code(value: Optional[str]) -> Optional[str]:
+    """Supported ISO 639-1 code for a requested reply language ("pt-BR" -> "pt"), else None"""
+    tag = language_tag(value)
+    if tag is None:
+        return None
+    code = tag.split("-")[0]
+    return code if code in REPLY_LANGUAGES else None
@@ -0,0 +1,322 @@
+"""
+LLM Response Cache
+Content-addressed cache for LLM completions, keyed on model + system prompt +
+user input. An in-memory LRU tier with TTL sits in front of an optional
+SQLite tier (LLM_CACHE_DISK_PATH) that survives restarts. Concurrent identical
+requests are coalesced so only one upstream call is in flight per key.
+
+stream_json() streams the same completions field by field for SSE endpoints.
+
+Upstream calls go through llm_gateway. Run `python llm_cache.py` for an
+offline hit-rate/latency benchmark against the fake provider.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from json_stream import IncrementalJSONParser, sse_event
+from llm_gateway import DEFAULT_MODEL, send_prompt, stream_prompt
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_DISK_PATH = os.environ.get("LLM_CACHE_DISK_PATH") or None
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + optional SQLite) TTL cache with request coalescing"""
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        disk_path: Optional[str] = LLM_CACHE_DISK_PATH
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        # key -> (expires_at, value), oldest first
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "upstream_errors": 0}
+
+    @staticmethod
+    def make_key(model: Tuple[str, str], system_message: str, text: str) -> str:
+        payload = json.dumps([list(model), system_message, text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["coalesced"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.disk_path:
+            self._disk_execute("DELETE FROM llm_cache")
+
+    # Memory tier ----------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # Disk tier ------------------------------------------------------------
+
+    def _disk_execute(self, sql: str, params: tuple = ()) -> list:
+        with self._disk_lock:
+            if self._disk is None:
+                self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+                self._disk.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+            rows = self._disk.execute(sql, params).fetchall()
+            self._disk.commit()
+            return rows
+
+    async def _disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        rows = await asyncio.to_thread(
+            self._disk_execute,
+            "SELECT expires_at, value FROM llm_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        )
+        return rows[0] if rows else None
+
+    async def _disk_set(self, key: str, value: str, expires_at: float) -> None:
+        await asyncio.to_thread(
+            self._disk_execute,
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at)
+        )
+
+    # Public API -----------------------------------------------------------
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+
+        if self.disk_path:
+            try:
+                entry = await self._disk_get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM disk cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                expires_at, value = entry
+                self._memory_set(key, value, expires_at)
+                self.stats["disk_hits"] += 1
+                return value
+
+        return None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl_seconds if ttl is None else ttl)
+        self._memory_set(key, value, expires_at)
+        if self.disk_path:
+            try:
+                await self._disk_set(key, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM disk cache write failed: {e}")
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[str]],
+        ttl: Optional[float] = None
+    ) -> str:
+        """
+        Cached value for key, or the result of fetch(). Callers arriving while a
+        fetch for the same key is running wait for it instead of calling again.
+        fetch() should raise for responses that must not be cached.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self.stats["misses"] += 1
+        pending = asyncio.ensure_future(self._fetch_and_store(key, fetch, ttl))
+        self._inflight[key] = pending
+        pending.add_done_callback(lambda task: self._fetch_done(key, task))
+        return await asyncio.shield(pending)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[str]], ttl: Optional[float]) -> str:
+        value = await fetch()
+        await self.set(key, value, ttl)
+        return value
+
+    def _fetch_done(self, key: str, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["upstream_errors"] += 1
+
+llm_cache = LLMResponseCache()
+
+# ============================================================================
+# COMPLETIONS
+# ============================================================================
+
+async def complete_json(
+    system_message: str,
+    text: str,
+    model: Tuple[str, str] = DEFAULT_MODEL,
+    ttl: Optional[float] = None,
+    cache: LLMResponseCache = llm_cache
+) -> dict:
+    """
+    JSON completion through the cache. Only responses that parse as JSON are
+    cached; each caller gets its own freshly parsed copy.
+    """
+    async def fetch() -> str:
+        response = await send_prompt(system_message, text, model)
+        json.loads(response)
+        return response
+
+    key = cache.make_key(model, system_message, text)
+    return json.loads(await cache.get_or_fetch(key, fetch, ttl))
+
+async def stream_json(
+    system_message: str,
+    text: str,
+    model: Tuple[str, str] = DEFAULT_MODEL,
+    ttl: Optional[float] = None,
+    cache: Optional[LLMResponseCache] = llm_cache
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of complete_json: yields the top-level fields each
+    chunk completes (together they make up the whole object). Cache hits come
+    back as a single dict; a completed stream is stored in the cache.
+    Streams are not coalesced.
+    """
+    key = cache.make_key(model, system_message, text) if cache is not None else None
+    if cache is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            yield json.loads(cached)
+            return
+        cache.stats["misses"] += 1
+
+    parser = IncrementalJSONParser()
+    async for chunk in stream_prompt(system_message, text, model):
+        fields = parser.feed(chunk)
+        if fields:
+            yield fields
+
+    result = parser.result()
+    if cache is not None:
+        await cache.set(key, json.dumps(result), ttl)
+
+async def stream_json_events(
+    system_message: str,
+    text: str,
+    finalize: Callable[[dict], Any],
+    model: Tuple[str, str] = DEFAULT_MODEL
+) -> AsyncIterator[str]:
+    """
+    SSE frames for a streamed JSON completion: a "partial" event per batch of
+    completed fields, then "done" with finalize(whole object), or "error"
+    """
+    result: Dict[str, Any] = {}
+    try:
+        async for fields in stream_json(system_message, text, model):
+            result.update(fields)
+            yield sse_event("partial", fields)
+        yield sse_event("done", finalize(result))
+    except Exception as e:
+        logger.error(f"Streaming completion failed: {e}")
+        yield sse_event("error", {"detail": str(e)})
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _benchmark(requests: int = 400, distinct_prompts: int = 40, concurrency: int = 40) -> None:
+    """Replay a skewed SOS prompt mix against the fake provider, with and without the cache"""
+    import random
+    import statistics
+    import fake_llm
+    import llm_gateway
+
+    llm_gateway.LLM_PROVIDER = "fake"
+    fake_llm.FAKE_LLM_LATENCY_SECONDS = 0.05
+    fake_llm.FAKE_LLM_JITTER_SECONDS = 0.02
+
+    system_message = "Detect the user's intent and respond ONLY in JSON format"
+    rng = random.Random(7)
+    prompts = [f"need help now #{i}" for i in range(distinct_prompts)]
+    # Zipf-like mix: a few prompts ("need help now") dominate SOS traffic
+    weights = [1 / (rank + 1) for rank in range(distinct_prompts)]
+    workload = rng.choices(prompts, weights=weights, k=requests)
+
+    async def run(cached: bool) -> Tuple[list, LLMResponseCache]:
+        cache = LLMResponseCache(max_entries=1024, ttl_seconds=600, disk_path=None)
+        gate = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(prompt: str) -> None:
+            async with gate:
+                started = time.perf_counter()
+                if cached:
+                    await complete_json(system_message, f"User prompt: {prompt}", cache=cache)
+                else:
+                    json.loads(await send_prompt(system_message, f"User prompt: {prompt}"))
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(one(prompt) for prompt in workload))
+        return latencies, cache
+
+    async def main() -> None:
+        for cached in (False, True):
+            started = time.perf_counter()
+            latencies, cache = await run(cached)
+            elapsed = time.perf_counter() - started
+            quantiles = statistics.quantiles(latencies, n=20)
+            upstream = cache.stats["misses"] if cached else requests
+            print(
+                f"{'cached' if cached else 'uncached':>8}: {requests} requests in {elapsed:.2f}s, "
+                f"upstream calls {upstream}, hit rate {cache.hit_rate:.0%}, "
+                f"p50 {statistics.median(latencies):.1f}ms, p95 {quantiles[18]:.1f}ms"
+            )
+
+    asyncio.run(main())
+
+if __name__ == "__main__":
+    _benchmark()
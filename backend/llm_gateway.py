@@ -0,0 +1,339 @@
+"""
+LLM Gateway
+Single path for every LLM call. Per model it enforces a concurrency limit
+(semaphore), a timeout bounded by the caller's deadline, and a circuit
+breaker that fails fast after repeated failures so routes drop straight to
+their fallback responses instead of piling up on a slow provider. Latency and
+error counts are kept per model (GET /api/llm/metrics).
+
+Deadlines propagate through contextvars: wrap a request in
+`with llm_deadline(seconds):` and every LLM call made under it (including
+concurrent ones) gets at most the time that is left.
+
+Set LLM_PROVIDER=fake to answer from fake_llm.FakeLlmChat instead of the real
+provider. Run `python llm_gateway.py` to simulate a slow provider offline.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fake_llm import FakeLlmChat
+
+try:
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+except ImportError:  # only the fake provider is usable without it
+    LlmChat = UserMessage = None
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "emergent")
+DEFAULT_MODEL: Tuple[str, str] = ("openai", "gpt-5")
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+
+LATENCY_WINDOW = 500
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("llm_deadline", default=None)
+
+class LLMUnavailable(Exception):
+    """The LLM call was not made or did not finish (circuit open, timeout, overload)"""
+
+class LLMTimeout(LLMUnavailable):
+    pass
+
+class LLMCircuitOpen(LLMUnavailable):
+    pass
+
+@contextmanager
+def llm_deadline(seconds: float):
+    """Bound all LLM calls in this context to finish within `seconds` (never extends an outer deadline)"""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time(default: float = LLM_TIMEOUT_SECONDS) -> float:
+    """Seconds left for an LLM call: the timeout, capped by the current deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return min(default, deadline - time.monotonic())
+
+# ============================================================================
+# CIRCUIT BREAKER AND METRICS
+# ============================================================================
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half_open (one probe) after reset_seconds"""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"LLM circuit opened after {self.failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """A probe ended without an outcome (e.g. cancelled)"""
+        self._probe_in_flight = False
+
+class ModelMetrics:
+    def __init__(self):
+        self.counts = {"calls": 0, "success": 0, "errors": 0, "timeouts": 0, "rejected": 0}
+        self.in_flight = 0
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
+
+        return {
+            **self.counts,
+            "in_flight": self.in_flight,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)}
+        }
+
+# ============================================================================
+# GATEWAY
+# ============================================================================
+
+class LLMGateway:
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = LLM_BREAKER_RESET_SECONDS
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._semaphores: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._metrics: Dict[Tuple[str, str], ModelMetrics] = {}
+
+    def _model_state(self, model: Tuple[str, str]):
+        if model not in self._breakers:
+            self._semaphores[model] = asyncio.Semaphore(self.max_concurrency)
+            self._breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+            self._metrics[model] = ModelMetrics()
+        return self._semaphores[model], self._breakers[model], self._metrics[model]
+
+    def metrics(self) -> dict:
+        return {
+            "/".join(model): {**self._metrics[model].snapshot(), "circuit": self._breakers[model].state}
+            for model in self._breakers
+        }
+
+    async def _acquire(self, model: Tuple[str, str]) -> Tuple[float, CircuitBreaker, ModelMetrics]:
+        """Admit a call: breaker check, then a semaphore slot within the deadline. Returns time left."""
+        semaphore, breaker, metrics = self._model_state(model)
+        metrics.counts["calls"] += 1
+
+        if not breaker.allow():
+            metrics.counts["rejected"] += 1
+            raise LLMCircuitOpen(f"LLM circuit open for {'/'.join(model)}")
+
+        budget = remaining_time(self.timeout)
+        started = time.monotonic()
+        try:
+            if budget <= 0:
+                raise asyncio.TimeoutError
+            await asyncio.wait_for(semaphore.acquire(), timeout=budget)
+        except asyncio.TimeoutError:
+            breaker.release_probe()
+            metrics.counts["timeouts"] += 1
+            raise LLMTimeout(f"No LLM capacity for {'/'.join(model)} within the deadline")
+        except BaseException:
+            breaker.release_probe()
+            raise
+
+        metrics.in_flight += 1
+        return budget - (time.monotonic() - started), breaker, metrics
+
+    def _release(self, model: Tuple[str, str], metrics: ModelMetrics) -> None:
+        metrics.in_flight -= 1
+        self._semaphores[model].release()
+
+    def _record(self, breaker: CircuitBreaker, metrics: ModelMetrics, started: float, error: Optional[BaseException]) -> None:
+        if isinstance(error, asyncio.CancelledError):
+            breaker.release_probe()
+            return
+        metrics.latencies_ms.append((time.monotonic() - started) * 1000)
+        if error is None:
+            metrics.counts["success"] += 1
+            breaker.record_success()
+            return
+        metrics.counts["timeouts" if isinstance(error, LLMTimeout) else "errors"] += 1
+        breaker.record_failure()
+
+    async def send(self, system_message: str, text: str, model: Tuple[str, str] = DEFAULT_MODEL) -> str:
+        """One completion, bounded by the gateway's limits"""
+        budget, breaker, metrics = await self._acquire(model)
+        started = time.monotonic()
+        error = None
+        try:
+            chat = new_chat(system_message, model=model)
+            try:
+                return await asyncio.wait_for(chat.send_message(user_message(text)), timeout=max(budget, 0))
+            except asyncio.TimeoutError:
+                raise LLMTimeout(f"LLM call to {'/'.join(model)} timed out")
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._release(model, metrics)
+            self._record(breaker, metrics, started, error)
+
+    async def stream(self, system_message: str, text: str, model: Tuple[str, str] = DEFAULT_MODEL) -> AsyncIterator[str]:
+        """Completion chunks as they arrive; the whole stream shares one deadline"""
+        budget, breaker, metrics = await self._acquire(model)
+        started = time.monotonic()
+        deadline = started + max(budget, 0)
+        error = None
+        try:
+            chat = new_chat(system_message, model=model)
+            message = user_message(text)
+            stream = getattr(chat, "stream_message", None)
+            try:
+                if stream is None:
+                    yield await asyncio.wait_for(chat.send_message(message), timeout=max(budget, 0))
+                    return
+                chunks = stream(message).__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - time.monotonic(), 0))
+                    except StopAsyncIteration:
+                        break
+                    yield chunk
+            except asyncio.TimeoutError:
+                raise LLMTimeout(f"LLM stream from {'/'.join(model)} timed out")
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._release(model, metrics)
+            # A consumer that stops early (GeneratorExit) is not a provider failure
+            self._record(breaker, metrics, started, None if isinstance(error, GeneratorExit) else error)
+
+llm_gateway = LLMGateway()
+
+# ============================================================================
+# PROVIDER
+# ============================================================================
+
+def new_chat(system_message: str, session_id: Optional[str] = None, model: Tuple[str, str] = DEFAULT_MODEL):
+    """LlmChat (or the fake stand-in) for one system prompt"""
+    session_id = session_id or str(uuid.uuid4())
+    if LLM_PROVIDER == "fake":
+        return FakeLlmChat(session_id=session_id, system_message=system_message).with_model(*model)
+    if LlmChat is None:
+        raise RuntimeError("emergentintegrations is not installed; set LLM_PROVIDER=fake to run offline")
+    return LlmChat(
+        api_key=os.getenv('EMERGENT_LLM_KEY'),
+        session_id=session_id,
+        system_message=system_message
+    ).with_model(*model)
+
+def user_message(text: str):
+    return UserMessage(text=text) if UserMessage is not None else text
+
+async def send_prompt(system_message: str, text: str, model: Tuple[str, str] = DEFAULT_MODEL) -> str:
+    """One uncached completion through the gateway"""
+    return await llm_gateway.send(system_message, text, model)
+
+async def stream_prompt(system_message: str, text: str, model: Tuple[str, str] = DEFAULT_MODEL) -> AsyncIterator[str]:
+    """Completion text as it arrives (one chunk if the provider cannot stream)"""
+    async for chunk in llm_gateway.stream(system_message, text, model):
+        yield chunk
+
+# ============================================================================
+# SIMULATION
+# ============================================================================
+
+def _simulate(requests: int = 60, provider_latency: float = 2.0, timeout: float = 0.5) -> None:
+    """Drive a slow fake provider: calls time out, the breaker opens, later calls fail fast"""
+    import fake_llm
+
+    global LLM_PROVIDER
+    LLM_PROVIDER = "fake"
+    fake_llm.FAKE_LLM_LATENCY_SECONDS = provider_latency
+    fake_llm.FAKE_LLM_JITTER_SECONDS = 0.0
+
+    gateway = LLMGateway(max_concurrency=4, timeout=timeout, failure_threshold=3, reset_seconds=60)
+
+    async def one(i: int) -> Tuple[str, float]:
+        started = time.perf_counter()
+        try:
+            await gateway.send("Detect the user's intent", f"User prompt: need help #{i}")
+            outcome = "ok"
+        except LLMCircuitOpen:
+            outcome = "circuit_open"
+        except LLMTimeout:
+            outcome = "timeout"
+        return outcome, (time.perf_counter() - started) * 1000
+
+    async def run() -> None:
+        results = []
+        for start in range(0, requests, 10):
+            # Bursts of 10 with a per-request deadline of 1s
+            async def with_deadline(i: int):
+                with llm_deadline(1.0):
+                    return await one(i)
+            results += await asyncio.gather(*(with_deadline(i) for i in range(start, start + 10)))
+
+        by_outcome: Dict[str, list] = {}
+        for outcome, latency in results:
+            by_outcome.setdefault(outcome, []).append(latency)
+        for outcome, latencies in by_outcome.items():
+            print(f"{outcome:>12}: {len(latencies):3d} requests, max latency {max(latencies):.0f}ms")
+        print(gateway.metrics())
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    _simulate()
@@ -0,0 +1,146 @@
+"""
+Worker Location Ingest
+Coalesces real-time GPS pings in memory and writes them to worker_locations
+as one bulk upsert per flush interval. Only the latest ping per worker within
+a window is written. "Latest location" reads are served from memory only for
+pings this process has not flushed yet (they are newer than the database row);
+everything else is read from worker_locations, which every worker writes to.
+Requires ADD_WORKER_LOCATION_UPSERT.sql (unique worker_id, default id).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from supabase_client import get_supabase_admin, run_query
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FLUSH_INTERVAL_SECONDS = float(os.environ.get("LOCATION_FLUSH_INTERVAL_SECONDS", "2"))
+LOCATION_MAX_BATCH_SIZE = int(os.environ.get("LOCATION_MAX_BATCH_SIZE", "500"))
+# Unflushed pings older than this are not served (another worker may have a newer one)
+LOCATION_UNFLUSHED_TTL_SECONDS = float(os.environ.get("LOCATION_UNFLUSHED_TTL_SECONDS", "10"))
+LOCATION_UNFLUSHED_MAX_ENTRIES = int(os.environ.get("LOCATION_UNFLUSHED_MAX_ENTRIES", "10000"))
+
+class LocationIngest:
+    """In-memory latest-location buffer with a periodic bulk-upsert flusher"""
+
+    def __init__(
+        self,
+        flush_interval: float = LOCATION_FLUSH_INTERVAL_SECONDS,
+        max_batch_size: int = LOCATION_MAX_BATCH_SIZE,
+        unflushed_ttl: float = LOCATION_UNFLUSHED_TTL_SECONDS,
+        unflushed_max_entries: int = LOCATION_UNFLUSHED_MAX_ENTRIES
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.unflushed_ttl = unflushed_ttl
+        self.unflushed_max_entries = unflushed_max_entries
+        # Pings not yet written, keyed by worker id (newer pings overwrite older ones)
+        self._pending: Dict[str, dict] = {}
+        # Readable view of unflushed pings: worker id -> (expires at, row), oldest first
+        self._unflushed: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._batch_ready = asyncio.Event()
+
+    def submit(self, worker_id: str, latitude: float, longitude: float, is_available: bool = True) -> dict:
+        """Record a ping; returns the row that will be written on the next flush"""
+        row = {
+            "worker_id": worker_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "is_available": is_available,
+            "last_updated": datetime.now(timezone.utc).isoformat()
+        }
+        self._pending[worker_id] = row
+        self._unflushed[worker_id] = (time.monotonic() + self.unflushed_ttl, row)
+        self._unflushed.move_to_end(worker_id)
+        while len(self._unflushed) > self.unflushed_max_entries:
+            self._unflushed.popitem(last=False)
+
+        self._ensure_flusher()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_ready.set()
+
+        return row
+
+    def get_unflushed(self, worker_id: str) -> Optional[dict]:
+        """Recent ping from this process that is not in the database yet, or None"""
+        entry = self._unflushed.get(worker_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._unflushed[worker_id]
+            return None
+        return entry[1]
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Worker location flush failed: {e}")
+
+    async def flush(self) -> int:
+        """Write all pending pings as one upsert; returns the number of rows written"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+
+            try:
+                supabase = get_supabase_admin()
+                await run_query(
+                    supabase.table('worker_locations').upsert(list(batch.values()), on_conflict='worker_id')
+                )
+            except Exception:
+                # Put the batch back unless a newer ping arrived meanwhile
+                for worker_id, row in batch.items():
+                    self._pending.setdefault(worker_id, row)
+                raise
+
+            # Written rows are read back from the database from now on
+            for worker_id, row in batch.items():
+                entry = self._unflushed.get(worker_id)
+                if entry is not None and entry[1] is row:
+                    del self._unflushed[worker_id]
+
+            return len(batch)
+
+    async def stop(self) -> None:
+        """Cancel the flusher and write whatever is still pending"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Final worker location flush failed: {e}")
+
+location_ingest = LocationIngest()
@@ -0,0 +1,125 @@
+"""
+Match Scoring Helpers
+Local pre-ranking, versioned result caching and context-sized chunking for
+LLM gig/worker match scoring (/ai-matching). The pre-ranker is a cheap
+weighted score used to shortlist gigs before any are sent to the LLM, and as
+the fallback score when the LLM is unavailable.
+"""
+
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from llm_cache import LLMResponseCache
+
+# Input budget per batch prompt (tokens) and a cap on pairs so the JSON answer fits too
+MATCH_BATCH_CONTEXT_TOKENS = int(os.environ.get("MATCH_BATCH_CONTEXT_TOKENS", "6000"))
+MATCH_BATCH_MAX_PAIRS = int(os.environ.get("MATCH_BATCH_MAX_PAIRS", "15"))
+MATCH_CACHE_TTL_SECONDS = float(os.environ.get("MATCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+GIG_VERSION_FIELDS = ("title", "category", "location", "budget", "urgent", "requirements", "skills", "updated_at")
+PROFILE_VERSION_FIELDS = (
+    "skills", "experience", "preferred_areas", "preferred_days",
+    "rating", "completed_gigs", "available_now", "updated_at"
+)
+
+PRERANK_WEIGHTS = {"skills": 0.5, "location": 0.2, "availability": 0.15, "reputation": 0.15}
+
+# (gig id, gig version, worker id, profile version) -> match_data JSON
+match_score_cache = LLMResponseCache(max_entries=20000, ttl_seconds=MATCH_CACHE_TTL_SECONDS, disk_path=None)
+
+def content_version(record: Dict, fields: Sequence[str]) -> str:
+    """Short hash of the fields that feed the match prompt; changes when they do"""
+    payload = json.dumps({field: record.get(field) for field in fields}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def match_cache_key(gig_id: str, gig: Dict, worker_id: str, profile: Dict) -> str:
+    return ":".join([
+        "match", str(gig_id), content_version(gig, GIG_VERSION_FIELDS),
+        str(worker_id), content_version(profile, PROFILE_VERSION_FIELDS)
+    ])
+
+def _lower_list(values) -> List[str]:
+    if not values:
+        return []
+    if isinstance(values, str):
+        values = [values]
+    return [str(value).lower() for value in values]
+
+def prerank_score(gig: Dict, profile: Dict) -> float:
+    """Cheap 0-100 compatibility estimate from skills, location, availability and rating"""
+    worker_skills = set(_lower_list(profile.get("skills")))
+    required = _lower_list(gig.get("requirements")) + _lower_list(gig.get("skills"))
+    category = str(gig.get("category") or "").lower()
+
+    if required:
+        matched = sum(1 for skill in required if skill in worker_skills or any(skill in own for own in worker_skills))
+        skills = matched / len(required) * 100
+    else:
+        skills = 30.0
+    if category and any(category in own or own in category for own in worker_skills):
+        skills = max(skills, 70.0)
+
+    areas = _lower_list(profile.get("preferred_areas"))
+    location = str(gig.get("location") or "").lower()
+    if not areas:
+        location_score = 50.0
+    elif location and any(area in location or location in area for area in areas):
+        location_score = 100.0
+    else:
+        location_score = 20.0
+
+    available = bool(profile.get("available_now"))
+    if gig.get("urgent"):
+        availability = 100.0 if available else 20.0
+    else:
+        availability = 100.0 if available else 60.0
+
+    try:
+        reputation = min(max(float(profile.get("rating") or 0), 0.0), 5.0) / 5 * 100
+    except (TypeError, ValueError):
+        reputation = 0.0
+
+    scores = {"skills": skills, "location": location_score, "availability": availability, "reputation": reputation}
+    return round(sum(scores[key] * weight for key, weight in PRERANK_WEIGHTS.items()), 1)
+
+def shortlist(gigs: Iterable[Dict], profile: Dict, limit: int) -> List[Tuple[Dict, float]]:
+    """Top `limit` gigs by pre-rank score, best first"""
+    scored = [(gig, prerank_score(gig, profile)) for gig in gigs]
+    scored.sort(key=lambda pair: pair[1], reverse=True)
+    return scored[:limit]
+
+def local_match_data(prescore: float) -> Dict:
+    """match_data shaped like the LLM's, from the pre-rank score alone"""
+    return {
+        "match_score": int(round(prescore)),
+        "confidence": "low",
+        "strengths": [],
+        "concerns": [],
+        "recommendation": "Estimated from skills, location, availability and rating",
+        "key_insights": []
+    }
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def chunk_by_tokens(
+    items: Sequence,
+    render: Callable[[object], str],
+    budget: int = MATCH_BATCH_CONTEXT_TOKENS,
+    max_items: int = MATCH_BATCH_MAX_PAIRS
+) -> List[list]:
+    """Split items into chunks whose rendered text fits the token budget and item cap"""
+    chunks, current, used = [], [], 0
+    for item in items:
+        cost = estimate_tokens(render(item))
+        if current and (used + cost > budget or len(current) >= max_items):
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
@@ -1,18 +1,37 @@
 """
 Messaging Routes - Supabase PostgreSQL Version
 Real-time messaging system for users
+New messages and unread-count changes are pushed over WebSocket
+(/ws/messages/{userId}) through the realtime hub.
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional, List
-from datetime import datetime, timezone
+from datetime import datetime
+import asyncio
+import base64
+import logging
 import uuid
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
+from realtime_hub import realtime_hub
+from auth_routes_supabase import decode_access_token, USE_MOCK_AUTH
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="", tags=["Messaging"])
 
+# Inbox page size (GET /conversations/{userId}?limit=)
+CONVERSATIONS_PAGE_SIZE = 50
+CONVERSATIONS_MAX_PAGE_SIZE = 100
+CONVERSATION_COLUMNS = 'id, participants, last_message_id, last_message, unread_counts, created_at, updated_at'
+# SQLSTATE raised by send_message_atomic() for an unknown conversation
+CONVERSATION_NOT_FOUND = 'P0002'
+# Time a websocket client has to send {"type": "auth", "token"} when no ?token= is given
+WEBSOCKET_AUTH_TIMEOUT_SECONDS = 10
+
 # ============================================================================
 # MODELS
 # ============================================================================
@@ -42,90 +61,89 @@ class ConversationResponse(BaseModel):
     createdAt: str
     updatedAt: str
 
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def last_message_snapshot(msg: dict) -> dict:
+    """lastMessage as shown in the inbox, from a messages row"""
+    return {
+        'id': msg['id'],
+        'content': msg['content'],
+        'senderId': msg['sender_id'],
+        'createdAt': msg['created_at']
+    }
+
+def format_message(msg: dict) -> dict:
+    """MessageResponse fields from a messages row"""
+    return {
+        'id': msg['id'],
+        'conversationId': msg['conversation_id'],
+        'senderId': msg['sender_id'],
+        'receiverId': msg['receiver_id'],
+        'content': msg['content'],
+        'relatedJobId': msg.get('related_job_id'),
+        'isRead': msg.get('is_read', False),
+        'createdAt': msg['created_at']
+    }
+
+def encode_conversation_cursor(conv: dict) -> str:
+    """Opaque keyset cursor for the conversation after which the next page starts"""
+    raw = f"{conv['updated_at']}|{conv['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_conversation_cursor(cursor: str) -> tuple:
+    """
+    (updated_at, conversation_id) re-serialized from a parsed timestamp and UUID,
+    so nothing from the client reaches the PostgREST filter verbatim
+    """
+    try:
+        updated_at, conversation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(updated_at).isoformat(), str(uuid.UUID(conversation_id))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
 # ============================================================================
 # ROUTES
 # ============================================================================
 
 @router.post("/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(message: MessageCreate):
-    """Send a new message"""
+    """
+    Send a new message
+    One send_message_atomic() call finds or creates the conversation by
+    participant pair, stores the message and bumps the receiver's unread count.
+    """
     try:
         supabase = get_supabase_admin()
         
-        conversation_id = message.conversationId
-        
-        # Find or create conversation
-        if not conversation_id:
-            # Check if conversation exists between these users
-            result = supabase.table('conversations').select('*').contains('participants', [message.senderId, message.receiverId]).execute()
-            
-            if result.data and len(result.data) > 0:
-                # Find exact match (both users in participants)
-                for conv in result.data:
-                    if set(conv['participants']) == {message.senderId, message.receiverId}:
-                        conversation_id = conv['id']
-                        break
-            
-            # Create new conversation if not found
-            if not conversation_id:
-                conversation_id = str(uuid.uuid4())
-                new_conversation = {
-                    'id': conversation_id,
-                    'participants': [message.senderId, message.receiverId],
-                    'last_message_id': None,
-                    'unread_count': 0,
-                    'created_at': datetime.now(timezone.utc).isoformat(),
-                    'updated_at': datetime.now(timezone.utc).isoformat()
-                }
-                supabase.table('conversations').insert(new_conversation).execute()
-        
-        # Create message
-        message_id = str(uuid.uuid4())
-        timestamp = datetime.now(timezone.utc).isoformat()
-        
-        message_dict = {
-            'id': message_id,
-            'conversation_id': conversation_id,
-            'sender_id': message.senderId,
-            'receiver_id': message.receiverId,
-            'content': message.content,
-            'related_job_id': message.relatedJobId,
-            'is_read': False,
-            'created_at': timestamp
-        }
-        
-        msg_result = supabase.table('messages').insert(message_dict).execute()
-        
-        if not msg_result.data or len(msg_result.data) == 0:
+        try:
+            result = await run_query(supabase.rpc('send_message_atomic', {
+                'p_sender_id': message.senderId,
+                'p_receiver_id': message.receiverId,
+                'p_content': message.content,
+                'p_conversation_id': message.conversationId,
+                'p_related_job_id': message.relatedJobId
+            }))
+        except Exception as e:
+            if getattr(e, 'code', None) == CONVERSATION_NOT_FOUND:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+            raise
+        
+        if not result.data:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to send message"
             )
         
-        # Update conversation
-        supabase.table('conversations').update({
-            'last_message_id': message_id,
-            'updated_at': timestamp
-        }).eq('id', conversation_id).execute()
+        sent = format_message(result.data)
+        await realtime_hub.publish([message.senderId, message.receiverId], 'message.new', sent)
+        await realtime_hub.publish([message.receiverId], 'unread.updated', {
+            'conversationId': sent['conversationId'],
+            'unreadCount': result.data.get('receiver_unread_count', 0)
+        })
         
-        # Increment unread count for receiver
-        conv = supabase.table('conversations').select('unread_count').eq('id', conversation_id).execute()
-        if conv.data and len(conv.data) > 0:
-            current_unread = conv.data[0].get('unread_count', 0)
-            supabase.table('conversations').update({
-                'unread_count': current_unread + 1
-            }).eq('id', conversation_id).execute()
-        
-        return {
-            'id': message_id,
-            'conversationId': conversation_id,
-            'senderId': message.senderId,
-            'receiverId': message.receiverId,
-            'content': message.content,
-            'relatedJobId': message.relatedJobId,
-            'isRead': False,
-            'createdAt': timestamp
-        }
+        return sent
         
     except HTTPException:
         raise
@@ -136,40 +154,57 @@ async def send_message(message: MessageCreate):
         )
 
 @router.get("/conversations/{userId}", response_model=List[ConversationResponse])
-async def get_user_conversations(userId: str):
-    """Get all conversations for a user"""
+async def get_user_conversations(
+    userId: str,
+    response: Response,
+    limit: int = CONVERSATIONS_PAGE_SIZE,
+    cursor: Optional[str] = None
+):
+    """
+    Get a user's conversations, most recently updated first
+    One page per call, with the last message taken from the snapshot stored on
+    the conversation. When more remain, the X-Next-Cursor response header holds
+    the cursor for the next page.
+    """
     try:
         supabase = get_supabase_admin()
-        
-        # Get conversations where user is a participant
-        result = supabase.table('conversations').select('*').contains('participants', [userId]).order('updated_at', desc=True).execute()
+        limit = max(1, min(limit, CONVERSATIONS_MAX_PAGE_SIZE))
+        
+        # Get conversations where user is a participant (one extra row tells us if there is a next page)
+        query = supabase.table('conversations').select(CONVERSATION_COLUMNS).contains('participants', [userId])
+        if cursor:
+            updated_at, conversation_id = decode_conversation_cursor(cursor)
+            query = query.or_(
+                f'updated_at.lt."{updated_at}",'
+                f'and(updated_at.eq."{updated_at}",id.lt."{conversation_id}")'
+            )
+        result = await run_query(query.order('updated_at', desc=True).order('id', desc=True).limit(limit + 1))
         
         conversations = result.data if result.data else []
+        if len(conversations) > limit:
+            conversations = conversations[:limit]
+            response.headers['X-Next-Cursor'] = encode_conversation_cursor(conversations[-1])
+        
+        # Conversations written before the snapshot existed: one batched lookup
+        missing = [conv['last_message_id'] for conv in conversations if conv.get('last_message_id') and not conv.get('last_message')]
+        legacy = {}
+        if missing:
+            msg_result = await run_query(supabase.table('messages').select('id, content, sender_id, created_at').in_('id', missing))
+            legacy = {msg['id']: last_message_snapshot(msg) for msg in (msg_result.data or [])}
         
-        # Enrich with last message
         for conv in conversations:
-            if conv.get('last_message_id'):
-                msg_result = supabase.table('messages').select('*').eq('id', conv['last_message_id']).execute()
-                if msg_result.data and len(msg_result.data) > 0:
-                    msg = msg_result.data[0]
-                    conv['lastMessage'] = {
-                        'id': msg['id'],
-                        'content': msg['content'],
-                        'senderId': msg['sender_id'],
-                        'createdAt': msg['created_at']
-                    }
-                else:
-                    conv['lastMessage'] = None
-            else:
-                conv['lastMessage'] = None
+            snapshot = conv.pop('last_message', None)
+            conv['lastMessage'] = snapshot or legacy.get(conv.get('last_message_id'))
             
             # Format for response
             conv['createdAt'] = conv.pop('created_at')
             conv['updatedAt'] = conv.pop('updated_at')
-            conv['unreadCount'] = conv.pop('unread_count', 0)
+            conv['unreadCount'] = (conv.pop('unread_counts', None) or {}).get(userId, 0)
         
         return conversations
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -182,23 +217,12 @@ async def get_conversation_messages(conversationId: str, limit: int = 50):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('messages').select('*').eq('conversation_id', conversationId).order('created_at', desc=True).limit(limit).execute()
+        result = await run_query(supabase.table('messages').select('*').eq('conversation_id', conversationId).order('created_at', desc=True).limit(limit))
         
         messages = result.data if result.data else []
         
         # Format for response
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                'id': msg['id'],
-                'conversationId': msg['conversation_id'],
-                'senderId': msg['sender_id'],
-                'receiverId': msg['receiver_id'],
-                'content': msg['content'],
-                'relatedJobId': msg.get('related_job_id'),
-                'isRead': msg.get('is_read', False),
-                'createdAt': msg['created_at']
-            })
+        formatted_messages = [format_message(msg) for msg in messages]
         
         # Reverse to get chronological order
         formatted_messages.reverse()
@@ -217,19 +241,21 @@ async def mark_messages_as_read(conversationId: str, userId: str):
     try:
         supabase = get_supabase_admin()
         
-        # Mark all unread messages as read for this user
-        supabase.table('messages').update({
-            'is_read': True
-        }).eq('conversation_id', conversationId).eq('receiver_id', userId).eq('is_read', False).execute()
+        # Mark this user's unread messages read and zero only their unread count
+        result = await run_query(supabase.rpc('mark_conversation_read', {
+            'p_conversation_id': conversationId,
+            'p_user_id': userId
+        }))
         
-        # Reset unread count
-        supabase.table('conversations').update({
-            'unread_count': 0
-        }).eq('id', conversationId).execute()
+        await realtime_hub.publish([userId], 'unread.updated', {
+            'conversationId': conversationId,
+            'unreadCount': 0
+        })
         
         return {
             'success': True,
-            'message': 'Messages marked as read'
+            'message': 'Messages marked as read',
+            'markedCount': result.data or 0
         }
         
     except Exception as e:
@@ -244,12 +270,10 @@ async def get_unread_count(userId: str):
     try:
         supabase = get_supabase_admin()
         
-        # Get all conversations for user
-        conv_result = supabase.table('conversations').select('unread_count').contains('participants', [userId]).execute()
-        
-        conversations = conv_result.data if conv_result.data else []
+        # Summed per-participant counts across the user's conversations
+        result = await run_query(supabase.rpc('unread_message_count', {'p_user_id': userId}))
         
-        total_unread = sum(conv.get('unread_count', 0) for conv in conversations)
+        total_unread = result.data or 0
         
         return {
             'userId': userId,
@@ -268,7 +292,7 @@ async def delete_message(messageId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('messages').delete().eq('id', messageId).execute()
+        result = await run_query(supabase.table('messages').delete().eq('id', messageId))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -285,3 +309,60 @@ async def delete_message(messageId: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete message: {str(e)}"
         )
+
+async def authenticate_websocket(websocket: WebSocket, user_id: str) -> bool:
+    """True when the socket presents a valid access token whose subject is user_id"""
+    if USE_MOCK_AUTH:
+        return True
+    
+    token = websocket.query_params.get('token')
+    try:
+        if not token:
+            first_frame = await asyncio.wait_for(websocket.receive_json(), WEBSOCKET_AUTH_TIMEOUT_SECONDS)
+            if isinstance(first_frame, dict) and first_frame.get('type') == 'auth':
+                token = first_frame.get('token')
+        if not isinstance(token, str) or not token:
+            return False
+        
+        payload = decode_access_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+        return str(payload["sub"]) == user_id
+    except (HTTPException, asyncio.TimeoutError):
+        return False
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        logger.warning(f"Messaging websocket authentication for {user_id} failed: {e}")
+        return False
+
+@router.websocket("/ws/messages/{userId}")
+async def messages_websocket(websocket: WebSocket, userId: str):
+    """
+    Push channel for a user's messaging events, as JSON {"event", "data"}:
+    - message.new: a message the user sent or received (MessageResponse fields)
+    - unread.updated: {conversationId, unreadCount} for the user
+    Clients authenticate with an access token for userId, either as ?token=
+    or as a first frame {"type": "auth", "token": "..."}; anything else is
+    closed with 1008 (policy violation).
+    Clients may send {"type": "ping"} and get {"event": "pong"} back.
+    """
+    await websocket.accept()
+    try:
+        authenticated = await authenticate_websocket(websocket, userId)
+    except WebSocketDisconnect:
+        return
+    if not authenticated:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await realtime_hub.connect(userId, websocket)
+    try:
+        while True:
+            incoming = await websocket.receive_json()
+            if isinstance(incoming, dict) and incoming.get('type') == 'ping':
+                await websocket.send_json({'event': 'pong'})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Messaging websocket for {userId} closed: {e}")
+    finally:
+        await realtime_hub.disconnect(userId, websocket)
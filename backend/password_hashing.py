@@ -0,0 +1,122 @@
+"""
+Password Hashing
+bcrypt hashing and verification off the event loop. Each call costs
+100-300 ms of CPU, so running it inline stalls every coroutine on the worker;
+here calls run on a dedicated, bounded thread pool (bcrypt releases the GIL
+while hashing, so threads hash in parallel). When too many calls are already
+waiting, new ones are refused with PasswordHashingBusy instead of queueing
+without limit, so a login storm degrades into fast 503s rather than a frozen API.
+
+The bcrypt cost is BCRYPT_ROUNDS. Hashes made with a different cost are
+flagged by verify_and_update() so login can store a rehashed password.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Calls allowed to wait for a worker before new ones are refused
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+# deprecated="auto" plus the configured rounds makes needs_update() true for
+# hashes created with another cost
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+class PasswordHasher:
+    """Bounded thread pool for passlib hash/verify calls, with queue-depth metrics"""
+
+    def __init__(
+        self,
+        context: CryptContext = pwd_context,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE
+    ):
+        self.context = context
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._outstanding = 0
+        self.stats = {
+            "hashes": 0, "verifications": 0, "rehashes": 0, "rejected": 0,
+            "max_outstanding": 0, "wait_ms_total": 0.0, "run_ms_total": 0.0
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        if self._outstanding >= self.workers + self.max_queue:
+            self.stats["rejected"] += 1
+            raise PasswordHashingBusy("Too many password operations in progress")
+
+        self._outstanding += 1
+        self.stats["max_outstanding"] = max(self.stats["max_outstanding"], self._outstanding)
+        submitted = time.perf_counter()
+        started = []
+
+        def timed() -> Any:
+            started.append(time.perf_counter())
+            return func(*args)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), timed)
+        finally:
+            self._outstanding -= 1
+            finished = time.perf_counter()
+            if started:
+                self.stats["wait_ms_total"] += (started[0] - submitted) * 1000
+                self.stats["run_ms_total"] += (finished - started[0]) * 1000
+
+    async def hash(self, password: str) -> str:
+        result = await self._run(self.context.hash, password)
+        self.stats["hashes"] += 1
+        return result
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        result = await self._run(self.context.verify, password, hashed)
+        self.stats["verifications"] += 1
+        return result
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        (valid, new_hash): new_hash is set when the password is valid but the
+        stored hash uses an outdated scheme or cost and should be replaced
+        """
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        self.stats["verifications"] += 1
+        if new_hash:
+            self.stats["rehashes"] += 1
+        return valid, new_hash
+
+    def metrics(self) -> dict:
+        completed = self.stats["hashes"] + self.stats["verifications"]
+        return {
+            **{key: value for key, value in self.stats.items() if not key.endswith("_total")},
+            "rounds": BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._outstanding, self.workers),
+            "queued": max(self._outstanding - self.workers, 0),
+            "avg_wait_ms": round(self.stats["wait_ms_total"] / completed, 1) if completed else 0.0,
+            "avg_run_ms": round(self.stats["run_ms_total"] / completed, 1) if completed else 0.0
+        }
+
+    def shutdown(self) -> None:
+        """Stop the hashing thread pool (called on application shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,242 @@
+"""
+Price Estimator
+Local pricing for /estimate-price. Requests are normalized to a small key
+(category, work type, urgency, location, duration in hours) and priced from a
+precomputed category table scaled by generate_price-style factors, so every
+keystroke of the job-post form is answered without an LLM call.
+
+The LLM only refines estimates: the first request for a key schedules one
+background refinement, and later requests for that key get the refined range
+from the cache. Refinements that stray too far from the local model are dropped.
+Failed or dropped refinements are remembered for PRICE_REFINE_FAILURE_TTL_SECONDS
+so a key is not re-sent to the LLM on every keystroke.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from geo_ranking import BASE_PRICES, URGENCY_MULTIPLIERS, DEFAULT_URGENCY_MULTIPLIER
+from llm_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+PRICE_CACHE_TTL_SECONDS = float(os.environ.get("PRICE_CACHE_TTL_SECONDS", str(12 * 3600)))
+# Background refinements allowed in flight at once; further keys stay local-only until a slot frees
+PRICE_REFINE_MAX_PENDING = int(os.environ.get("PRICE_REFINE_MAX_PENDING", "8"))
+# How long a failed or implausible refinement blocks new attempts for its key
+PRICE_REFINE_FAILURE_TTL_SECONDS = float(os.environ.get("PRICE_REFINE_FAILURE_TTL_SECONDS", "300"))
+# A refined suggestion outside [local / band, local * band] is treated as a bad answer
+PRICE_REFINE_MAX_DEVIATION = 3.0
+
+# (min, max) in USD per work type, before urgency/location/duration factors
+CATEGORY_PRICE_RANGES: Dict[str, Dict[str, Tuple[int, int]]] = {
+    "web development": {"project": (500, 2000), "gig": (60, 200)},
+    "mobile development": {"project": (800, 3000), "gig": (80, 250)},
+    "design": {"project": (300, 1000), "gig": (50, 150)},
+    "writing & content": {"project": (150, 600), "gig": (30, 100)},
+    "marketing": {"project": (200, 800), "gig": (40, 120)},
+    "data science": {"project": (600, 2500), "gig": (80, 250)},
+    "business": {"project": (200, 900), "gig": (40, 150)},
+    "labor & moving": {"project": (200, 800), "gig": (50, 150)},
+    "cleaning": {"project": (150, 500), "gig": (40, 100)},
+    "maintenance & repairs": {"project": (250, 1000), "gig": (60, 200)},
+    "other": {"project": (100, 500), "gig": (30, 80)},
+}
+# QuickHire service categories: gig range around the dispatch base price
+for _category, _base in BASE_PRICES.items():
+    CATEGORY_PRICE_RANGES.setdefault(_category.lower(), {
+        "project": (int(_base * 3), int(_base * 10)),
+        "gig": (int(_base * 0.7), int(_base * 1.5))
+    })
+
+URGENCY_ALIASES = {
+    "urgent": "ASAP", "emergency": "ASAP", "asap": "ASAP",
+    "today": "Today", "normal": "Later", "later": "Later", "flexible": "Later"
+}
+LOCATION_MULTIPLIERS = {"remote": 1.0, "on-site": 1.1}
+
+# Duration the table ranges assume, in hours; longer/shorter work scales sub-linearly
+BASELINE_HOURS = {"gig": 2.0, "project": 80.0}
+DURATION_EXPONENT = 0.7
+DURATION_FACTOR_BOUNDS = (0.5, 4.0)
+UNIT_HOURS = {
+    "min": 1 / 60, "hour": 1, "hr": 1, "h": 1, "day": 8, "week": 40, "month": 160
+}
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(min|hour|hr|h|day|week|month)s?\b", re.IGNORECASE)
+
+def parse_duration_hours(duration: str) -> Optional[float]:
+    """'2 hours', '3 days', '1 week' -> working hours; None if unrecognized"""
+    match = DURATION_PATTERN.search(duration or "")
+    if not match:
+        return None
+    return float(match.group(1)) * UNIT_HOURS[match.group(2).lower()]
+
+def normalize_price_request(
+    category: str,
+    work_type: str,
+    urgency: str = "normal",
+    location: str = "remote",
+    duration: str = ""
+) -> Dict:
+    """Canonical form of the inputs the price depends on"""
+    work_type = "project" if str(work_type).lower() == "project" else "gig"
+    category = (category or "").strip().lower()
+    if category not in CATEGORY_PRICE_RANGES:
+        category = "other"
+    location = "remote" if (location or "remote").strip().lower() == "remote" else "on-site"
+    hours = parse_duration_hours(duration)
+    return {
+        "category": category,
+        "workType": work_type,
+        "urgency": URGENCY_ALIASES.get((urgency or "").strip().lower(), "Later"),
+        "location": location,
+        # Rounded to ~10% steps so "2 hours" and "2.1 hours" share a key
+        "hours": round(math.exp(round(math.log(hours) * 10) / 10), 2) if hours else None
+    }
+
+def price_cache_key(normalized: Dict) -> str:
+    return "price:" + json.dumps(normalized, sort_keys=True)
+
+def _build_price_table() -> Dict[Tuple[str, str, str, str], Tuple[float, float]]:
+    """(category, work type, urgency, location) -> (min, max) before the duration factor"""
+    table = {}
+    for category, ranges in CATEGORY_PRICE_RANGES.items():
+        for work_type, (low, high) in ranges.items():
+            for urgency, urgency_multiplier in URGENCY_MULTIPLIERS.items():
+                for location, location_multiplier in LOCATION_MULTIPLIERS.items():
+                    factor = urgency_multiplier * location_multiplier
+                    table[(category, work_type, urgency, location)] = (low * factor, high * factor)
+    return table
+
+PRICE_TABLE = _build_price_table()
+
+def duration_factor(normalized: Dict) -> float:
+    hours = normalized.get("hours")
+    if not hours:
+        return 1.0
+    low, high = DURATION_FACTOR_BOUNDS
+    return min(max((hours / BASELINE_HOURS[normalized["workType"]]) ** DURATION_EXPONENT, low), high)
+
+def category_premium(normalized: Dict) -> float:
+    """Category midpoint relative to the "other" midpoint for the same work type"""
+    low, high = CATEGORY_PRICE_RANGES[normalized["category"]][normalized["workType"]]
+    base_low, base_high = CATEGORY_PRICE_RANGES["other"][normalized["workType"]]
+    return math.sqrt(low * high) / math.sqrt(base_low * base_high)
+
+def _as_percent(value: float) -> str:
+    return f"{round((value - 1) * 100):+d}%"
+
+def local_price_estimate(normalized: Dict) -> Dict:
+    """PriceEstimateResponse-shaped estimate from the table and factors alone"""
+    key = (normalized["category"], normalized["workType"], normalized["urgency"], normalized["location"])
+    low, high = PRICE_TABLE[key]
+    length = duration_factor(normalized)
+    low, high = low * length, high * length
+    suggested = math.sqrt(low * high)
+
+    urgency = URGENCY_MULTIPLIERS.get(normalized["urgency"], DEFAULT_URGENCY_MULTIPLIER)
+    location = LOCATION_MULTIPLIERS[normalized["location"]]
+    explanation = (
+        f"Typical {normalized['category']} {normalized['workType']}s run "
+        f"${round(low)}-${round(high)} here. "
+    )
+    if urgency > 1:
+        explanation += f"Urgent timing adds about {round((urgency - 1) * 100)}%. "
+    if location > 1:
+        explanation += "On-site work includes a travel allowance. "
+    if normalized.get("hours"):
+        explanation += f"Scaled for roughly {round(normalized['hours']):g} hours of work."
+
+    return {
+        "minPrice": int(round(low)),
+        "maxPrice": int(round(high)),
+        "suggestedPrice": int(round(suggested)),
+        "explanation": explanation.strip(),
+        "factors": {
+            "skill_factor": _as_percent(category_premium(normalized)),
+            "urgency_factor": _as_percent(urgency),
+            "location_factor": _as_percent(location),
+            "market_factor": _as_percent(length)
+        }
+    }
+
+def plausible_refinement(refined: Dict, local: Dict) -> bool:
+    """Reject refinements with missing prices or far from the local model"""
+    try:
+        low, high, suggested = (int(refined[field]) for field in ("minPrice", "maxPrice", "suggestedPrice"))
+    except (KeyError, TypeError, ValueError):
+        return False
+    anchor = local["suggestedPrice"]
+    return (
+        0 < low <= suggested <= high
+        and anchor / PRICE_REFINE_MAX_DEVIATION <= suggested <= anchor * PRICE_REFINE_MAX_DEVIATION
+    )
+
+class PriceEstimator:
+    """Answers from the refinement cache or the local model; refines in the background"""
+
+    def __init__(self, cache: Optional[LLMResponseCache] = None, max_pending: int = PRICE_REFINE_MAX_PENDING):
+        self.cache = cache or LLMResponseCache(max_entries=10000, ttl_seconds=PRICE_CACHE_TTL_SECONDS, disk_path=None)
+        # Same keys as cache; an entry means the last refinement for that key failed
+        self.failures = LLMResponseCache(max_entries=10000, ttl_seconds=PRICE_REFINE_FAILURE_TTL_SECONDS, disk_path=None)
+        self.max_pending = max_pending
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "refined_hits": 0, "local": 0, "refinements": 0, "refine_failures": 0,
+            "refine_skipped": 0, "refine_suppressed": 0
+        }
+
+    async def estimate(self, normalized: Dict, refine: Optional[Callable[[Dict], Awaitable[Dict]]] = None) -> Dict:
+        """
+        Estimate for normalized inputs, with a "source" of "llm" (cached
+        refinement) or "model". When refine is given and the key has no refined
+        answer yet, refine(normalized) is scheduled in the background.
+        """
+        key = price_cache_key(normalized)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self.stats["refined_hits"] += 1
+            return {**json.loads(cached), "source": "llm"}
+
+        self.stats["local"] += 1
+        local = local_price_estimate(normalized)
+        if refine is not None:
+            if await self.failures.get(key) is not None:
+                self.stats["refine_suppressed"] += 1
+            else:
+                self._schedule_refinement(key, normalized, local, refine)
+        return {**local, "source": "model"}
+
+    def _schedule_refinement(self, key: str, normalized: Dict, local: Dict, refine) -> None:
+        if key in self._pending:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.stats["refine_skipped"] += 1
+            return
+        task = asyncio.create_task(self._refine(key, normalized, local, refine))
+        self._pending[key] = task
+        task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+    async def _refine(self, key: str, normalized: Dict, local: Dict, refine) -> None:
+        try:
+            refined = await refine(normalized)
+            if not plausible_refinement(refined, local):
+                raise ValueError(f"implausible refinement {refined}")
+            await self.cache.set(key, json.dumps(refined), PRICE_CACHE_TTL_SECONDS)
+            self.stats["refinements"] += 1
+        except Exception as e:
+            self.stats["refine_failures"] += 1
+            logger.warning(f"Price refinement failed for {key}: {e}")
+            await self.failures.set(key, str(e), PRICE_REFINE_FAILURE_TTL_SECONDS)
+
+    async def drain(self) -> None:
+        """Wait for in-flight refinements (tests, shutdown)"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending.values()), return_exceptions=True)
+
+price_estimator = PriceEstimator()
@@ -8,7 +8,8 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime, timezone
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
+from user_cache import user_cache
 
 router = APIRouter(prefix="", tags=["Profile"])
 
@@ -50,11 +51,14 @@ async def update_profile(profile: ProfileUpdate):
         update_data = {k: v for k, v in update_data.items() if v is not None}
         
         # Check if user exists
-        existing = supabase.table('users').select('id').eq('email', profile.email).execute()
+        existing = await run_query(supabase.table('users').select('id').eq('email', profile.email))
         
         if existing.data and len(existing.data) > 0:
             # Update existing user
-            result = supabase.table('users').update(update_data).eq('email', profile.email).execute()
+            result = await run_query(supabase.table('users').update(update_data).eq('email', profile.email))
+            
+            for row in result.data or []:
+                user_cache.invalidate(row["id"])
             
             if result.data and len(result.data) > 0:
                 return {
@@ -76,7 +80,7 @@ async def get_profile(email: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('users').select('*').eq('email', email).execute()
+        result = await run_query(supabase.table('users').select('*').eq('email', email))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="Profile not found")
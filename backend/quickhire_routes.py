@@ -2,10 +2,15 @@ from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timedelta
+import asyncio
 import uuid
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import random
+import time
+
+from geo_index import GeoGridIndex
+from geo_ranking import rank_nearby
 
 router = APIRouter(prefix="/api/quickhire")
 
@@ -18,6 +23,19 @@ quickhire_assignments_collection = db['quickhire_assignments']
 quickhire_ratings_collection = db['quickhire_ratings']
 worker_profiles_collection = db['worker_profiles']
 
+# In-process spatial index of gigs that can still be matched, keyed by gig id.
+# Warmed from MongoDB on first use and kept current by create/nearby lookups,
+# then rebuilt in the background every DISPATCH_INDEX_REFRESH_SECONDS so gigs
+# created on other workers (or dispatchable again) become visible here.
+DISPATCHABLE_STATUSES = ['Posted', 'Dispatching']
+DISPATCH_INDEX_REFRESH_SECONDS = float(os.environ.get('DISPATCH_INDEX_REFRESH_SECONDS', '30'))
+dispatch_gig_index = GeoGridIndex()
+_dispatch_index_loaded_at: Optional[float] = None
+_dispatch_index_lock = asyncio.Lock()
+_dispatch_refresh_task: Optional[asyncio.Task] = None
+# Gigs indexed while a rebuild is reading MongoDB, replayed onto the new index
+_dispatch_changes_during_rebuild: Optional[list] = None
+
 # Pydantic Models
 class GigLocation(BaseModel):
     type: str = "Point"  # GeoJSON type
@@ -100,6 +118,91 @@ def serialize_gig(gig) -> dict:
     """Serialize MongoDB document"""
 
 
+def gig_coordinates(gigs: list):
+    """(latitudes, longitudes) of GeoJSON gig locations, for rank_nearby"""
+    return (
+        [gig['location']['coordinates'][1] for gig in gigs],
+        [gig['location']['coordinates'][0] for gig in gigs]
+    )
+
+def index_dispatchable_gig(gig_id: str, lat: float, lon: float):
+    """Add a gig to the spatial index (and to the one being rebuilt, if any)"""
+    dispatch_gig_index.upsert(gig_id, lat, lon)
+    if _dispatch_changes_during_rebuild is not None:
+        _dispatch_changes_during_rebuild.append((gig_id, lat, lon))
+
+async def rebuild_dispatch_index():
+    """Load all dispatchable gigs into a new spatial index and swap it in"""
+    global dispatch_gig_index, _dispatch_index_loaded_at, _dispatch_changes_during_rebuild
+    
+    _dispatch_changes_during_rebuild = []
+    try:
+        index = GeoGridIndex()
+        cursor = quickhire_gigs_collection.find(
+            {'status': {'$in': DISPATCHABLE_STATUSES}},
+            {'location.coordinates': 1}
+        )
+        async for gig in cursor:
+            coordinates = gig.get('location', {}).get('coordinates')
+            if coordinates:
+                index.upsert(gig['_id'], coordinates[1], coordinates[0])
+        
+        for gig_id, lat, lon in _dispatch_changes_during_rebuild:
+            index.upsert(gig_id, lat, lon)
+    finally:
+        _dispatch_changes_during_rebuild = None
+    
+    dispatch_gig_index = index
+    _dispatch_index_loaded_at = time.monotonic()
+
+async def _refresh_dispatch_index():
+    async with _dispatch_index_lock:
+        try:
+            await rebuild_dispatch_index()
+        except Exception as e:
+            # Keep serving the previous index; retried after the next interval check
+            print(f"Dispatch index rebuild failed: {e}")
+
+async def ensure_dispatch_index():
+    """
+    Load the spatial index on first use; once stale, rebuild it in the
+    background while lookups keep using the current one
+    """
+    global _dispatch_refresh_task
+    
+    if _dispatch_index_loaded_at is None:
+        async with _dispatch_index_lock:
+            if _dispatch_index_loaded_at is None:
+                await rebuild_dispatch_index()
+        return
+    
+    if time.monotonic() - _dispatch_index_loaded_at >= DISPATCH_INDEX_REFRESH_SECONDS:
+        if _dispatch_refresh_task is None or _dispatch_refresh_task.done():
+            _dispatch_refresh_task = asyncio.create_task(_refresh_dispatch_index())
+
+async def find_dispatchable_gigs_near(latitude: float, longitude: float, radius: float) -> list:
+    """
+    Fetch dispatchable gigs inside the radius bounding box using the grid index.
+    Index entries whose gig is no longer dispatchable are pruned on the way out.
+    """
+    await ensure_dispatch_index()
+    
+    candidate_ids = dispatch_gig_index.candidates(latitude, longitude, radius)
+    if not candidate_ids:
+        return []
+    
+    gigs = await quickhire_gigs_collection.find({
+        '_id': {'$in': candidate_ids},
+        'status': {'$in': DISPATCHABLE_STATUSES}
+    }).to_list(length=len(candidate_ids))
+    
+    found_ids = {gig['_id'] for gig in gigs}
+    for gig_id in candidate_ids:
+        if gig_id not in found_ids:
+            dispatch_gig_index.remove(gig_id)
+    
+    return gigs
+
 # Get nearby gigs for Uber-like matching
 @router.post("/gigs/nearby")
 async def get_nearby_gigs(data: dict):
@@ -116,31 +219,25 @@ async def get_nearby_gigs(data: dict):
             return {'gigs': []}
         
         # Find gigs within radius
-        cursor = quickhire_gigs_collection.find({
-            'status': {'$in': ['Posted', 'Dispatching']},
-        })
-        
-        gigs = await cursor.to_list(length=100)
+        gigs = await find_dispatchable_gigs_near(latitude, longitude, radius)
+        
+        # Filter by distance and keep the 20 closest (vectorized)
+        gigs = [gig for gig in gigs if 'location' in gig and 'coordinates' in gig['location']]
+        ranked, _ = rank_nearby(
+            gigs, latitude, longitude,
+            coords=gig_coordinates(gigs),
+            radius=radius,
+            limit=20,
+            with_eta=False
+        )
         
-        # Filter by distance
         nearby_gigs = []
-        user_location = [longitude, latitude]
+        for gig in ranked:
+            gig_data = serialize_gig(gig)
+            gig_data['immediate'] = gig.get('urgency') == 'ASAP'
+            nearby_gigs.append(gig_data)
         
-        for gig in gigs:
-            if 'location' in gig and 'coordinates' in gig['location']:
-                gig_location = gig['location']['coordinates']
-                distance = calculate_mock_distance(user_location, gig_location)
-                
-                if distance <= radius:
-                    gig_data = serialize_gig(gig)
-                    gig_data['distance'] = distance
-                    gig_data['immediate'] = gig.get('urgency') == 'ASAP'
-                    nearby_gigs.append(gig_data)
-        
-        # Sort by distance
-        nearby_gigs.sort(key=lambda x: x['distance'])
-        
-        return {'gigs': nearby_gigs[:20]}  # Return top 20
+        return {'gigs': nearby_gigs}  # Return top 20
     
     except Exception as e:
         print(f"Error getting nearby gigs: {str(e)}")
@@ -201,6 +298,9 @@ async def create_quickhire_gig(gig: QuickHireGigCreate):
             }
         )
         
+        lon, lat = gig.location.coordinates[0], gig.location.coordinates[1]
+        index_dispatchable_gig(gig_id, lat, lon)
+        
         created_gig = await quickhire_gigs_collection.find_one({'_id': gig_id})
         return serialize_gig(created_gig)
     
@@ -224,27 +324,16 @@ async def get_nearby_gigs(
     """
     try:
         # Find gigs in Dispatching state
-        cursor = quickhire_gigs_collection.find({
-            'status': 'Dispatching'
-        })
-        
-        gigs = await cursor.to_list(length=100)
-        
-        # Filter by distance (mock calculation)
-        worker_location = [longitude, latitude]
-        nearby_gigs = []
-        
-        for gig in gigs:
-            gig_location = gig['location']['coordinates']
-            distance = calculate_mock_distance(worker_location, gig_location)
-            
-            if distance <= radius:
-                gig['distance'] = distance
-                gig['eta'] = calculate_mock_eta(distance)
-                nearby_gigs.append(serialize_gig(gig))
-        
-        # Sort by distance
-        nearby_gigs.sort(key=lambda x: x['distance'])
+        gigs = await find_dispatchable_gigs_near(latitude, longitude, radius)
+        gigs = [gig for gig in gigs if gig['status'] == 'Dispatching']
+        
+        # Filter by distance and sort nearest first (vectorized)
+        ranked, _ = rank_nearby(
+            gigs, latitude, longitude,
+            coords=gig_coordinates(gigs),
+            radius=radius
+        )
+        nearby_gigs = [serialize_gig(gig) for gig in ranked]
         
         return nearby_gigs
     
@@ -10,10 +10,19 @@ from datetime import datetime, timedelta, timezone
 import uuid
 import math
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
+from location_ingest import location_ingest
+from geo_ranking import (
+    BASE_PRICES, DEFAULT_BASE_PRICE, URGENCY_MULTIPLIERS, DEFAULT_URGENCY_MULTIPLIER,
+    PRICE_PER_MILE, rank_nearby
+)
 
 router = APIRouter(prefix="/quickhire")
 
+# Upper bound on a gig's service radius; used as the index scan radius when
+# matching a worker against each gig's own radius (see ADD_QUICKHIRE_GEO_INDEX.sql)
+MAX_GIG_RADIUS_MILES = 50
+
 # ============================================================================
 # MODELS
 # ============================================================================
@@ -81,15 +90,9 @@ def calculate_eta(distance_miles: float) -> int:
 
 def generate_price(category: str, distance: float, urgency: str) -> float:
     """Generate dynamic pricing"""
-    base_prices = {
-        "Plumber": 120, "Electrician": 100, "Cleaning": 80,
-        "Handyman": 90, "Moving": 150, "Locksmith": 95,
-        "HVAC": 130, "Painting": 85, "Carpentry": 110, "Landscaping": 75
-    }
-    
-    base = base_prices.get(category, 100)
-    distance_fee = distance * 2
-    urgency_multiplier = {"ASAP": 1.3, "Today": 1.1, "Later": 1.0}.get(urgency, 1.0)
+    base = BASE_PRICES.get(category, DEFAULT_BASE_PRICE)
+    distance_fee = distance * PRICE_PER_MILE
+    urgency_multiplier = URGENCY_MULTIPLIERS.get(urgency, DEFAULT_URGENCY_MULTIPLIER)
     
     return round((base + distance_fee) * urgency_multiplier, 2)
 
@@ -106,23 +109,20 @@ async def find_nearby_gigs(worker_location: WorkerLocation):
         worker_lat = worker_location.location.coordinates[1]
         worker_lon = worker_location.location.coordinates[0]
         
-        # Get all open gigs
-        result = supabase.table('quickhire_gigs').select('*').eq('status', 'open').execute()
-        
-        nearby_gigs = []
-        for gig in (result.data or []):
-            gig_lat = float(gig['latitude'])
-            gig_lon = float(gig['longitude'])
-            distance = haversine_distance(worker_lat, worker_lon, gig_lat, gig_lon)
-            
-            if distance <= gig.get('radius', 5):
-                gig['distance'] = distance
-                gig['eta'] = calculate_eta(distance)
-                gig['estimated_price'] = generate_price(gig['category'], distance, gig['urgency'])
-                nearby_gigs.append(gig)
-        
-        # Sort by distance
-        nearby_gigs.sort(key=lambda x: x['distance'])
+        # Open gigs whose own service radius covers the worker (GiST-indexed, nearest first)
+        result = await run_query(supabase.rpc('nearby_quickhire_gigs', {
+            "p_lat": worker_lat,
+            "p_lon": worker_lon,
+            "p_radius_miles": MAX_GIG_RADIUS_MILES,
+            "p_use_gig_radius": True
+        }))
+        
+        gigs = result.data or []
+        nearby_gigs, _ = rank_nearby(
+            gigs, worker_lat, worker_lon,
+            distances=[float(gig['distance']) for gig in gigs],
+            with_price=True
+        )
         
         return {"success": True, "gigs": nearby_gigs, "count": len(nearby_gigs)}
     except Exception as e:
@@ -162,7 +162,7 @@ async def create_quickhire_gig(gig: QuickHireGigCreate):
             "expires_at": (datetime.now(timezone.utc) + timedelta(hours=24)).isoformat()
         }
         
-        result = supabase.table('quickhire_gigs').insert(gig_data).execute()
+        result = await run_query(supabase.table('quickhire_gigs').insert(gig_data))
         
         return {"success": True, "gigId": gig_id, "gig": result.data[0] if result.data else gig_data}
     except Exception as e:
@@ -179,23 +179,21 @@ async def get_nearby_gigs_query(
     try:
         supabase = get_supabase_admin()
         
-        query = supabase.table('quickhire_gigs').select('*').eq('status', 'open')
-        if category:
-            query = query.eq('category', category)
-        
-        result = query.execute()
-        
-        nearby_gigs = []
-        for gig in (result.data or []):
-            distance = haversine_distance(lat, lon, float(gig['latitude']), float(gig['longitude']))
-            if distance <= radius:
-                gig['distance'] = distance
-                gig['eta'] = calculate_eta(distance)
-                nearby_gigs.append(gig)
-        
-        nearby_gigs.sort(key=lambda x: x['distance'])
-        
-        return {"success": True, "gigs": nearby_gigs[:20], "count": len(nearby_gigs)}
+        result = await run_query(supabase.rpc('nearby_quickhire_gigs', {
+            "p_lat": lat,
+            "p_lon": lon,
+            "p_radius_miles": radius,
+            "p_category": category
+        }))
+        
+        gigs = result.data or []
+        nearby_gigs, count = rank_nearby(
+            gigs, lat, lon,
+            distances=[float(gig['distance']) for gig in gigs],
+            limit=20
+        )
+        
+        return {"success": True, "gigs": nearby_gigs, "count": count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -206,14 +204,14 @@ async def accept_gig(gigId: str, workerId: str = Query(...)):
         supabase = get_supabase_admin()
         
         # Get gig
-        gig_result = supabase.table('quickhire_gigs').select('*').eq('id', gigId).execute()
+        gig_result = await run_query(supabase.table('quickhire_gigs').select('*').eq('id', gigId))
         if not gig_result.data:
             raise HTTPException(status_code=404, detail="Gig not found")
         
         gig = gig_result.data[0]
         
         # Check if already assigned
-        assignments = supabase.table('quickhire_assignments').select('*').eq('gig_id', gigId).eq('worker_id', workerId).execute()
+        assignments = await run_query(supabase.table('quickhire_assignments').select('*').eq('gig_id', gigId).eq('worker_id', workerId))
         if assignments.data:
             raise HTTPException(status_code=400, detail="Already assigned to this gig")
         
@@ -232,7 +230,7 @@ async def accept_gig(gigId: str, workerId: str = Query(...)):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        supabase.table('quickhire_assignments').insert(assignment_data).execute()
+        await run_query(supabase.table('quickhire_assignments').insert(assignment_data))
         
         # Update gig workers count
         new_count = gig['workers_assigned'] + 1
@@ -240,7 +238,7 @@ async def accept_gig(gigId: str, workerId: str = Query(...)):
         if new_count >= gig['workers_needed']:
             updates["status"] = "in_progress"
         
-        supabase.table('quickhire_gigs').update(updates).eq('id', gigId).execute()
+        await run_query(supabase.table('quickhire_gigs').update(updates).eq('id', gigId))
         
         return {"success": True, "message": "Gig accepted", "assignmentId": assignment_id}
     except HTTPException:
@@ -254,7 +252,7 @@ async def get_gig_details(gigId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('quickhire_gigs').select('*').eq('id', gigId).execute()
+        result = await run_query(supabase.table('quickhire_gigs').select('*').eq('id', gigId))
         if not result.data:
             raise HTTPException(status_code=404, detail="Gig not found")
         
@@ -270,7 +268,7 @@ async def update_gig_status(gigId: str, update: GigStatusUpdate):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('quickhire_gigs').update({"status": update.status}).eq('id', gigId).execute()
+        result = await run_query(supabase.table('quickhire_gigs').update({"status": update.status}).eq('id', gigId))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Gig not found")
@@ -287,19 +285,19 @@ async def complete_gig(gigId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('quickhire_gigs').update({
+        result = await run_query(supabase.table('quickhire_gigs').update({
             "status": "completed",
             "completed_at": datetime.now(timezone.utc).isoformat()
-        }).eq('id', gigId).execute()
+        }).eq('id', gigId))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Gig not found")
         
         # Update assignments
-        supabase.table('quickhire_assignments').update({
+        await run_query(supabase.table('quickhire_assignments').update({
             "status": "completed",
             "completed_at": datetime.now(timezone.utc).isoformat()
-        }).eq('gig_id', gigId).execute()
+        }).eq('gig_id', gigId))
         
         return {"success": True, "message": "Gig completed"}
     except HTTPException:
@@ -324,7 +322,7 @@ async def create_rating(rating: GigRating):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table('quickhire_ratings').insert(rating_data).execute()
+        result = await run_query(supabase.table('quickhire_ratings').insert(rating_data))
         
         return {"success": True, "rating": result.data[0] if result.data else rating_data}
     except Exception as e:
@@ -336,7 +334,7 @@ async def get_client_gigs(clientId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('quickhire_gigs').select('*').eq('client_id', clientId).order('created_at', desc=True).execute()
+        result = await run_query(supabase.table('quickhire_gigs').select('*').eq('client_id', clientId).order('created_at', desc=True))
         
         return {"success": True, "gigs": result.data or [], "count": len(result.data or [])}
     except Exception as e:
@@ -348,7 +346,7 @@ async def get_worker_gigs(workerId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('quickhire_assignments').select('*, quickhire_gigs(*)').eq('worker_id', workerId).execute()
+        result = await run_query(supabase.table('quickhire_assignments').select('*, quickhire_gigs(*)').eq('worker_id', workerId))
         
         return {"success": True, "assignments": result.data or [], "count": len(result.data or [])}
     except Exception as e:
@@ -356,31 +354,33 @@ async def get_worker_gigs(workerId: str):
 
 @router.post("/worker/location")
 async def update_worker_location(location_update: WorkerLocation):
-    """Update worker's real-time location"""
+    """Update worker's real-time location (buffered, written in bulk by location_ingest)"""
     try:
-        supabase = get_supabase_admin()
-        
         lat = location_update.location.coordinates[1]
         lon = location_update.location.coordinates[0]
         
-        # Upsert location
-        existing = supabase.table('worker_locations').select('id').eq('worker_id', location_update.workerId).execute()
+        location_ingest.submit(location_update.workerId, lat, lon)
         
-        location_data = {
-            "worker_id": location_update.workerId,
-            "latitude": lat,
-            "longitude": lon,
-            "is_available": True,
-            "last_updated": datetime.now(timezone.utc).isoformat()
-        }
+        return {"success": True, "message": "Location updated"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/worker/{workerId}/location")
+async def get_worker_location(workerId: str):
+    """Get worker's latest known location (an unflushed ping from this process, else the database)"""
+    try:
+        location = location_ingest.get_unflushed(workerId)
         
-        if existing.data:
-            supabase.table('worker_locations').update(location_data).eq('worker_id', location_update.workerId).execute()
-        else:
-            location_data["id"] = str(uuid.uuid4())
-            supabase.table('worker_locations').insert(location_data).execute()
+        if location is None:
+            supabase = get_supabase_admin()
+            result = await run_query(supabase.table('worker_locations').select('*').eq('worker_id', workerId))
+            if not result.data:
+                raise HTTPException(status_code=404, detail="Worker location not found")
+            location = result.data[0]
         
-        return {"success": True, "message": "Location updated"}
+        return {"success": True, "location": location}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -390,8 +390,8 @@ async def get_hiring_status(gigId: str):
     try:
         supabase = get_supabase_admin()
         
-        gig = supabase.table('quickhire_gigs').select('*').eq('id', gigId).execute()
-        assignments = supabase.table('quickhire_assignments').select('*').eq('gig_id', gigId).execute()
+        gig = await run_query(supabase.table('quickhire_gigs').select('*').eq('id', gigId))
+        assignments = await run_query(supabase.table('quickhire_assignments').select('*').eq('gig_id', gigId))
         
         if not gig.data:
             raise HTTPException(status_code=404, detail="Gig not found")
@@ -413,7 +413,7 @@ async def close_hiring(gigId: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('quickhire_gigs').update({"status": "in_progress"}).eq('id', gigId).execute()
+        result = await run_query(supabase.table('quickhire_gigs').update({"status": "in_progress"}).eq('id', gigId))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Gig not found")
@@ -435,18 +435,21 @@ async def find_nearby_workers(
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('worker_locations').select('*').eq('is_available', True).execute()
-        
-        nearby_workers = []
-        for worker in (result.data or []):
-            distance = haversine_distance(lat, lon, float(worker['latitude']), float(worker['longitude']))
-            if distance <= radius:
-                worker['distance'] = distance
-                nearby_workers.append(worker)
-        
-        nearby_workers.sort(key=lambda x: x['distance'])
-        
-        return {"success": True, "workers": nearby_workers[:20], "count": len(nearby_workers)}
+        result = await run_query(supabase.rpc('nearby_workers', {
+            "p_lat": lat,
+            "p_lon": lon,
+            "p_radius_miles": radius
+        }))
+        
+        workers = result.data or []
+        nearby_workers, count = rank_nearby(
+            workers, lat, lon,
+            distances=[float(worker['distance']) for worker in workers],
+            limit=20,
+            with_eta=False
+        )
+        
+        return {"success": True, "workers": nearby_workers, "count": count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -456,7 +459,7 @@ async def browse_marketplace(filters: Optional[dict] = None):
     """Browse gig marketplace"""
     try:
         supabase = get_supabase_admin()
-        result = supabase.table('quickhire_gigs').select('*').eq('status', 'open').limit(50).execute()
+        result = await run_query(supabase.table('quickhire_gigs').select('*').eq('status', 'open').limit(50))
         return {"success": True, "gigs": result.data or []}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -471,7 +474,7 @@ async def get_gig_responses(gigId: str):
     """Get all worker responses for a gig"""
     try:
         supabase = get_supabase_admin()
-        result = supabase.table('quickhire_assignments').select('*').eq('gig_id', gigId).execute()
+        result = await run_query(supabase.table('quickhire_assignments').select('*').eq('gig_id', gigId))
         return {"success": True, "responses": result.data or []}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,262 @@
+"""
+Realtime Hub
+Pushes messaging events (new messages, unread-count changes) to connected
+WebSocket clients so they no longer poll /conversations and /messages/unread.
+
+Each connected user has a channel ("user:<id>"). Events are published to the
+broker, and every process subscribed to that channel delivers them to its own
+sockets. InMemoryBroker keeps everything inside one process (single worker,
+tests); RedisBroker (REALTIME_BROKER_URL=redis://..., needs the `redis`
+package) lets several uvicorn workers share channels.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+REALTIME_BROKER_URL = os.environ.get("REALTIME_BROKER_URL") or None
+# A socket that cannot take an event within this long is dropped
+REALTIME_SEND_TIMEOUT_SECONDS = float(os.environ.get("REALTIME_SEND_TIMEOUT_SECONDS", "5"))
+
+Handler = Callable[[str, dict], Awaitable[None]]
+
+# ============================================================================
+# BROKERS
+# ============================================================================
+
+class MessageBroker(ABC):
+    """Channel pub/sub between hub instances; subclasses carry the transport"""
+
+    @abstractmethod
+    async def start(self, handler: Handler) -> None:
+        """Begin delivering messages on subscribed channels to handler(channel, data)"""
+
+    @abstractmethod
+    async def subscribe(self, channel: str) -> None:
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, channel: str) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, channel: str, data: dict) -> None:
+        ...
+
+    async def stop(self) -> None:
+        pass
+
+class InMemoryBroker(MessageBroker):
+    """Single-process broker: publish delivers straight to this process's hub"""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self._channels: Set[str] = set()
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+
+    async def subscribe(self, channel: str) -> None:
+        self._channels.add(channel)
+
+    async def unsubscribe(self, channel: str) -> None:
+        self._channels.discard(channel)
+
+    async def publish(self, channel: str, data: dict) -> None:
+        if self._handler is not None and channel in self._channels:
+            await self._handler(channel, data)
+
+class RedisBroker(MessageBroker):
+    """Redis pub/sub broker shared by every worker pointing at the same server"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RedisBroker needs the redis package (pip install redis)")
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._reader: Optional[asyncio.Task] = None
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.5)
+                    continue
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                await self._handler(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Realtime broker read failed: {e}")
+                await asyncio.sleep(1)
+
+    async def subscribe(self, channel: str) -> None:
+        await self._pubsub.subscribe(channel)
+
+    async def unsubscribe(self, channel: str) -> None:
+        await self._pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, data: dict) -> None:
+        await self._redis.publish(channel, json.dumps(data, default=str))
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        await self._pubsub.close()
+        await self._redis.close()
+
+def create_broker(url: Optional[str] = REALTIME_BROKER_URL) -> MessageBroker:
+    return RedisBroker(url) if url else InMemoryBroker()
+
+# ============================================================================
+# HUB
+# ============================================================================
+
+def user_channel(user_id: str) -> str:
+    return f"user:{user_id}"
+
+class RealtimeHub:
+    """Tracks this process's WebSockets per user and fans broker events out to them"""
+
+    def __init__(self, broker: Optional[MessageBroker] = None, send_timeout: float = REALTIME_SEND_TIMEOUT_SECONDS):
+        self.broker = broker
+        self.send_timeout = send_timeout
+        self._sockets: Dict[str, Set] = {}
+        # Per-user [lock, holders + waiters]: subscription changes for a user run one at a time
+        self._user_locks: Dict[str, List] = {}
+        self._started = False
+        self._lock = asyncio.Lock()
+        self.stats = {"published": 0, "delivered": 0, "dropped_sockets": 0, "publish_errors": 0}
+
+    async def _ensure_started(self) -> None:
+        if self._started:
+            return
+        async with self._lock:
+            if not self._started:
+                if self.broker is None:
+                    self.broker = create_broker()
+                await self.broker.start(self._deliver)
+                self._started = True
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(sockets) for sockets in self._sockets.values())
+
+    def is_connected(self, user_id: str) -> bool:
+        return bool(self._sockets.get(user_id))
+
+    @asynccontextmanager
+    async def _user_lock(self, user_id: str):
+        """
+        Serialize subscribe/unsubscribe for one user, so a disconnect racing a
+        reconnect cannot leave a connected user unsubscribed
+        """
+        entry = self._user_locks.get(user_id)
+        if entry is None:
+            entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[user_id]
+
+    async def connect(self, user_id: str, websocket) -> None:
+        """Register an accepted socket and subscribe its user's channel (first socket only)"""
+        await self._ensure_started()
+        async with self._user_lock(user_id):
+            sockets = self._sockets.setdefault(user_id, set())
+            sockets.add(websocket)
+            if len(sockets) == 1:
+                try:
+                    await self.broker.subscribe(user_channel(user_id))
+                except Exception:
+                    sockets.discard(websocket)
+                    del self._sockets[user_id]
+                    raise
+
+    async def disconnect(self, user_id: str, websocket) -> None:
+        async with self._user_lock(user_id):
+            sockets = self._sockets.get(user_id)
+            if not sockets or websocket not in sockets:
+                return
+            sockets.discard(websocket)
+            if not sockets:
+                del self._sockets[user_id]
+                try:
+                    await self.broker.unsubscribe(user_channel(user_id))
+                except Exception as e:
+                    logger.warning(f"Realtime unsubscribe failed for {user_id}: {e}")
+
+    async def publish(self, user_ids: Iterable[str], event: str, data: dict) -> None:
+        """Send {"event", "data"} to every socket of each user, on any worker. Never raises."""
+        await self._ensure_started()
+        payload = {"event": event, "data": data}
+        for user_id in set(user_ids):
+            try:
+                await self.broker.publish(user_channel(user_id), payload)
+                self.stats["published"] += 1
+            except Exception as e:
+                self.stats["publish_errors"] += 1
+                logger.error(f"Realtime publish of {event} to {user_id} failed: {e}")
+
+    async def _deliver(self, channel: str, payload: dict) -> None:
+        user_id = channel.split(":", 1)[1]
+        sockets = list(self._sockets.get(user_id, ()))
+        if not sockets:
+            return
+        results = await asyncio.gather(
+            *(asyncio.wait_for(socket.send_json(payload), self.send_timeout) for socket in sockets),
+            return_exceptions=True
+        )
+        for socket, result in zip(sockets, results):
+            if isinstance(result, BaseException):
+                self.stats["dropped_sockets"] += 1
+                await self.disconnect(user_id, socket)
+                try:
+                    await socket.close()
+                except Exception:
+                    pass
+            else:
+                self.stats["delivered"] += 1
+
+    async def stop(self) -> None:
+        """Close every socket and the broker"""
+        for user_id, sockets in list(self._sockets.items()):
+            for socket in list(sockets):
+                try:
+                    await socket.close()
+                except Exception:
+                    pass
+        self._sockets.clear()
+        if self._started:
+            await self.broker.stop()
+            self._started = False
+
+realtime_hub = RealtimeHub()
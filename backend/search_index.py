@@ -0,0 +1,447 @@
+"""
+Search Index
+In-memory suggestion indexes and filter facet counts that let /search
+endpoints answer without touching the database on every keystroke. Built once from Supabase per process, then kept
+current by the job and worker profile write paths (index_job / remove_job /
+index_profile / remove_profile), with a periodic full rebuild so changes made
+by other workers are picked up.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from supabase_client import get_supabase_admin, run_query
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_REFRESH_SECONDS = float(os.environ.get("SEARCH_INDEX_REFRESH_SECONDS", "600"))
+SEARCH_INDEX_PAGE_SIZE = 1000
+
+# Prefixes up to this length match a large share of the index, so their ranked
+# results are memoized until the next index change
+MEMO_PREFIX_LENGTH = 2
+
+# A term contributed by a source row: (text, type, category)
+Term = Tuple[str, str, str]
+
+# Facet values contributed by a source row: facet name -> values
+Facets = Dict[str, List[str]]
+
+BUDGET_RANGES = [
+    {"label": "Under $500", "min": 0, "max": 500},
+    {"label": "$500 - $1,000", "min": 500, "max": 1000},
+    {"label": "$1,000 - $5,000", "min": 1000, "max": 5000},
+    {"label": "$5,000 - $10,000", "min": 5000, "max": 10000},
+    {"label": "$10,000+", "min": 10000, "max": None}
+]
+
+HOURLY_RATE_RANGES = [
+    {"label": "Under $25/hr", "min": 0, "max": 25},
+    {"label": "$25 - $50/hr", "min": 25, "max": 50},
+    {"label": "$50 - $100/hr", "min": 50, "max": 100},
+    {"label": "$100 - $200/hr", "min": 100, "max": 200},
+    {"label": "$200+/hr", "min": 200, "max": None}
+]
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+# ============================================================================
+# PREFIX INDEX
+# ============================================================================
+
+class PrefixIndex:
+    """
+    Sorted array of search keys with bisect prefix lookup. Every term is
+    reachable from its full text and from the start of each word in it
+    ("react developer" matches "rea" and "dev"). Term popularity is the number
+    of source rows (jobs, profiles) currently contributing it.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []      # sorted (search key, term key)
+        self._terms: Dict[str, dict] = {}           # term key -> suggestion + count
+        self._sources: Dict[str, List[Term]] = {}   # source id -> contributed terms
+        self._memo: Dict[Tuple[str, int], List[str]] = {}  # (short prefix, limit) -> ranked term keys
+
+    @classmethod
+    def build(cls, sources: Dict[str, Iterable[Term]]) -> "PrefixIndex":
+        """Index over every source's terms, with one sort instead of an insort per key"""
+        index = cls()
+        keys = []
+        for source_id, terms in sources.items():
+            terms = index._valid_terms(terms)
+            if not terms:
+                continue
+
+            index._sources[source_id] = terms
+            for text, term_type, category in terms:
+                added = index._count_term(text, term_type, category)
+                if added is not None:
+                    normalized, term_key = added
+                    keys.extend((search_key, term_key) for search_key in cls._search_keys(normalized))
+
+        keys.sort()
+        index._keys = keys
+        return index
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @staticmethod
+    def _search_keys(normalized: str) -> List[str]:
+        words = normalized.split(" ")
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    @staticmethod
+    def _valid_terms(terms: Iterable[Term]) -> List[Term]:
+        return [term for term in terms if term[0] and term[0].strip()]
+
+    def _count_term(self, text: str, term_type: str, category: str) -> Optional[Tuple[str, str]]:
+        """Count one more contribution of a term; (normalized, term key) when the term is new"""
+        normalized = normalize(text)
+        if not normalized:
+            return None
+
+        term_key = f"{term_type}:{normalized}"
+        term = self._terms.get(term_key)
+        if term is not None:
+            term["count"] += 1
+            return None
+
+        self._terms[term_key] = {"type": term_type, "text": text.strip(), "category": category, "count": 1}
+        return normalized, term_key
+
+    def _add_term(self, text: str, term_type: str, category: str) -> None:
+        self._memo.clear()
+        added = self._count_term(text, term_type, category)
+        if added is None:
+            return
+
+        normalized, term_key = added
+        for search_key in self._search_keys(normalized):
+            insort(self._keys, (search_key, term_key))
+
+    def _remove_term(self, text: str, term_type: str) -> None:
+        normalized = normalize(text)
+        term_key = f"{term_type}:{normalized}"
+        term = self._terms.get(term_key)
+        if term is None:
+            return
+
+        self._memo.clear()
+        term["count"] -= 1
+        if term["count"] > 0:
+            return
+
+        del self._terms[term_key]
+        for search_key in self._search_keys(normalized):
+            position = bisect_left(self._keys, (search_key, term_key))
+            if position < len(self._keys) and self._keys[position] == (search_key, term_key):
+                del self._keys[position]
+
+    def set_source(self, source_id: str, terms: Iterable[Term]) -> None:
+        """Replace everything a source row contributes with its current terms"""
+        self.remove_source(source_id)
+        terms = self._valid_terms(terms)
+        if not terms:
+            return
+
+        self._sources[source_id] = terms
+        for text, term_type, category in terms:
+            self._add_term(text, term_type, category)
+
+    def remove_source(self, source_id: str) -> None:
+        for text, term_type, _ in self._sources.pop(source_id, []):
+            self._remove_term(text, term_type)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Most popular terms with a word starting with prefix"""
+        normalized = normalize(prefix)
+        if not normalized:
+            return self.popular(limit)
+
+        memo_key = (normalized, limit)
+        best = self._memo.get(memo_key)
+        if best is None:
+            best = self._rank_prefix(normalized, limit)
+            if len(normalized) <= MEMO_PREFIX_LENGTH:
+                self._memo[memo_key] = best
+        return [self._suggestion(term_key) for term_key in best]
+
+    def _rank_prefix(self, normalized: str, limit: int) -> List[str]:
+        """Top `limit` term keys among every key starting with normalized, ranked during the scan"""
+        top: List[Tuple[int, str]] = []     # min-heap of (count, term key)
+        seen = set()
+        position = bisect_left(self._keys, (normalized,))
+        while position < len(self._keys) and self._keys[position][0].startswith(normalized):
+            term_key = self._keys[position][1]
+            position += 1
+            if term_key in seen:
+                continue
+            seen.add(term_key)
+
+            entry = (self._terms[term_key]["count"], term_key)
+            if len(top) < limit:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+
+        return [term_key for _, term_key in sorted(top, reverse=True)]
+
+    def popular(self, limit: int = 10) -> List[dict]:
+        """Most popular terms overall"""
+        best = heapq.nlargest(limit, self._terms, key=lambda term_key: (self._terms[term_key]["count"], term_key))
+        return [self._suggestion(term_key) for term_key in best]
+
+    def _suggestion(self, term_key: str) -> dict:
+        term = self._terms[term_key]
+        return {"type": term["type"], "text": term["text"], "category": term["category"], "count": term["count"]}
+
+# ============================================================================
+# FACET COUNTS
+# ============================================================================
+
+class FacetCounter:
+    """Per-facet value counts, maintained by replacing each source row's contribution"""
+
+    def __init__(self):
+        self._counts: Dict[str, Counter] = {}
+        self._sources: Dict[str, Facets] = {}
+
+    @classmethod
+    def build(cls, sources: Dict[str, Facets]) -> "FacetCounter":
+        """Counts over every source's facet values, without per-source replacement"""
+        counter = cls()
+        for source_id, facets in sources.items():
+            counter._add_source(source_id, facets)
+        return counter
+
+    def set_source(self, source_id: str, facets: Facets) -> None:
+        self.remove_source(source_id)
+        self._add_source(source_id, facets)
+
+    def _add_source(self, source_id: str, facets: Facets) -> None:
+        facets = {name: [value for value in values if value] for name, values in facets.items()}
+        if not any(facets.values()):
+            return
+
+        self._sources[source_id] = facets
+        for name, values in facets.items():
+            counts = self._counts.get(name)
+            if counts is None:
+                counts = self._counts[name] = Counter()
+            for value in values:
+                counts[value] += 1
+
+    def remove_source(self, source_id: str) -> None:
+        for name, values in self._sources.pop(source_id, {}).items():
+            counts = self._counts[name]
+            counts.subtract(values)
+            for value in values:
+                if counts[value] <= 0:
+                    del counts[value]
+
+    def counts(self, name: str) -> Counter:
+        return self._counts.get(name, Counter())
+
+def range_label(value, ranges: List[dict]) -> Optional[str]:
+    """Label of the [min, max) range containing value"""
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+
+    for bucket in ranges:
+        if value >= bucket["min"] and (bucket["max"] is None or value < bucket["max"]):
+            return bucket["label"]
+    return None
+
+def location_label(location, work_type: Optional[str] = None, specific_location: Optional[str] = None) -> Optional[str]:
+    """Display name for a job/profile location (JSONB dict, JSON string or plain text)"""
+    if isinstance(location, str):
+        try:
+            location = json.loads(location)
+        except ValueError:
+            location = {"address": location}
+    location = location if isinstance(location, dict) else {}
+
+    location_type = str(location.get("type") or work_type or "").lower()
+    if location_type == "remote":
+        return "Remote"
+
+    name = specific_location or location.get("address") or location.get("city")
+    return name.strip() if isinstance(name, str) and name.strip() else None
+
+# ============================================================================
+# INDEX MAINTENANCE
+# ============================================================================
+
+gig_suggestions = PrefixIndex()
+talent_suggestions = PrefixIndex()
+gig_facets = FacetCounter()
+talent_facets = FacetCounter()
+
+_loaded_at: Optional[float] = None
+_load_lock = asyncio.Lock()
+_refresh_task: Optional[asyncio.Task] = None
+# Changes made while a rebuild is reading the database, replayed onto the new snapshot
+_changes_during_rebuild: Optional[List[Tuple[str, str, Optional[dict]]]] = None
+
+def job_terms(job: dict) -> List[Term]:
+    """Suggestion terms a job contributes while it is published"""
+    if job.get("status") != "published":
+        return []
+
+    category = job.get("category") or "other"
+    terms = [(job.get("title") or "", "job", category)]
+    if job.get("category"):
+        terms.append((job["category"], "category", category))
+    return terms
+
+def profile_terms(profile: dict) -> List[Term]:
+    """Suggestion terms a worker profile contributes"""
+    return [(skill, "skill", "skill") for skill in (profile.get("skills") or []) if isinstance(skill, str)]
+
+def job_facets(job: dict) -> Facets:
+    """Filter facet values a job contributes while it is published"""
+    if job.get("status") != "published":
+        return {}
+
+    return {
+        "category": [job.get("category")],
+        "location": [location_label(job.get("location"), job.get("work_type"), job.get("specific_location"))],
+        "budget": [range_label(job.get("budget"), BUDGET_RANGES)],
+        "job_type": [job.get("job_type")]
+    }
+
+def profile_facets(profile: dict) -> Facets:
+    """Filter facet values a worker profile contributes"""
+    skills = {skill.strip() for skill in (profile.get("skills") or []) if isinstance(skill, str) and skill.strip()}
+    return {
+        "skill": sorted(skills),
+        "location": [location_label(profile.get("location"))],
+        "hourly_rate": [range_label(profile.get("hourly_rate"), HOURLY_RATE_RANGES)]
+    }
+
+# (gig suggestions, gig facets, talent suggestions, talent facets)
+Snapshot = Tuple[PrefixIndex, FacetCounter, PrefixIndex, FacetCounter]
+
+def _apply(snapshot: Snapshot, kind: str, source_id: str, row: Optional[dict]) -> None:
+    if kind == "job":
+        suggestions, facets, terms, values = snapshot[0], snapshot[1], job_terms, job_facets
+    else:
+        suggestions, facets, terms, values = snapshot[2], snapshot[3], profile_terms, profile_facets
+
+    if row is None:
+        suggestions.remove_source(source_id)
+        facets.remove_source(source_id)
+    else:
+        suggestions.set_source(source_id, terms(row))
+        facets.set_source(source_id, values(row))
+
+def _record(kind: str, source_id: str, row: Optional[dict]) -> None:
+    if _changes_during_rebuild is not None:
+        _changes_during_rebuild.append((kind, source_id, row))
+    _apply((gig_suggestions, gig_facets, talent_suggestions, talent_facets), kind, source_id, row)
+
+def index_job(job: dict) -> None:
+    """Call after a job is created or updated, with the row returned by Supabase"""
+    if job.get("id"):
+        _record("job", str(job["id"]), job)
+
+def remove_job(job_id: str) -> None:
+    _record("job", str(job_id), None)
+
+def index_profile(profile: dict) -> None:
+    """Call after a worker profile is created or updated, with the row returned by Supabase"""
+    if profile.get("id"):
+        _record("profile", str(profile["id"]), profile)
+
+def remove_profile(profile_id: str) -> None:
+    _record("profile", str(profile_id), None)
+
+async def _fetch_all(table: str, columns: str, **filters) -> List[dict]:
+    supabase = get_supabase_admin()
+    rows = []
+    offset = 0
+    while True:
+        query = supabase.table(table).select(columns)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        result = await run_query(query.order('id').range(offset, offset + SEARCH_INDEX_PAGE_SIZE - 1))
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < SEARCH_INDEX_PAGE_SIZE:
+            return rows
+        offset += SEARCH_INDEX_PAGE_SIZE
+
+def _build_snapshot(jobs: List[dict], profiles: List[dict]) -> Snapshot:
+    """Fresh indexes for the given rows. Runs in a worker thread and touches no globals."""
+    return (
+        PrefixIndex.build({str(job["id"]): job_terms(job) for job in jobs}),
+        FacetCounter.build({str(job["id"]): job_facets(job) for job in jobs}),
+        PrefixIndex.build({str(profile["id"]): profile_terms(profile) for profile in profiles}),
+        FacetCounter.build({str(profile["id"]): profile_facets(profile) for profile in profiles})
+    )
+
+async def rebuild() -> None:
+    """
+    Rebuild every index from the database off the event loop and swap it in.
+    Requests keep being served (and writes keep being applied) on the current
+    snapshot meanwhile; writes are also replayed onto the new one before the swap.
+    """
+    global gig_suggestions, talent_suggestions, gig_facets, talent_facets
+    global _loaded_at, _changes_during_rebuild
+
+    _changes_during_rebuild = []
+    try:
+        jobs = await _fetch_all(
+            'jobs',
+            'id, title, category, status, job_type, budget, location, specific_location, work_type',
+            status='published'
+        )
+        profiles = await _fetch_all('worker_profiles', 'id, skills, location, hourly_rate')
+
+        snapshot = await asyncio.to_thread(_build_snapshot, jobs, profiles)
+        for kind, source_id, row in _changes_during_rebuild:
+            _apply(snapshot, kind, source_id, row)
+    finally:
+        _changes_during_rebuild = None
+
+    gig_suggestions, gig_facets, talent_suggestions, talent_facets = snapshot
+    _loaded_at = time.monotonic()
+
+async def _refresh() -> None:
+    async with _load_lock:
+        try:
+            await rebuild()
+        except Exception as e:
+            # Keep serving the previous snapshot; retried after the next interval check
+            logger.error(f"Search index rebuild failed: {e}")
+
+async def ensure_loaded() -> None:
+    """
+    Build the indexes on first use. Once stale, rebuild them in the background
+    while requests keep being served from the current snapshot.
+    """
+    global _refresh_task
+
+    if _loaded_at is None:
+        async with _load_lock:
+            if _loaded_at is None:
+                await rebuild()
+        return
+
+    if time.monotonic() - _loaded_at >= SEARCH_INDEX_REFRESH_SECONDS:
+        if _refresh_task is None or _refresh_task.done():
+            _refresh_task = asyncio.create_task(_refresh())
@@ -9,7 +9,8 @@ from typing import List, Optional, Dict
 from datetime import datetime
 import re
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
+import search_index
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
@@ -26,33 +27,56 @@ class SearchSuggestion(BaseModel):
 # HELPER FUNCTIONS
 # ============================================================================
 
-def get_popular_locations() -> List[Dict]:
-    """Get popular location data"""
+def get_popular_locations(search_type: str = "gigs", limit: int = 5) -> List[Dict]:
+    """Get the most common job/worker locations with live counts"""
+    facets = search_index.gig_facets if search_type == "gigs" else search_index.talent_facets
     return [
-        {"name": "Remote", "type": "remote", "count": 1500},
-        {"name": "New York, NY", "type": "onsite", "count": 450},
-        {"name": "San Francisco, CA", "type": "onsite", "count": 380},
-        {"name": "London, UK", "type": "onsite", "count": 320},
-        {"name": "Berlin, Germany", "type": "onsite", "count": 280}
+        {"name": name, "type": "remote" if name == "Remote" else "onsite", "count": count}
+        for name, count in facets.counts("location").most_common(limit)
     ]
 
+def get_facet_ranges(facets: search_index.FacetCounter, name: str, ranges: List[Dict]) -> List[Dict]:
+    """Range buckets annotated with the number of items in each"""
+    counts = facets.counts(name)
+    return [{**bucket, "count": counts.get(bucket["label"], 0)} for bucket in ranges]
+
+DEFAULT_POPULAR_SEARCHES = {
+    "gigs": [
+        {"type": "popular", "text": "React Developer", "category": "development"},
+        {"type": "popular", "text": "Logo Design", "category": "design"},
+        {"type": "popular", "text": "Content Writing", "category": "writing"},
+        {"type": "popular", "text": "Social Media Marketing", "category": "marketing"}
+    ],
+    "talents": [
+        {"type": "popular", "text": "JavaScript", "category": "skill"},
+        {"type": "popular", "text": "UI/UX Design", "category": "skill"},
+        {"type": "popular", "text": "Digital Marketing", "category": "skill"},
+        {"type": "popular", "text": "Project Management", "category": "skill"}
+    ]
+}
+
+def suggestion_index(search_type: str) -> search_index.PrefixIndex:
+    return search_index.gig_suggestions if search_type == "gigs" else search_index.talent_suggestions
+
 def get_popular_searches(search_type: str) -> List[Dict]:
-    """Get popular search suggestions"""
-    popular = {
-        "gigs": [
-            {"type": "popular", "text": "React Developer", "category": "development"},
-            {"type": "popular", "text": "Logo Design", "category": "design"},
-            {"type": "popular", "text": "Content Writing", "category": "writing"},
-            {"type": "popular", "text": "Social Media Marketing", "category": "marketing"}
-        ],
-        "talents": [
-            {"type": "popular", "text": "JavaScript", "category": "skill"},
-            {"type": "popular", "text": "UI/UX Design", "category": "skill"},
-            {"type": "popular", "text": "Digital Marketing", "category": "skill"},
-            {"type": "popular", "text": "Project Management", "category": "skill"}
-        ]
-    }
-    return popular.get(search_type, [])
+    """Get popular search suggestions (most used titles, categories and skills)"""
+    popular = [
+        {**suggestion, "type": "popular"}
+        for suggestion in suggestion_index(search_type).popular(4)
+    ]
+    # Defaults until there is enough live data to rank
+    return popular or DEFAULT_POPULAR_SEARCHES.get(search_type, [])
+
+def lower_skills(skills: List[str]) -> List[str]:
+    """
+    Requested skills lower-cased for overlap with worker_profiles.skills_lower
+    (GIN indexed, see ADD_WORKER_SKILLS_LOWER.sql), so matching ignores case
+    """
+    lowered = []
+    for skill in skills:
+        if skill.lower() not in lowered:
+            lowered.append(skill.lower())
+    return lowered
 
 # ============================================================================
 # ROUTES
@@ -66,15 +90,41 @@ async def search_gigs(
     min_budget: Optional[int] = Query(None),
     max_budget: Optional[int] = Query(None),
     job_type: Optional[str] = Query(None),
+    sort: str = Query("relevance", description="Sort by: relevance, date, price"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100)
 ):
     """Search for gigs/jobs"""
     try:
         supabase = get_supabase_admin()
+        offset = (page - 1) * limit
+        
+        # Text search: ranked full-text + trigram search (see ADD_SEARCH_INDEXES.sql)
+        if q:
+            result = await run_query(supabase.rpc('search_jobs_ranked', {
+                "search_query": q,
+                "p_category": category,
+                "p_job_type": job_type,
+                "p_min_budget": min_budget,
+                "p_max_budget": max_budget,
+                "p_sort": sort,
+                "p_limit": limit,
+                "p_offset": offset
+            }))
+            ranked = result.data or {}
+            
+            return {
+                "success": True,
+                "jobs": ranked.get('results', []),
+                "pagination": {
+                    "page": page,
+                    "limit": limit,
+                    "total": ranked.get('total', 0)
+                }
+            }
         
         # Build query
-        query = supabase.table('jobs').select('*').eq('status', 'published')
+        query = supabase.table('jobs').select('*', count='exact').eq('status', 'published')
         
         # Apply filters
         if category:
@@ -86,13 +136,10 @@ async def search_gigs(
         if max_budget:
             query = query.lte('budget', max_budget)
         
-        # Text search (simple ilike for now)
-        if q:
-            query = query.or_(f'title.ilike.%{q}%,description.ilike.%{q}%')
-        
         # Pagination
-        offset = (page - 1) * limit
-        result = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        if sort == "price":
+            query = query.order('budget', desc=True)
+        result = await run_query(query.order('created_at', desc=True).range(offset, offset + limit - 1))
         
         jobs = result.data if result.data else []
         
@@ -102,7 +149,7 @@ async def search_gigs(
             "pagination": {
                 "page": page,
                 "limit": limit,
-                "total": len(jobs)
+                "total": result.count if result.count is not None else len(jobs)
             }
         }
         
@@ -117,58 +164,76 @@ async def search_talents(
     min_hourly_rate: Optional[int] = Query(None),
     max_hourly_rate: Optional[int] = Query(None),
     experience_level: Optional[str] = Query(None),
+    sort: str = Query("relevance", description="Sort by: relevance, date, price, rating"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100)
 ):
     """Search for talents/workers"""
     try:
         supabase = get_supabase_admin()
+        offset = (page - 1) * limit
+        skill_list = [s.strip() for s in skills.split(',') if s.strip()] if skills else []
         
-        # Build query - search in users table with worker role
-        query = supabase.table('users').select('*').contains('roles', ['worker'])
-        
-        # Text search
+        # Text search: ranked full-text + trigram search over profiles (see ADD_SEARCH_INDEXES.sql)
         if q:
-            query = query.or_(f'name.ilike.%{q}%,bio.ilike.%{q}%')
+            result = await run_query(supabase.rpc('search_workers_ranked', {
+                "search_query": q,
+                "p_skills": lower_skills(skill_list) if skill_list else None,
+                "p_min_rate": min_hourly_rate,
+                "p_max_rate": max_hourly_rate,
+                "p_sort": sort,
+                "p_limit": limit,
+                "p_offset": offset
+            }))
+            ranked = result.data or {}
+            
+            return {
+                "success": True,
+                "talents": ranked.get('results', []),
+                "pagination": {
+                    "page": page,
+                    "limit": limit,
+                    "total": ranked.get('total', 0)
+                }
+            }
         
-        # Pagination
-        offset = (page - 1) * limit
-        result = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        # Single query: workers joined with their profile. Profile filters are
+        # applied in the database (GIN index on skills_lower) before pagination, so
+        # pages are full and the total is exact.
+        filter_profiles = bool(skill_list or min_hourly_rate or max_hourly_rate)
+        profile_embed = 'worker_profiles!inner(*)' if filter_profiles else 'worker_profiles(*)'
         
-        workers = result.data if result.data else []
+        query = supabase.table('users').select(f'*, {profile_embed}', count='exact').contains('roles', ['worker'])
         
-        # Get worker profiles for additional info
-        enriched_workers = []
-        for worker in workers:
-            # Get worker profile
-            profile_result = supabase.table('worker_profiles').select('*').eq('user_id', worker['id']).execute()
-            
-            if profile_result.data and len(profile_result.data) > 0:
-                profile = profile_result.data[0]
+        if skill_list:
+            query = query.overlaps('worker_profiles.skills_lower', lower_skills(skill_list))
+        if min_hourly_rate:
+            query = query.gte('worker_profiles.hourly_rate', min_hourly_rate)
+        if max_hourly_rate:
+            query = query.lte('worker_profiles.hourly_rate', max_hourly_rate)
+        
+        # Pagination
+        if sort in ("price", "rating"):
+            column = 'hourly_rate' if sort == "price" else 'rating'
+            query = query.order(f'worker_profiles({column})', desc=True)
+        result = await run_query(query.order('created_at', desc=True).range(offset, offset + limit - 1))
+        
+        workers = []
+        for worker in (result.data or []):
+            profile = worker.pop('worker_profiles', None)
+            if isinstance(profile, list):
+                profile = profile[0] if profile else None
+            if profile:
                 worker['profile'] = profile
-                
-                # Filter by skills if specified
-                if skills:
-                    skill_list = [s.strip() for s in skills.split(',')]
-                    worker_skills = profile.get('skills', [])
-                    if not any(skill.lower() in [ws.lower() for ws in worker_skills] for skill in skill_list):
-                        continue
-                
-                # Filter by hourly rate if specified
-                if min_hourly_rate and profile.get('hourly_rate', 0) < min_hourly_rate:
-                    continue
-                if max_hourly_rate and profile.get('hourly_rate', 999999) > max_hourly_rate:
-                    continue
-            
-            enriched_workers.append(worker)
+            workers.append(worker)
         
         return {
             "success": True,
-            "talents": enriched_workers[:limit],
+            "talents": workers,
             "pagination": {
                 "page": page,
                 "limit": limit,
-                "total": len(enriched_workers)
+                "total": result.count if result.count is not None else len(workers)
             }
         }
         
@@ -182,41 +247,14 @@ async def get_search_suggestions(
 ):
     """Get search suggestions for autocomplete"""
     try:
-        suggestions = []
+        await search_index.ensure_loaded()
         
         if not q or len(q) < 2:
             # Return popular searches
             suggestions = get_popular_searches(search_type)
         else:
-            # Search in database for matching terms
-            supabase = get_supabase_admin()
-            
-            if search_type == "gigs":
-                # Search job titles and categories
-                result = supabase.table('jobs').select('title, category').eq('status', 'published').ilike('title', f'%{q}%').limit(10).execute()
-                
-                for job in (result.data or []):
-                    suggestions.append({
-                        "type": "job",
-                        "text": job['title'],
-                        "category": job.get('category', 'other')
-                    })
-            else:
-                # Search worker skills
-                result = supabase.table('worker_profiles').select('skills').limit(50).execute()
-                
-                skills_set = set()
-                for profile in (result.data or []):
-                    for skill in profile.get('skills', []):
-                        if q.lower() in skill.lower():
-                            skills_set.add(skill)
-                
-                for skill in list(skills_set)[:10]:
-                    suggestions.append({
-                        "type": "skill",
-                        "text": skill,
-                        "category": "skill"
-                    })
+            # Prefix lookup in the in-memory index, most popular first
+            suggestions = suggestion_index(search_type).suggest(q, limit=10)
         
         return {
             "success": True,
@@ -230,50 +268,37 @@ async def get_search_suggestions(
 async def get_filter_options(search_type: str = Query("gigs")):
     """Get available filter options for search"""
     try:
-        supabase = get_supabase_admin()
+        # Served from the facet cache, kept current by job and profile writes
+        await search_index.ensure_loaded()
         
         if search_type == "gigs":
-            # Get unique categories from jobs
-            result = supabase.table('jobs').select('category').eq('status', 'published').execute()
-            
-            categories = list(set(job['category'] for job in (result.data or []) if job.get('category')))
+            facets = search_index.gig_facets
+            categories = facets.counts("category")
             
             return {
                 "success": True,
                 "filters": {
                     "categories": sorted(categories),
-                    "locations": get_popular_locations(),
-                    "budget_ranges": [
-                        {"label": "Under $500", "min": 0, "max": 500},
-                        {"label": "$500 - $1,000", "min": 500, "max": 1000},
-                        {"label": "$1,000 - $5,000", "min": 1000, "max": 5000},
-                        {"label": "$5,000 - $10,000", "min": 5000, "max": 10000},
-                        {"label": "$10,000+", "min": 10000, "max": None}
+                    "category_counts": [
+                        {"name": name, "count": count} for name, count in categories.most_common()
                     ],
+                    "locations": get_popular_locations("gigs"),
+                    "budget_ranges": get_facet_ranges(facets, "budget", search_index.BUDGET_RANGES),
                     "job_types": ["project", "gig", "contract", "full-time"]
                 }
             }
         else:
-            # Get skills from worker profiles
-            result = supabase.table('worker_profiles').select('skills').limit(100).execute()
-            
-            all_skills = set()
-            for profile in (result.data or []):
-                all_skills.update(profile.get('skills', []))
+            facets = search_index.talent_facets
+            top_skills = facets.counts("skill").most_common(50)
             
             return {
                 "success": True,
                 "filters": {
-                    "skills": sorted(list(all_skills))[:50],
-                    "locations": get_popular_locations(),
+                    "skills": sorted(name for name, _ in top_skills),
+                    "skill_counts": [{"name": name, "count": count} for name, count in top_skills],
+                    "locations": get_popular_locations("talents"),
                     "experience_levels": ["entry", "intermediate", "expert"],
-                    "hourly_rate_ranges": [
-                        {"label": "Under $25/hr", "min": 0, "max": 25},
-                        {"label": "$25 - $50/hr", "min": 25, "max": 50},
-                        {"label": "$50 - $100/hr", "min": 50, "max": 100},
-                        {"label": "$100 - $200/hr", "min": 100, "max": 200},
-                        {"label": "$200+/hr", "min": 200, "max": None}
-                    ]
+                    "hourly_rate_ranges": get_facet_ranges(facets, "hourly_rate", search_index.HOURLY_RATE_RANGES)
                 }
             }
         
@@ -292,9 +317,15 @@ async def advanced_search(
     """Advanced search with multiple filters and sorting"""
     try:
         if search_type == "gigs":
-            return await search_gigs(q=q, page=page, limit=limit)
+            return await search_gigs(
+                q=q, category=None, location=None, min_budget=None, max_budget=None,
+                job_type=None, sort=sort, page=page, limit=limit
+            )
         else:
-            return await search_talents(q=q, page=page, limit=limit)
+            return await search_talents(
+                q=q, skills=None, location=None, min_hourly_rate=None, max_hourly_rate=None,
+                experience_level=None, sort=sort, page=page, limit=limit
+            )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Advanced search failed: {str(e)}")
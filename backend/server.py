@@ -11,7 +11,13 @@ import uuid
 from datetime import datetime
 
 # Import Supabase client
-from supabase_client import supabase, get_supabase_client
+from supabase_client import supabase, get_supabase_client, shutdown_db_executor
+from location_ingest import location_ingest
+from analytics_ingest import analytics_ingest
+from llm_gateway import llm_gateway
+from llm_cache import llm_cache
+from realtime_hub import realtime_hub
+from password_hashing import password_hasher
 
 # SUPABASE MIGRATION: Using Supabase version for sos_voice_routes
 from sos_voice_routes_supabase import router as sos_router
@@ -107,6 +113,19 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+@api_router.get("/llm/metrics")
+async def get_llm_metrics():
+    """Per-model LLM call counts, latency percentiles and circuit state, plus cache stats"""
+    return {
+        "models": llm_gateway.metrics(),
+        "cache": {**llm_cache.stats, "entries": len(llm_cache), "hit_rate": round(llm_cache.hit_rate, 3)}
+    }
+
+@api_router.get("/auth-hashing/metrics")
+async def get_password_hashing_metrics():
+    """bcrypt pool size, queue depth, rejections and average wait/run times"""
+    return password_hasher.metrics()
+
 # Include all routers under /api prefix
 api_router.include_router(auth_router)
 api_router.include_router(sos_router)
@@ -152,3 +171,8 @@ logger = logging.getLogger(__name__)
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+    await location_ingest.stop()
+    await analytics_ingest.stop()
+    await realtime_hub.stop()
+    password_hasher.shutdown()
+    shutdown_db_executor()
@@ -1,15 +1,24 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-import os
 from dotenv import load_dotenv
-import uuid
+import asyncio
 import json
+import re
+
+from llm_cache import complete_json, stream_json
+from llm_gateway import llm_deadline
+from json_stream import sse_event
+from language_id import detect_language_locally, language_tag, reply_language_code, REPLY_LANGUAGES
 
 load_dotenv()
 
 router = APIRouter(prefix="/api/sos", tags=["SOS & Voice"])
 
+# Total LLM time allowed per request; past it, endpoints use their fallbacks
+TAP_HELP_LLM_DEADLINE_SECONDS = 8
+VOICE_COMMAND_LLM_DEADLINE_SECONDS = 12
+
 # ============================================================================
 # MODELS
 # ============================================================================
@@ -45,6 +54,111 @@ class SmartSuggestionRequest(BaseModel):
     partialText: str
     context: str = "general"
 
+# ============================================================================
+# INTENT CLASSIFIER
+# ============================================================================
+
+class IntentClassifierService:
+    """
+    Keyword-weighted classifier for SOS prompts over the QuickHire service
+    categories (see generate_price). Confident matches skip the LLM entirely.
+    Keywords ending in "*" match as word prefixes; others as whole words or
+    phrases (plural "s"/"es" allowed).
+    """
+    
+    MIN_SCORE = 3
+    MIN_MARGIN = 2
+    
+    def __init__(self):
+        self.services = {
+            'Plumber': ('plumber', 'handyman', {
+                'plumb*': 3, 'pipe': 2, 'leak*': 2, 'toilet': 2, 'drain*': 2, 'faucet': 2, 'sink': 2,
+                'clog*': 2, 'water heater': 3, 'burst': 2, 'sewage': 2, 'shower': 1, 'flood*': 1
+            }),
+            'Electrician': ('electrician', 'handyman', {
+                'electric*': 3, 'wiring': 2, 'outlet': 2, 'breaker': 2, 'fuse': 2, 'no power': 3,
+                'power outage': 3, 'power': 1, 'spark*': 2, 'light switch': 2, 'socket': 2, 'shock*': 1
+            }),
+            'Cleaning': ('cleaner', 'general labor', {
+                'clean*': 3, 'maid': 3, 'housekeep*': 3, 'vacuum*': 2, 'mop*': 2, 'tidy': 2,
+                'laundry': 2, 'dust*': 1, 'mess': 1, 'stain': 1, 'dirty': 1
+            }),
+            'Handyman': ('handyman', 'handyman', {
+                'handyman': 3, 'handymen': 3, 'mount*': 2, 'assembl*': 2, 'shelf': 2, 'shelves': 2,
+                'drywall': 2, 'fix*': 1, 'repair*': 1, 'door': 1, 'hang': 1
+            }),
+            'Moving': ('mover', 'general labor', {
+                'mover': 3, 'moving': 3, 'relocat*': 2, 'haul*': 2, 'move': 1, 'box': 1,
+                'truck': 1, 'furniture': 1, 'lift': 1, 'carry': 1
+            }),
+            'Locksmith': ('locksmith', 'handyman', {
+                'locksmith*': 3, 'locked out': 3, 'lockout': 3, 'lock': 2, 'key': 2
+            }),
+            'HVAC': ('hvac technician', 'handyman', {
+                'hvac': 3, 'air condition*': 3, 'furnace': 3, 'ac': 3, 'heating': 2, 'thermostat': 2,
+                'cooling': 2, 'boiler': 2, 'heater': 1, 'vent': 1
+            }),
+            'Painting': ('painter', 'handyman', {
+                'paint*': 3, 'repaint*': 3, 'primer': 2, 'wall': 1, 'coat': 1
+            }),
+            'Carpentry': ('carpenter', 'handyman', {
+                'carpent*': 3, 'woodwork*': 3, 'cabinet': 2, 'deck': 2, 'wood*': 2, 'framing': 2, 'trim': 1
+            }),
+            'Landscaping': ('landscaper', 'general labor', {
+                'landscap*': 3, 'lawn': 3, 'mow*': 3, 'garden*': 2, 'yard': 2, 'hedge': 2,
+                'tree': 2, 'weed*': 2, 'grass': 2, 'leaves': 1
+            })
+        }
+        self.urgent_keywords = [
+            'now', 'urgent*', 'asap', 'emergenc*', 'immediately', 'right away', 'flood*', 'fire',
+            'smoke', 'burst', 'spark*', 'locked out', 'gas', 'help'
+        ]
+        self._patterns = {
+            service: [(self._compile(keyword), weight) for keyword, weight in keywords.items()]
+            for service, (_, _, keywords) in self.services.items()
+        }
+        self._urgent_patterns = [self._compile(keyword) for keyword in self.urgent_keywords]
+        self.stats = {"local": 0, "llm": 0, "fallback": 0}
+    
+    @staticmethod
+    def _compile(keyword: str):
+        if keyword.endswith('*'):
+            return re.compile(r'\b' + re.escape(keyword[:-1]))
+        return re.compile(r'\b' + re.escape(keyword) + r'(?:s|es)?\b')
+    
+    def score(self, prompt: str) -> list:
+        """(service, score) pairs, best first"""
+        prompt_lower = prompt.lower()
+        scores = [
+            (service, sum(weight for pattern, weight in patterns if pattern.search(prompt_lower)))
+            for service, patterns in self._patterns.items()
+        ]
+        return sorted(scores, key=lambda pair: pair[1], reverse=True)
+    
+    def detect_urgency(self, prompt: str) -> str:
+        prompt_lower = prompt.lower()
+        if any(pattern.search(prompt_lower) for pattern in self._urgent_patterns):
+            return 'emergency'
+        return 'normal'
+    
+    def classify(self, prompt: str) -> dict:
+        """Intent data for a confident match, else None"""
+        (best, best_score), (_, second_score) = self.score(prompt)[:2]
+        if best_score < self.MIN_SCORE or best_score - second_score < self.MIN_MARGIN:
+            return None
+        
+        intent, category, _ = self.services[best]
+        article = "an" if intent[0] in "aeiou" else "a"
+        return {
+            "intent": intent,
+            "category": category,
+            "urgency": self.detect_urgency(prompt),
+            "description": f"User needs {article} {intent}: {prompt}"
+        }
+
+# Initialize classifier service
+intent_classifier = IntentClassifierService()
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -91,13 +205,7 @@ def find_nearby_helpers(intent: str, location: str, urgency: str) -> list:
     helpers.sort(key=lambda x: x['distanceValue'])
     return helpers[:3]
 
-async def detect_intent(prompt: str, context: dict) -> dict:
-    """Use AI to detect user intent from voice/text prompt"""
-    
-    session_id = str(uuid.uuid4())
-    api_key = os.getenv('EMERGENT_LLM_KEY')
-    
-    system_message = """You are an intelligent assistant for Hapployed, a gig marketplace platform.
+INTENT_SYSTEM_MESSAGE = """You are an intelligent assistant for Hapployed, a gig marketplace platform.
     Your job is to understand what help the user needs and respond with structured information.
     
     Extract:
@@ -114,35 +222,212 @@ async def detect_intent(prompt: str, context: dict) -> dict:
         "description": "User needs a plumber for pipe burst"
     }
     """
+
+def intent_message(prompt: str, context: dict) -> str:
+    """User message for intent detection"""
+    context_info = f"User location: {context.get('location', 'unknown')}\n"
+    context_info += f"Recent search: {context.get('recentSearch', 'none')}\n"
+    context_info += f"User prompt: {prompt}"
+    return context_info
+
+def fallback_intent(prompt: str) -> dict:
+    return {
+        "intent": "general helper",
+        "category": "general labor",
+        "urgency": "normal",
+        "description": f"User needs: {prompt}"
+    }
+
+async def detect_intent(prompt: str, context: dict) -> dict:
+    """
+    Detect user intent from voice/text prompt: the local classifier when it is
+    confident, otherwise AI (cached per prompt + context). "source" reports
+    which path answered: local, llm or fallback.
+    """
+    local_intent = intent_classifier.classify(prompt)
+    if local_intent:
+        intent_classifier.stats["local"] += 1
+        return {**local_intent, "source": "local"}
     
     try:
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
-        # Build context message
-        context_info = f"User location: {context.get('location', 'unknown')}\n"
-        context_info += f"Recent search: {context.get('recentSearch', 'none')}\n"
-        context_info += f"User prompt: {prompt}"
-        
-        user_message = UserMessage(text=context_info)
-        response = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        intent_data = json.loads(response)
-        return intent_data
+        intent_data = await complete_json(INTENT_SYSTEM_MESSAGE, intent_message(prompt, context))
+        intent_classifier.stats["llm"] += 1
+        return {**intent_data, "source": "llm"}
         
     except Exception as e:
         print(f"Error detecting intent: {e}")
+        intent_classifier.stats["fallback"] += 1
         # Fallback response
-        return {
-            "intent": "general helper",
-            "category": "general labor",
-            "urgency": "normal",
-            "description": f"User needs: {prompt}"
-        }
+        return {**fallback_intent(prompt), "source": "fallback"}
+
+def tap_help_narration(intent: str, helpers: list) -> str:
+    return f"Found {len(helpers)} {intent}s nearby. Help is on the way."
+
+async def stream_tap_help(request: SOSRequest):
+    """
+    SSE frames for tap-help: intent and helpers as soon as the intent field is
+    parsed, the remaining intent fields as they arrive, then the narration
+    """
+    context = {
+        "location": request.location or "user location",
+        "recentSearch": request.recentSearch or "none",
+    }
+    prompt = request.voicePrompt or "need help now"
+    intent_data = {}
+    helpers = None
+    
+    def with_helpers(fields: dict) -> dict:
+        nonlocal helpers
+        if helpers is None and 'intent' in intent_data:
+            helpers = find_nearby_helpers(
+                intent_data['intent'],
+                request.location or "nearby",
+                intent_data.get('urgency', 'normal')
+            )
+            fields = {**fields, "nearbyHelpers": helpers}
+        return fields
+    
+    local_intent = intent_classifier.classify(prompt)
+    if local_intent:
+        intent_classifier.stats["local"] += 1
+        source = "local"
+        intent_data.update(local_intent)
+        yield sse_event("partial", with_helpers({**local_intent, "intentSource": source}))
+    else:
+        source = "llm"
+        try:
+            # Same LLM budget as the non-streaming endpoint; past it, the fallback fills in
+            with llm_deadline(TAP_HELP_LLM_DEADLINE_SECONDS):
+                async for fields in stream_json(INTENT_SYSTEM_MESSAGE, intent_message(prompt, context)):
+                    intent_data.update(fields)
+                    yield sse_event("partial", with_helpers(fields))
+        except Exception as e:
+            print(f"Error detecting intent: {e}")
+            source = "fallback"
+        intent_classifier.stats[source] += 1
+        
+        # Fill in anything the model did not provide (or everything, on failure)
+        missing = {k: v for k, v in fallback_intent(prompt).items() if k not in intent_data}
+        if missing:
+            intent_data.update(missing)
+            yield sse_event("partial", with_helpers(missing))
+        yield sse_event("partial", {"intentSource": source})
+    
+    narration = tap_help_narration(intent_data['intent'], helpers)
+    yield sse_event("partial", {"narration": narration})
+    yield sse_event("done", {
+        "intent": intent_data['intent'],
+        "category": intent_data['category'],
+        "urgency": intent_data['urgency'],
+        "description": intent_data['description'],
+        "nearbyHelpers": helpers,
+        "narration": narration,
+        "intentSource": source
+    })
+
+VOICE_COMMAND_SYSTEM_MESSAGE = """You are a voice assistant for Hapployed.
+Convert user voice commands, spoken in any language, into structured actions.
+
+Commands can be:
+- "Find me someone to fix my door" -> search for handyman
+- "Post job for cleaning tomorrow" -> create job posting
+- "Show my jobs" -> view user's posted jobs
+- "Find plumber near me" -> search for plumber
+
+The message gives the command language (or "unknown") and the reply language.
+
+Respond in JSON format:
+{
+    "languageCode": "ISO 639-1 code of the command's language",
+    "action": "search" | "post_job" | "view_jobs",
+    "service": "plumber/cleaner/etc, in English",
+    "serviceLocalized": "the service name in the reply language",
+    "urgency": "normal/emergency",
+    "confirmation": "Friendly confirmation message to speak back, in English"
+}
+"""
+
+# Spoken confirmations; {service} is the service name in the same language
+CONFIRMATION_TEMPLATES = {
+    "en": {
+        "search": "Looking for a {service} near you now.",
+        "post_job": "Got it, I'm posting a {service} job for you.",
+        "view_jobs": "Here are your posted jobs."
+    },
+    "es": {
+        "search": "Buscando un {service} cerca de ti ahora.",
+        "post_job": "Entendido, estoy publicando un trabajo de {service} para ti.",
+        "view_jobs": "Aquí están tus trabajos publicados."
+    },
+    "fr": {
+        "search": "Je cherche un {service} près de chez vous.",
+        "post_job": "C'est noté, je publie une offre de {service} pour vous.",
+        "view_jobs": "Voici vos offres publiées."
+    },
+    "pt": {
+        "search": "Procurando um {service} perto de você agora.",
+        "post_job": "Entendido, estou publicando um trabalho de {service} para você.",
+        "view_jobs": "Aqui estão seus trabalhos publicados."
+    },
+    "de": {
+        "search": "Ich suche jetzt einen {service} in Ihrer Nähe.",
+        "post_job": "Alles klar, ich veröffentliche einen {service}-Auftrag für Sie.",
+        "view_jobs": "Hier sind Ihre veröffentlichten Aufträge."
+    },
+    "sw": {
+        "search": "Natafuta {service} karibu nawe sasa.",
+        "post_job": "Sawa, ninachapisha kazi ya {service} kwa ajili yako.",
+        "view_jobs": "Hizi ndizo kazi ulizochapisha."
+    }
+}
+
+# Other REPLY_LANGUAGES are translated by the LLM on first use, then kept in
+# TRANSLATED_CONFIRMATION_TEMPLATES (at most one entry per reply language)
+# and in the LLM cache for this long
+CONFIRMATION_TEMPLATE_TTL_SECONDS = 30 * 24 * 3600
+TRANSLATED_CONFIRMATION_TEMPLATES = {}
+
+async def interpret_voice_command(voice_text: str, language: str, reply_language: str) -> dict:
+    """Detect language, translate and interpret a voice command in one LLM call"""
+    text = (
+        f"Command language: {language or 'unknown'}\n"
+        f"Reply language: {reply_language}\n"
+        f"Command: {voice_text}"
+    )
+    return await complete_json(VOICE_COMMAND_SYSTEM_MESSAGE, text)
+
+async def get_confirmation_templates(language: str) -> dict:
+    """Confirmation templates for a supported reply language code; {} if they cannot be produced"""
+    templates = CONFIRMATION_TEMPLATES.get(language) or TRANSLATED_CONFIRMATION_TEMPLATES.get(language)
+    if templates is not None:
+        return templates
+    if language not in REPLY_LANGUAGES:
+        return {}
+    
+    english = CONFIRMATION_TEMPLATES["en"]
+    system_message = f"""You are a professional translator.
+    Translate the values of the given JSON object from English to {REPLY_LANGUAGES[language]}.
+    Keep the keys and the {{service}} placeholders exactly as they are.
+    Respond ONLY with the translated JSON object."""
+    try:
+        translated = await complete_json(
+            system_message,
+            json.dumps(english, ensure_ascii=False),
+            ttl=CONFIRMATION_TEMPLATE_TTL_SECONDS
+        )
+    except Exception as e:
+        print(f"Error translating confirmation templates: {e}")
+        return {}
+    
+    valid = all(
+        isinstance(translated.get(action), str)
+        and ("{service}" in translated[action]) == ("{service}" in template)
+        for action, template in english.items()
+    )
+    if not valid:
+        return {}
+    TRANSLATED_CONFIRMATION_TEMPLATES[language] = {action: translated[action] for action in english}
+    return TRANSLATED_CONFIRMATION_TEMPLATES[language]
 
 # ============================================================================
 # LANGUAGE & TRANSLATION ENDPOINTS
@@ -154,9 +439,6 @@ async def detect_language(request: LanguageDetectRequest):
     Detect language from text using AI
     """
     try:
-        session_id = str(uuid.uuid4())
-        api_key = os.getenv('EMERGENT_LLM_KEY')
-        
         system_message = """You are a language detection expert.
         Analyze the given text and detect the language.
         
@@ -173,16 +455,7 @@ async def detect_language(request: LanguageDetectRequest):
         - "Habari yako?" -> {"language": "Swahili", "languageCode": "sw", "confidence": "high"}
         """
         
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
-        user_message = UserMessage(text=f"Detect language: {request.text}")
-        response = await chat.send_message(user_message)
-        
-        language_data = json.loads(response)
+        language_data = await complete_json(system_message, f"Detect language: {request.text}")
         return language_data
         
     except Exception as e:
@@ -199,9 +472,6 @@ async def translate_text(request: TranslateRequest):
     Translate text using AI
     """
     try:
-        session_id = str(uuid.uuid4())
-        api_key = os.getenv('EMERGENT_LLM_KEY')
-        
         source_lang = request.sourceLanguage or "auto-detect"
         target_lang = request.targetLanguage
         
@@ -218,16 +488,7 @@ async def translate_text(request: TranslateRequest):
         Keep the tone and meaning accurate. If the text is already in the target language, return it as is.
         """
         
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
-        user_message = UserMessage(text=f"Translate: {request.text}")
-        response = await chat.send_message(user_message)
-        
-        translation_data = json.loads(response)
+        translation_data = await complete_json(system_message, f"Translate: {request.text}")
         return translation_data
         
     except Exception as e:
@@ -244,9 +505,6 @@ async def get_smart_suggestions(request: SmartSuggestionRequest):
     Get smart suggestions for partial text input
     """
     try:
-        session_id = str(uuid.uuid4())
-        api_key = os.getenv('EMERGENT_LLM_KEY')
-        
         system_message = """You are a smart autocomplete assistant for Hapployed, a gig marketplace.
         Given partial text, suggest 3 relevant completions.
         
@@ -266,17 +524,8 @@ async def get_smart_suggestions(request: SmartSuggestionRequest):
         - "Find someone to" -> ["Find someone to clean my house", "Find someone to move furniture", "Find someone to fix my door"]
         """
         
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
         context_info = f"Context: {request.context}\nPartial text: {request.partialText}"
-        user_message = UserMessage(text=context_info)
-        response = await chat.send_message(user_message)
-        
-        suggestions_data = json.loads(response)
+        suggestions_data = await complete_json(system_message, context_info)
         return suggestions_data
         
     except Exception as e:
@@ -290,10 +539,14 @@ async def get_smart_suggestions(request: SmartSuggestionRequest):
 # ============================================================================
 
 @router.post("/tap-help")
-async def tap_for_help(request: SOSRequest):
+async def tap_for_help(request: SOSRequest, stream: bool = False):
     """
     SOS Button endpoint - auto-detects what user needs and finds helpers
+    With ?stream=true, results are sent as server-sent events as they become known.
     """
+    if stream:
+        return StreamingResponse(stream_tap_help(request), media_type="text/event-stream")
+    
     try:
         # Build context
         context = {
@@ -303,7 +556,8 @@ async def tap_for_help(request: SOSRequest):
         
         # Detect intent using AI
         prompt = request.voicePrompt or "need help now"
-        intent_data = await detect_intent(prompt, context)
+        with llm_deadline(TAP_HELP_LLM_DEADLINE_SECONDS):
+            intent_data = await detect_intent(prompt, context)
         
         # Find nearby helpers
         helpers = find_nearby_helpers(
@@ -319,7 +573,8 @@ async def tap_for_help(request: SOSRequest):
             "urgency": intent_data['urgency'],
             "description": intent_data['description'],
             "nearbyHelpers": helpers,
-            "narration": f"Found {len(helpers)} {intent_data['intent']}s nearby. Help is on the way."
+            "narration": tap_help_narration(intent_data['intent'], helpers),
+            "intentSource": intent_data['source']
         }
         
         return response
@@ -331,82 +586,67 @@ async def tap_for_help(request: SOSRequest):
 async def process_voice_command(request: VoiceCommandRequest):
     """
     Voice-Only Mode endpoint - processes voice commands with auto-translation
+    
+    Pipeline: local language ID (skips LLM detection when confident) -> one
+    combined detect+translate+interpret prompt, run concurrently with loading the
+    confirmation templates for the preferred language -> template confirmation.
     """
+    # Only well-formed language tags reach the prompts; only REPLY_LANGUAGES
+    # reach the template cache, others fall back to LLM translation
+    requested_language = language_tag(request.preferredLanguage)
+    if requested_language is None:
+        raise HTTPException(status_code=400, detail="Invalid preferredLanguage")
+    preferred_language = reply_language_code(requested_language) or requested_language
+    
     try:
-        session_id = str(uuid.uuid4())
-        api_key = os.getenv('EMERGENT_LLM_KEY')
-        
-        # Step 1: Detect input language if not provided
-        detected_lang = "en"
-        if request.inputLanguage:
-            detected_lang = request.inputLanguage
-        else:
-            # Auto-detect language
-            lang_detect_result = await detect_language(LanguageDetectRequest(text=request.voiceText))
-            detected_lang = lang_detect_result.get('languageCode', 'en')
-        
-        # Step 2: Translate to English for processing (if not already English)
-        voice_text_en = request.voiceText
-        if detected_lang != 'en':
-            translate_result = await translate_text(TranslateRequest(
-                text=request.voiceText,
-                targetLanguage='en',
-                sourceLanguage=detected_lang
-            ))
-            voice_text_en = translate_result.get('translatedText', request.voiceText)
-        
-        # Step 3: Process command in English
-        system_message = """You are a voice assistant for Hapployed. 
-        Convert user voice commands into structured actions.
-        
-        Commands can be:
-        - "Find me someone to fix my door" -> search for handyman
-        - "Post job for cleaning tomorrow" -> create job posting
-        - "Show my jobs" -> view user's posted jobs
-        - "Find plumber near me" -> search for plumber
-        
-        Respond in JSON format:
-        {
-            "action": "search" | "post_job" | "view_jobs",
-            "service": "plumber/cleaner/etc",
-            "urgency": "normal/emergency",
-            "confirmation": "Friendly confirmation message to speak back"
-        }
-        """
-        
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
-        user_message = UserMessage(text=voice_text_en)
-        response = await chat.send_message(user_message)
-        
-        command_data = json.loads(response)
-        
-        # Step 4: Process the action
-        if command_data['action'] == 'search':
-            helpers = find_nearby_helpers(
-                command_data['service'],
-                "nearby",
-                command_data['urgency']
+        # Step 1: Input language - provided, or identified locally when confident
+        detected_lang = request.inputLanguage
+        language_source = "provided" if detected_lang else None
+        if not detected_lang:
+            local_result = detect_language_locally(request.voiceText)
+            if local_result:
+                detected_lang = local_result['languageCode']
+                language_source = "local"
+        
+        with llm_deadline(VOICE_COMMAND_LLM_DEADLINE_SECONDS):
+            # Step 2: Interpret the command and fetch confirmation templates concurrently
+            command_data, templates = await asyncio.gather(
+                interpret_voice_command(request.voiceText, detected_lang, preferred_language),
+                get_confirmation_templates(preferred_language)
             )
-            command_data['helpers'] = helpers
-        
-        # Step 5: Translate confirmation back to user's preferred language
-        confirmation_text = command_data['confirmation']
-        if request.preferredLanguage != 'en':
-            translate_result = await translate_text(TranslateRequest(
-                text=confirmation_text,
-                targetLanguage=request.preferredLanguage,
-                sourceLanguage='en'
-            ))
-            command_data['confirmation'] = translate_result.get('translatedText', confirmation_text)
+            
+            llm_lang = command_data.pop('languageCode', None)
+            if not detected_lang:
+                detected_lang = llm_lang or 'en'
+                language_source = "llm"
+            service_label = command_data.pop('serviceLocalized', None) or command_data.get('service')
+            
+            # Step 3: Process the action
+            if command_data['action'] == 'search':
+                helpers = find_nearby_helpers(
+                    command_data['service'],
+                    "nearby",
+                    command_data['urgency']
+                )
+                command_data['helpers'] = helpers
+            
+            # Step 4: Confirmation in the user's preferred language
+            if preferred_language != 'en':
+                template = templates.get(command_data['action'])
+                if template:
+                    command_data['confirmation'] = template.replace("{service}", service_label or "")
+                else:
+                    translate_result = await translate_text(TranslateRequest(
+                        text=command_data['confirmation'],
+                        targetLanguage=preferred_language,
+                        sourceLanguage='en'
+                    ))
+                    command_data['confirmation'] = translate_result.get('translatedText', command_data['confirmation'])
         
         # Add detected language info
         command_data['detectedLanguage'] = detected_lang
-        command_data['preferredLanguage'] = request.preferredLanguage
+        command_data['languageSource'] = language_source
+        command_data['preferredLanguage'] = preferred_language
         
         return command_data
         
@@ -4,10 +4,13 @@ Replaces MongoDB connection with Supabase PostgreSQL
 """
 
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from typing import Optional
+from typing import Any, Callable, Optional
 
 # Load environment variables explicitly
 ROOT_DIR = Path(__file__).parent
@@ -22,6 +25,9 @@ print(f"🔍 Supabase URL loaded: {SUPABASE_URL[:30]}..." if SUPABASE_URL else "
 print(f"🔍 Supabase ANON KEY loaded: {SUPABASE_ANON_KEY[:20]}..." if SUPABASE_ANON_KEY else "❌ SUPABASE_ANON_KEY not found")
 print(f"🔍 Supabase SERVICE KEY loaded: {SUPABASE_SERVICE_KEY[:20]}..." if SUPABASE_SERVICE_KEY else "❌ SUPABASE_SERVICE_KEY not found")
 
+# Max number of PostgREST requests allowed in flight per worker process
+SUPABASE_MAX_CONCURRENCY: int = int(os.environ.get("SUPABASE_MAX_CONCURRENCY", "32"))
+
 # Initialize Supabase clients
 supabase: Optional[Client] = None
 supabase_admin: Optional[Client] = None
@@ -61,6 +67,54 @@ def get_supabase_admin() -> Client:
     
     return supabase_admin
 
+# ============================================================================
+# ASYNC DATA ACCESS
+# ============================================================================
+# supabase-py's Client is synchronous: every .execute() is a blocking HTTP round
+# trip. Route handlers are async, so calling .execute() directly stalls the
+# event loop for the whole worker. These helpers run the blocking call on a
+# dedicated, bounded thread pool so handlers can simply await it. The pool size
+# caps concurrent PostgREST requests; extra queries queue inside the executor.
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=SUPABASE_MAX_CONCURRENCY,
+            thread_name_prefix="supabase"
+        )
+
+    return _db_executor
+
+async def run_sync(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking Supabase call (auth, storage, ...) on the database thread pool
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(func, *args, **kwargs))
+
+async def run_query(query: Any) -> Any:
+    """
+    Execute a PostgREST query builder without blocking the event loop
+
+    Usage:
+        result = await run_query(supabase.table('users').select('*').eq('id', user_id))
+    """
+    return await run_sync(query.execute)
+
+def shutdown_db_executor() -> None:
+    """
+    Stop the database thread pool (called on application shutdown)
+    """
+    global _db_executor
+
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False)
+        _db_executor = None
+
 # Create client instances on module import
 try:
     supabase = get_supabase_client()
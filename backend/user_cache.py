@@ -0,0 +1,60 @@
+"""
+User Cache
+Small per-process TTL + LRU cache of `users` rows for authenticated requests
+that need more than the access-token claims. Writers to `users` call
+invalidate() so this process never serves a row it knows is stale; other
+workers catch up within USER_CACHE_TTL_SECONDS.
+
+password_hash is never cached.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "10000"))
+
+UNCACHED_USER_FIELDS = ("password_hash",)
+
+class UserCache:
+    """user id -> users row, expiring after ttl_seconds, oldest evicted first"""
+
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[user_id]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.stats["hits"] += 1
+        return dict(entry[1])
+
+    def set(self, user: Dict) -> dict:
+        """Cache a users row (minus secrets); returns the cached copy"""
+        row = {key: value for key, value in user.items() if key not in UNCACHED_USER_FIELDS}
+        self._entries[str(row["id"])] = (time.time() + self.ttl_seconds, row)
+        self._entries.move_to_end(str(row["id"]))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return dict(row)
+
+    def invalidate(self, user_id: str) -> None:
+        if self._entries.pop(str(user_id), None) is not None:
+            self.stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+user_cache = UserCache()
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import json
 import logging
 
+from llm_cache import stream_json_events
+from llm_gateway import LLM_PROVIDER, send_prompt, LLMUnavailable
+from price_estimator import price_estimator, normalize_price_request
+
 # Load environment variables
 load_dotenv()
 
@@ -46,21 +51,13 @@ class PriceEstimateResponse(BaseModel):
     suggestedPrice: int
     explanation: str
     factors: dict
+    source: str = "llm"  # 'llm' (model answer or cached refinement) or 'model' (local pricing model)
 
-@router.post("/estimate-price")
-async def estimate_price(request: PriceEstimateRequest):
-    """
-    AI-powered price estimation based on skill, distance, urgency, and market trends
-    """
-    try:
-        # Get Emergent LLM Key
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        work_type_label = "project" if request.workType == "project" else "gig"
-        
-        system_message = f"""You are an expert pricing consultant for {work_type_label}s. Analyze the provided details and suggest a fair price range based on:
+def price_estimate_prompt(request: PriceEstimateRequest) -> tuple:
+    """System message and user text for a price estimate"""
+    work_type_label = "project" if request.workType == "project" else "gig"
+    
+    system_message = f"""You are an expert pricing consultant for {work_type_label}s. Analyze the provided details and suggest a fair price range based on:
 1. **Skill Level & Category**: Market rates for the specific skill/category
 2. **Location**: Local market rates (if on-site) or global rates (if remote)
 3. **Urgency**: Premium pricing for urgent/emergency work
@@ -83,81 +80,76 @@ Guidelines:
 
 Be realistic and fair. Protect both workers (from lowball offers) and clients (from overpricing)."""
 
-        # Build context from request
-        context_parts = [
-            f"Type: {work_type_label.capitalize()}",
-            f"Category: {request.category}",
-            f"Urgency: {request.urgency}",
-            f"Location: {request.location}"
-        ]
-        
-        if request.specificLocation:
-            context_parts.append(f"Specific Location: {request.specificLocation}")
-        if request.duration:
-            context_parts.append(f"Duration: {request.duration}")
-        if request.description:
-            context_parts.append(f"Description: {request.description[:200]}")
-        
-        context = "\n".join(context_parts)
-        
-        # Initialize LLM Chat with GPT-5
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"price-estimate-{request.workType}",
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
-        # Create user message
-        user_message = UserMessage(
-            text=f"Estimate a fair price for this {work_type_label}:\n\n{context}"
+    # Build context from request
+    context_parts = [
+        f"Type: {work_type_label.capitalize()}",
+        f"Category: {request.category}",
+        f"Urgency: {request.urgency}",
+        f"Location: {request.location}"
+    ]
+    
+    if request.specificLocation:
+        context_parts.append(f"Specific Location: {request.specificLocation}")
+    if request.duration:
+        context_parts.append(f"Duration: {request.duration}")
+    if request.description:
+        context_parts.append(f"Description: {request.description[:200]}")
+    
+    context = "\n".join(context_parts)
+    return system_message, f"Estimate a fair price for this {work_type_label}:\n\n{context}"
+
+def finalize_price_estimate(parsed_data: dict) -> dict:
+    return PriceEstimateResponse(**parsed_data).dict()
+
+async def refine_price_estimate(normalized: dict) -> dict:
+    """LLM estimate for normalized inputs (run in the background by the price estimator)"""
+    request = PriceEstimateRequest(
+        category=normalized["category"],
+        workType=normalized["workType"],
+        urgency=normalized["urgency"],
+        location=normalized["location"],
+        duration=f"{normalized['hours']:g} hours" if normalized.get("hours") else ""
+    )
+    system_message, text = price_estimate_prompt(request)
+    response = await send_prompt(system_message, text)
+    return finalize_price_estimate(json.loads(response))
+
+@router.post("/estimate-price")
+async def estimate_price(request: PriceEstimateRequest, stream: bool = False):
+    """
+    Price estimation based on skill, distance, urgency, and market trends
+    Answered from the local pricing model, or from a cached LLM refinement for the
+    same normalized inputs; the first request for new inputs triggers that
+    refinement in the background. With ?stream=true, the LLM is asked directly and
+    fields are sent as server-sent events as the model produces them.
+    """
+    if stream:
+        system_message, text = price_estimate_prompt(request)
+        return StreamingResponse(
+            stream_json_events(system_message, text, finalize_price_estimate),
+            media_type="text/event-stream"
         )
+    
+    try:
+        normalized = normalize_price_request(
+            request.category, request.workType, request.urgency, request.location, request.duration
+        )
+        # Refine only when an LLM is configured; the local model always answers
+        refine = refine_price_estimate if os.environ.get('EMERGENT_LLM_KEY') or LLM_PROVIDER == "fake" else None
+        estimate = await price_estimator.estimate(normalized, refine)
         
-        # Get AI response
-        response = await chat.send_message(user_message)
-        
-        logger.info(f"AI Price Estimate Response: {response}")
-        
-        # Parse the JSON response
-        import json
-        try:
-            parsed_data = json.loads(response)
-        except json.JSONDecodeError:
-            # Try to extract JSON from the response if it's wrapped in other text
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                parsed_data = json.loads(json_match.group())
-            else:
-                raise ValueError("Could not parse JSON from AI response")
-        
-        # Validate and return parsed data
-        result = PriceEstimateResponse(**parsed_data)
-        return result.dict()
+        return PriceEstimateResponse(**estimate).dict()
         
     except Exception as e:
         logger.error(f"Error estimating price: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to estimate price: {str(e)}")
 
-@router.post("/parse-voice-input")
-async def parse_voice_input(request: VoiceTranscriptRequest):
-    """
-    Parse voice transcript using AI (GPT-5) to extract project/gig details
-    """
-    # Validate input
-    if not request.transcript or request.transcript.strip() == "":
-        raise HTTPException(status_code=400, detail="Transcript cannot be empty")
+def voice_parse_prompt(request: VoiceTranscriptRequest) -> tuple:
+    """System message and user text for parsing a voice transcript"""
+    # Create system message based on work type
+    work_type_label = "project" if request.workType == "project" else "gig"
     
-    try:
-        
-        # Get Emergent LLM Key
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="API key not configured")
-        
-        # Create system message based on work type
-        work_type_label = "project" if request.workType == "project" else "gig"
-        
-        system_message = f"""You are an AI assistant that extracts structured information from voice transcripts for {work_type_label} postings.
+    system_message = f"""You are an AI assistant that extracts structured information from voice transcripts for {work_type_label} postings.
 
 Given a voice transcript, extract the following information and return it as a JSON object:
 - title: A concise title (max 50 characters)
@@ -178,20 +170,49 @@ Budget estimation guidelines:
 
 Return ONLY a valid JSON object, no additional text or explanation."""
 
-        # Initialize LLM Chat with GPT-5
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"voice-parse-{request.workType}",
-            system_message=system_message
-        ).with_model("openai", "gpt-5")
-        
-        # Create user message
-        user_message = UserMessage(
-            text=f"Parse this {work_type_label} request: {request.transcript}"
+    return system_message, f"Parse this {work_type_label} request: {request.transcript}"
+
+def finalize_parsed_voice_input(parsed_data: dict) -> dict:
+    """Convert data types to match Pydantic model expectations and validate"""
+    if parsed_data.get('duration') is None:
+        parsed_data['duration'] = ""
+    if parsed_data.get('specificLocation') is None:
+        parsed_data['specificLocation'] = ""
+    if isinstance(parsed_data.get('minBudget'), (int, float)):
+        parsed_data['minBudget'] = str(parsed_data['minBudget'])
+    if isinstance(parsed_data.get('maxBudget'), (int, float)):
+        parsed_data['maxBudget'] = str(parsed_data['maxBudget'])
+    
+    return ParsedProjectData(**parsed_data).dict()
+
+@router.post("/parse-voice-input")
+async def parse_voice_input(request: VoiceTranscriptRequest, stream: bool = False):
+    """
+    Parse voice transcript using AI (GPT-5) to extract project/gig details
+    With ?stream=true, fields are sent as server-sent events as the model produces them.
+    """
+    # Validate input
+    if not request.transcript or request.transcript.strip() == "":
+        raise HTTPException(status_code=400, detail="Transcript cannot be empty")
+    
+    if stream:
+        system_message, text = voice_parse_prompt(request)
+        return StreamingResponse(
+            stream_json_events(system_message, text, finalize_parsed_voice_input),
+            media_type="text/event-stream"
         )
+    
+    try:
         
-        # Get AI response
-        response = await chat.send_message(user_message)
+        # Get Emergent LLM Key
+        api_key = os.environ.get('EMERGENT_LLM_KEY')
+        if not api_key:
+            raise HTTPException(status_code=500, detail="API key not configured")
+        
+        system_message, text = voice_parse_prompt(request)
+        
+        # Get AI response (GPT-5, via the LLM gateway)
+        response = await send_prompt(system_message, text)
         
         logger.info(f"AI Response: {response}")
         
@@ -208,20 +229,14 @@ Return ONLY a valid JSON object, no additional text or explanation."""
             else:
                 raise ValueError("Could not parse JSON from AI response")
         
-        # Convert data types to match Pydantic model expectations
-        if parsed_data.get('duration') is None:
-            parsed_data['duration'] = ""
-        if parsed_data.get('specificLocation') is None:
-            parsed_data['specificLocation'] = ""
-        if isinstance(parsed_data.get('minBudget'), (int, float)):
-            parsed_data['minBudget'] = str(parsed_data['minBudget'])
-        if isinstance(parsed_data.get('maxBudget'), (int, float)):
-            parsed_data['maxBudget'] = str(parsed_data['maxBudget'])
-        
         # Validate and return parsed data
-        result = ParsedProjectData(**parsed_data)
-        return result.dict()
+        return finalize_parsed_voice_input(parsed_data)
         
+    except HTTPException:
+        raise
+    except LLMUnavailable as e:
+        logger.error(f"Voice parse LLM unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Voice parsing temporarily unavailable: {str(e)}")
     except Exception as e:
         logger.error(f"Error parsing voice input: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to parse voice input: {str(e)}")
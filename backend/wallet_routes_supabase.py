@@ -7,12 +7,39 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Literal
 from datetime import datetime, timedelta, timezone
+import asyncio
+import itertools
+import os
+import time
 import uuid
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
 
 router = APIRouter(prefix="/wallet", tags=["Wallet"])
 
+# Balance-only wallet reads; history is served by /wallet/transactions
+WALLET_SUMMARY_COLUMNS = (
+    "id, user_id, balance, available_balance, pending_balance, total_earned, "
+    "credit_limit, credit_used, savings_enabled, savings_balance, savings_interest_rate, "
+    "cashout_day, cashout_day_total, cashout_month, cashout_month_total, created_at, updated_at"
+)
+WALLET_SUMMARY_TTL_SECONDS = float(os.environ.get("WALLET_SUMMARY_TTL_SECONDS", "30"))
+WALLET_SUMMARY_MAX_ENTRIES = 10000
+# Latest transactions included by GET /wallet/?include_history=true
+WALLET_HISTORY_PREVIEW = 100
+
+DAILY_CASHOUT_LIMIT = 5000.0
+MONTHLY_CASHOUT_LIMIT = 20000.0
+
+# Business-rule errors returned by the wallet_* functions (ADD_ATOMIC_WALLET_OPERATIONS.sql)
+WALLET_OPERATION_ERRORS = {
+    "invalid_amount": "Amount must be greater than zero",
+    "insufficient_balance": "Insufficient balance",
+    "daily_limit_exceeded": "Daily cashout limit exceeded",
+    "monthly_limit_exceeded": "Monthly cashout limit exceeded",
+    "credit_limit_exceeded": "Credit limit exceeded"
+}
+
 # ============================================================================
 # MODELS
 # ============================================================================
@@ -50,6 +77,58 @@ class AddPaymentMethodRequest(BaseModel):
 # WALLET SERVICE
 # ============================================================================
 
+class WalletSummaryCache:
+    """
+    Per-process user id -> wallet summary row with a short TTL. Wallet writes
+    in this process invalidate the entry rather than storing the row the RPC
+    returned: concurrent RPC responses can arrive out of commit order, so the
+    next read goes to the database instead. A read only stores its row if no
+    write invalidated the user since the read started (see version()). Other
+    workers see changes once their entry expires. Money movements never read
+    from here - the RPCs check balances under a row lock.
+    """
+    
+    def __init__(self, ttl_seconds: float = WALLET_SUMMARY_TTL_SECONDS, max_entries: int = WALLET_SUMMARY_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, tuple] = {}
+        # user id -> sequence number of the user's latest invalidation (oldest first)
+        self._versions: Dict[str, int] = {}
+        self._sequence = itertools.count(1)
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.time():
+            self._entries.pop(user_id, None)
+            return None
+        return dict(entry[1])
+    
+    def version(self, user_id: str) -> int:
+        """Changes whenever the user's entry is invalidated; pass it back to set()"""
+        return self._versions.get(user_id, 0)
+    
+    def set(self, user_id: str, wallet: Dict, version: int) -> Dict:
+        """
+        Cache the summary columns of a wallet row read at `version`, unless a
+        write invalidated the user since; returns the projected row either way
+        """
+        summary = {key: wallet.get(key) for key in WALLET_SUMMARY_COLUMNS.split(", ")}
+        if version != self.version(user_id):
+            return dict(summary)
+        if len(self._entries) >= self.max_entries and user_id not in self._entries:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[user_id] = (time.time() + self.ttl_seconds, summary)
+        return dict(summary)
+    
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        self._versions.pop(user_id, None)
+        self._versions[user_id] = next(self._sequence)
+        if len(self._versions) > self.max_entries:
+            self._versions.pop(next(iter(self._versions)))
+
+wallet_summary_cache = WalletSummaryCache()
+
 class WalletService:
     
     @staticmethod
@@ -84,53 +163,99 @@ class WalletService:
         }
     
     @staticmethod
-    async def get_or_create_wallet(user_id: str) -> Dict:
-        """Get wallet or create if doesn't exist - works with normalized schema"""
+    async def get_wallet_summary(user_id: str) -> Dict:
+        """Balance columns only, cached per user; creates the wallet on first use"""
+        cached = wallet_summary_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        version = wallet_summary_cache.version(user_id)
         supabase = get_supabase_admin()
         
         # Try to get existing wallet
-        result = supabase.table('wallets').select('*').eq('user_id', user_id).execute()
+        result = await run_query(supabase.table('wallets').select(WALLET_SUMMARY_COLUMNS).eq('user_id', user_id))
+        
+        if not result.data:
+            # Create new wallet (a concurrent request may have created it first)
+            wallet_data = {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "balance": 0.0,
+                "available_balance": 0.0,
+                "pending_balance": 0.0,
+                "total_earned": 0.0,
+                "credit_limit": 65000.0,
+                "credit_used": 0.0,
+                "savings_enabled": False,
+                "savings_balance": 0.0,
+                "savings_interest_rate": 2.5,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }
+            result = await run_query(supabase.table('wallets').upsert(wallet_data, on_conflict='user_id', ignore_duplicates=True))
+            if not result.data:
+                result = await run_query(supabase.table('wallets').select(WALLET_SUMMARY_COLUMNS).eq('user_id', user_id))
         
-        if result.data and len(result.data) > 0:
-            wallet = result.data[0]
-            
-            # Get transactions
-            trans_result = supabase.table('transactions').select('*').eq('wallet_id', wallet['id']).order('created_at', desc=True).limit(100).execute()
-            wallet['transactions'] = trans_result.data if trans_result.data else []
-            
-            # Get payment methods
-            pm_result = supabase.table('payment_methods').select('*').eq('user_id', user_id).execute()
-            wallet['payment_methods'] = pm_result.data if pm_result.data else []
-            
-            return wallet
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to create wallet")
         
-        # Create new wallet
-        wallet_id = str(uuid.uuid4())
-        wallet_data = {
-            "id": wallet_id,
-            "user_id": user_id,
-            "balance": 0.0,
-            "available_balance": 0.0,
-            "pending_balance": 0.0,
-            "total_earned": 0.0,
-            "credit_limit": 65000.0,
-            "credit_used": 0.0,
-            "savings_enabled": False,
-            "savings_balance": 0.0,
-            "savings_interest_rate": 2.5,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
+        return wallet_summary_cache.set(user_id, result.data[0], version)
+    
+    @staticmethod
+    async def find_wallet_id(user_id: str) -> Optional[str]:
+        """Id of the user's wallet, or None if it has not been created yet (never creates one)"""
+        cached = wallet_summary_cache.get(user_id)
+        if cached is not None:
+            return cached['id']
         
-        insert_result = supabase.table('wallets').insert(wallet_data).execute()
+        supabase = get_supabase_admin()
+        result = await run_query(supabase.table('wallets').select('id').eq('user_id', user_id))
+        return result.data[0]['id'] if result.data else None
+    
+    @staticmethod
+    async def get_or_create_wallet(user_id: str) -> Dict:
+        """Wallet summary plus its latest transactions and payment methods (fetched concurrently)"""
+        wallet = await WalletService.get_wallet_summary(user_id)
+        supabase = get_supabase_admin()
         
-        if insert_result.data and len(insert_result.data) > 0:
-            wallet = insert_result.data[0]
-            wallet['transactions'] = []
-            wallet['payment_methods'] = []
-            return wallet
+        trans_result, pm_result = await asyncio.gather(
+            run_query(supabase.table('transactions').select('*').eq('wallet_id', wallet['id']).order('created_at', desc=True).limit(WALLET_HISTORY_PREVIEW)),
+            run_query(supabase.table('payment_methods').select('*').eq('user_id', user_id))
+        )
+        wallet['transactions'] = trans_result.data if trans_result.data else []
+        wallet['payment_methods'] = pm_result.data if pm_result.data else []
         
-        raise HTTPException(status_code=500, detail="Failed to create wallet")
+        return wallet
+    
+    @staticmethod
+    def cashout_usage(wallet: Dict) -> Dict:
+        """Today's and this month's (UTC) cashout totals from the wallet's running counters"""
+        now = datetime.now(timezone.utc).date()
+        day_total = float(wallet.get('cashout_day_total') or 0) if wallet.get('cashout_day') == now.isoformat() else 0.0
+        month_total = float(wallet.get('cashout_month_total') or 0) if wallet.get('cashout_month') == now.replace(day=1).isoformat() else 0.0
+        return {"daily": day_total, "monthly": month_total}
+    
+    @staticmethod
+    async def run_operation(function: str, params: Dict) -> Dict:
+        """
+        Run one atomic wallet function (balance check, wallet update and ledger
+        insert in a single transaction); business-rule failures become 400s
+        """
+        supabase = get_supabase_admin()
+        try:
+            result = await run_query(supabase.rpc(function, params))
+        finally:
+            # After the commit (or an unknown outcome): drop the summary and
+            # refuse rows read before this point
+            wallet_summary_cache.invalidate(params["p_user_id"])
+        outcome = result.data or {}
+        
+        error = outcome.get('error')
+        if error:
+            raise HTTPException(status_code=400, detail=WALLET_OPERATION_ERRORS.get(error, error))
+        if not outcome.get('wallet'):
+            raise HTTPException(status_code=500, detail=f"{function} returned no wallet")
+        return outcome
 
 wallet_service = WalletService()
 
@@ -143,10 +268,18 @@ def get_current_user_id():
     return "402f6136-32c1-46f5-a2a8-449472770f2d"  # Test user UUID
 
 @router.get("/")
-async def get_wallet(user_id: str = Depends(get_current_user_id)):
-    """Get wallet overview with transactions and payment methods"""
+async def get_wallet(include_history: bool = False, user_id: str = Depends(get_current_user_id)):
+    """
+    Get wallet overview from the cached balance summary (one projected query on a miss)
+    Transaction history is paged through /wallet/transactions; include_history=true
+    also embeds the latest transactions and payment methods.
+    """
     try:
-        wallet = await wallet_service.get_or_create_wallet(user_id)
+        if include_history:
+            wallet = await wallet_service.get_or_create_wallet(user_id)
+        else:
+            wallet = await wallet_service.get_wallet_summary(user_id)
+        cashout_usage = wallet_service.cashout_usage(wallet)
         
         # Format response to match MongoDB structure for frontend compatibility
         return {
@@ -166,8 +299,10 @@ async def get_wallet(user_id: str = Depends(get_current_user_id)):
                     "tax_settings": {}
                 },
                 "limits": {
-                    "daily_cashout": 5000.0,
-                    "monthly_cashout": 20000.0,
+                    "daily_cashout": DAILY_CASHOUT_LIMIT,
+                    "monthly_cashout": MONTHLY_CASHOUT_LIMIT,
+                    "daily_cashout_used": cashout_usage["daily"],
+                    "monthly_cashout_used": cashout_usage["monthly"],
                     "instant_cashout_fee": 1.5
                 },
                 "financial_products": {
@@ -187,7 +322,8 @@ async def get_wallet(user_id: str = Depends(get_current_user_id)):
                     "total_withdrawn": 0.0,
                     "total_fees": 0.0,
                     "last_cashout": None
-                }
+                },
+                "history_url": "/api/wallet/transactions"
             }
         }
     except Exception as e:
@@ -211,60 +347,25 @@ async def calculate_fees(request: FeeCalculationRequest):
 
 @router.post("/cashout/instant")
 async def instant_cashout(request: CashoutRequest, user_id: str = Depends(get_current_user_id)):
-    """Process instant cashout"""
+    """Process instant cashout (balance and daily/monthly limit checks, debit and ledger entry in one RPC)"""
     try:
-        supabase = get_supabase_admin()
-        wallet = await wallet_service.get_or_create_wallet(user_id)
-        
-        available_balance = float(wallet.get('available_balance', 0))
-        
-        # Check balance
-        if available_balance < request.amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
-        
-        # Check daily limit
-        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        today_cashouts = sum(
-            float(t.get('amount', 0)) for t in wallet.get('transactions', [])
-            if t.get('transaction_type') == 'cashout' and 
-            datetime.fromisoformat(t.get('created_at', '').replace("Z", "+00:00") if t.get('created_at') else datetime.now(timezone.utc).isoformat()) >= today and
-            t.get('status') == 'completed'
-        )
-        
-        if today_cashouts + request.amount > 5000:
-            raise HTTPException(status_code=400, detail="Daily cashout limit exceeded")
+        outcome = await wallet_service.run_operation('wallet_cashout', {
+            "p_user_id": user_id,
+            "p_amount": request.amount,
+            "p_method": request.method,
+            "p_instant": True,
+            "p_daily_limit": DAILY_CASHOUT_LIMIT,
+            "p_monthly_limit": MONTHLY_CASHOUT_LIMIT
+        })
         
         # Calculate fees
         fee_calc = wallet_service.calculate_cashout_fee(request.amount, request.method, True)
         
-        # Create transaction
-        trans_id = str(uuid.uuid4())
-        transaction_data = {
-            "id": trans_id,
-            "wallet_id": wallet['id'],
-            "transaction_type": "cashout",
-            "amount": request.amount,
-            "description": f"Instant cashout to {request.method}",
-            "status": "completed",
-            "payment_method": request.method,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        
-        supabase.table('transactions').insert(transaction_data).execute()
-        
-        # Update wallet balance
-        new_balance = available_balance - request.amount
-        supabase.table('wallets').update({
-            "available_balance": new_balance,
-            "balance": new_balance,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq('id', wallet['id']).execute()
-        
         return {
             "success": True,
             "message": "Instant cashout processed successfully",
             "data": {
-                "transaction": transaction_data,
+                "transaction": outcome['transaction'],
                 "fee": fee_calc["fee_amount"],
                 "net_amount": fee_calc["net_amount"]
             }
@@ -276,52 +377,28 @@ async def instant_cashout(request: CashoutRequest, user_id: str = Depends(get_cu
 
 @router.post("/cashout/standard")
 async def standard_cashout(request: CashoutRequest, user_id: str = Depends(get_current_user_id)):
-    """Process standard cashout (2-3 business days)"""
+    """Process standard cashout (2-3 business days); the amount moves to pending in one RPC, within the same limits"""
     try:
-        supabase = get_supabase_admin()
-        wallet = await wallet_service.get_or_create_wallet(user_id)
-        
-        available_balance = float(wallet.get('available_balance', 0))
-        
-        if available_balance < request.amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
+        outcome = await wallet_service.run_operation('wallet_cashout', {
+            "p_user_id": user_id,
+            "p_amount": request.amount,
+            "p_method": request.method,
+            "p_instant": False,
+            "p_daily_limit": DAILY_CASHOUT_LIMIT,
+            "p_monthly_limit": MONTHLY_CASHOUT_LIMIT
+        })
         
         # Calculate fees
         is_pro_user = False
         fee_calc = {"fee_amount": 0, "net_amount": request.amount, "rate": 0, "type": "standard"} if is_pro_user else wallet_service.calculate_cashout_fee(request.amount, request.method, False)
         
-        # Create transaction
-        trans_id = str(uuid.uuid4())
-        transaction_data = {
-            "id": trans_id,
-            "wallet_id": wallet['id'],
-            "transaction_type": "cashout",
-            "amount": request.amount,
-            "description": f"Standard cashout to {request.method}",
-            "status": "pending",
-            "payment_method": request.method,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        
-        supabase.table('transactions').insert(transaction_data).execute()
-        
-        # Move amount to pending
-        new_available = available_balance - request.amount
-        new_pending = float(wallet.get('pending_balance', 0)) + request.amount
-        
-        supabase.table('wallets').update({
-            "available_balance": new_available,
-            "pending_balance": new_pending,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq('id', wallet['id']).execute()
-        
         estimated_arrival = datetime.now(timezone.utc) + timedelta(days=3)
         
         return {
             "success": True,
             "message": "Standard cashout initiated",
             "data": {
-                "transaction": transaction_data,
+                "transaction": outcome['transaction'],
                 "fee": fee_calc["fee_amount"],
                 "net_amount": fee_calc["net_amount"],
                 "estimated_arrival": estimated_arrival.isoformat()
@@ -334,50 +411,19 @@ async def standard_cashout(request: CashoutRequest, user_id: str = Depends(get_c
 
 @router.post("/savings/setup")
 async def setup_savings(request: SavingsSetupRequest, user_id: str = Depends(get_current_user_id)):
-    """Setup savings account"""
+    """Setup savings account, optionally transferring an initial amount (one RPC)"""
     try:
-        supabase = get_supabase_admin()
-        wallet = await wallet_service.get_or_create_wallet(user_id)
-        
-        available_balance = float(wallet.get('available_balance', 0))
-        
-        if request.initial_amount > 0 and available_balance < request.initial_amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
-        
-        update_data = {"savings_enabled": True}
-        
-        if request.initial_amount > 0:
-            # Transfer to savings
-            new_available = available_balance - request.initial_amount
-            new_savings = float(wallet.get('savings_balance', 0)) + request.initial_amount
-            
-            update_data["available_balance"] = new_available
-            update_data["balance"] = new_available
-            update_data["savings_balance"] = new_savings
-            
-            # Record transaction
-            trans_id = str(uuid.uuid4())
-            transaction_data = {
-                "id": trans_id,
-                "wallet_id": wallet['id'],
-                "transaction_type": "transfer",
-                "amount": request.initial_amount,
-                "description": "Transfer to savings account",
-                "status": "completed",
-                "payment_method": "wallet_balance",
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
-            supabase.table('transactions').insert(transaction_data).execute()
-        
-        update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-        
-        result = supabase.table('wallets').update(update_data).eq('id', wallet['id']).execute()
+        outcome = await wallet_service.run_operation('wallet_transfer_to_savings', {
+            "p_user_id": user_id,
+            "p_amount": request.initial_amount
+        })
+        wallet = outcome['wallet']
         
         return {
             "success": True,
             "message": "Savings account setup successfully",
             "data": {
-                "savings_balance": float(update_data.get('savings_balance', wallet.get('savings_balance', 0))),
+                "savings_balance": float(wallet.get('savings_balance', 0)),
                 "interest_rate": float(wallet.get('savings_interest_rate', 2.5))
             }
         }
@@ -388,51 +434,16 @@ async def setup_savings(request: SavingsSetupRequest, user_id: str = Depends(get
 
 @router.post("/credit/request")
 async def request_credit(request: CreditRequest, user_id: str = Depends(get_current_user_id)):
-    """Request credit advance"""
+    """Request credit advance (scoring, limit check, credit and ledger entry in one RPC)"""
     try:
-        supabase = get_supabase_admin()
-        wallet = await wallet_service.get_or_create_wallet(user_id)
-        
-        # Simple credit score calculation
-        credit_score = 650  # Base score
-        transactions_count = len(wallet.get('transactions', []))
-        if transactions_count > 10:
-            credit_score += 50
-        total_earned = float(wallet.get('total_earned', 0))
-        if total_earned > 1000:
-            credit_score += 30
-        
-        max_credit = credit_score * 100
-        current_used = float(wallet.get('credit_used', 0))
-        
-        if request.amount > (max_credit - current_used):
-            raise HTTPException(status_code=400, detail="Credit limit exceeded")
-        
-        # Update wallet
-        new_credit_used = current_used + request.amount
-        new_available = float(wallet.get('available_balance', 0)) + request.amount
-        
-        supabase.table('wallets').update({
-            "credit_used": new_credit_used,
-            "available_balance": new_available,
-            "balance": new_available,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }).eq('id', wallet['id']).execute()
-        
-        # Create transaction
-        trans_id = str(uuid.uuid4())
-        transaction_data = {
-            "id": trans_id,
-            "wallet_id": wallet['id'],
-            "transaction_type": "deposit",
-            "amount": request.amount,
-            "description": f"Credit advance for: {request.purpose}",
-            "status": "completed",
-            "payment_method": "credit",
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        supabase.table('transactions').insert(transaction_data).execute()
-        
+        outcome = await wallet_service.run_operation('wallet_request_credit', {
+            "p_user_id": user_id,
+            "p_amount": request.amount,
+            "p_purpose": request.purpose
+        })
+        
+        new_credit_used = float(outcome['wallet'].get('credit_used', 0))
+        max_credit = float(outcome['max_credit'])
         repayment_date = datetime.now(timezone.utc) + timedelta(days=30)
         
         return {
@@ -456,7 +467,7 @@ async def add_payment_method(request: AddPaymentMethodRequest, user_id: str = De
         supabase = get_supabase_admin()
         
         # Get existing payment methods
-        existing = supabase.table('payment_methods').select('*').eq('user_id', user_id).execute()
+        existing = await run_query(supabase.table('payment_methods').select('*').eq('user_id', user_id))
         is_first = not existing.data or len(existing.data) == 0
         
         # Create payment method
@@ -473,7 +484,7 @@ async def add_payment_method(request: AddPaymentMethodRequest, user_id: str = De
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table('payment_methods').insert(payment_method_data).execute()
+        result = await run_query(supabase.table('payment_methods').insert(payment_method_data))
         
         return {
             "success": True,
@@ -489,43 +500,28 @@ async def get_transactions(page: int = 1, limit: int = 20, type: Optional[str] =
     try:
         supabase = get_supabase_admin()
         
-        # Get wallet
-        wallet_result = supabase.table('wallets').select('id').eq('user_id', user_id).execute()
-        
-        if not wallet_result.data or len(wallet_result.data) == 0:
+        # Wallet id from the cached summary; reading history never creates a wallet
+        wallet_id = await wallet_service.find_wallet_id(user_id)
+        if not wallet_id:
             return {
                 "success": True,
                 "data": {
                     "transactions": [],
-                    "pagination": {
-                        "current": page,
-                        "total": 0,
-                        "total_transactions": 0
-                    }
+                    "pagination": {"current": page, "total": 0, "total_transactions": 0}
                 }
             }
         
-        wallet_id = wallet_result.data[0]['id']
-        
-        # Build query
+        # One query returns the page and the exact total
         query = supabase.table('transactions').select('*', count='exact').eq('wallet_id', wallet_id)
         
         # Filter by type if provided
         if type:
             query = query.eq('transaction_type', type)
         
-        # Get count
-        count_result = query.execute()
-        total_count = count_result.count if hasattr(count_result, 'count') else 0
-        
-        # Get paginated results
         offset = (page - 1) * limit
-        query = supabase.table('transactions').select('*').eq('wallet_id', wallet_id)
-        if type:
-            query = query.eq('transaction_type', type)
-        
-        result = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        result = await run_query(query.order('created_at', desc=True).range(offset, offset + limit - 1))
         
+        total_count = result.count or 0
         transactions = result.data if result.data else []
         
         return {
@@ -9,7 +9,7 @@ from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 import json
 
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
 
 router = APIRouter(prefix="/worker-dashboard", tags=["Worker Dashboard"])
 
@@ -77,15 +77,15 @@ async def get_dashboard_stats(user_id: str):
         supabase = get_supabase_admin()
         
         # Get applications
-        apps = supabase.table('applications').select('status').eq('worker_id', user_id).execute()
+        apps = await run_query(supabase.table('applications').select('status').eq('worker_id', user_id))
         applications = apps.data if apps.data else []
         
         # Get wallet
-        wallet_result = supabase.table('wallets').select('total_earned').eq('user_id', user_id).execute()
+        wallet_result = await run_query(supabase.table('wallets').select('total_earned').eq('user_id', user_id))
         total_earnings = wallet_result.data[0].get('total_earned', 0) if wallet_result.data else 0
         
         # Get worker profile for ratings
-        profile = supabase.table('worker_profiles').select('*').eq('user_id', user_id).execute()
+        profile = await run_query(supabase.table('worker_profiles').select('*').eq('user_id', user_id))
         avg_rating = profile.data[0].get('average_rating', 0) if profile.data else 0
         
         # Calculate profile completion
@@ -127,11 +127,11 @@ async def get_recommended_jobs(user_id: str):
         supabase = get_supabase_admin()
         
         # Get worker skills
-        profile = supabase.table('worker_profiles').select('skills').eq('user_id', user_id).execute()
+        profile = await run_query(supabase.table('worker_profiles').select('skills').eq('user_id', user_id))
         worker_skills = profile.data[0].get('skills', []) if profile.data else []
         
         # Get published jobs
-        jobs_result = supabase.table('jobs').select('*').eq('status', 'published').limit(10).execute()
+        jobs_result = await run_query(supabase.table('jobs').select('*').eq('status', 'published').limit(10))
         jobs = jobs_result.data if jobs_result.data else []
         
         # Simple matching
@@ -159,7 +159,7 @@ async def get_active_gigs(user_id: str):
         supabase = get_supabase_admin()
         
         # Get accepted applications
-        apps = supabase.table('applications').select('*, jobs(*)').eq('worker_id', user_id).in_('status', ['accepted', 'in_progress']).execute()
+        apps = await run_query(supabase.table('applications').select('*, jobs(*)').eq('worker_id', user_id).in_('status', ['accepted', 'in_progress']))
         
         active_gigs = []
         for app in (apps.data if apps.data else []):
@@ -184,7 +184,7 @@ async def get_earnings_summary(user_id: str):
     try:
         supabase = get_supabase_admin()
         
-        wallet_result = supabase.table('wallets').select('*').eq('user_id', user_id).execute()
+        wallet_result = await run_query(supabase.table('wallets').select('*').eq('user_id', user_id))
         
         if wallet_result.data and len(wallet_result.data) > 0:
             wallet = wallet_result.data[0]
@@ -210,7 +210,7 @@ async def get_reputation_score(user_id: str):
     try:
         supabase = get_supabase_admin()
         
-        profile = supabase.table('worker_profiles').select('average_rating').eq('user_id', user_id).execute()
+        profile = await run_query(supabase.table('worker_profiles').select('average_rating').eq('user_id', user_id))
         
         rating = profile.data[0].get('average_rating', 0) if profile.data else 0
         
@@ -10,7 +10,8 @@ from datetime import datetime
 import uuid
 
 # Import Supabase client
-from supabase_client import get_supabase_admin
+from supabase_client import get_supabase_admin, run_query
+import search_index
 
 router = APIRouter(prefix="/worker-profiles", tags=["Worker Profiles"])
 
@@ -73,7 +74,7 @@ async def create_worker_profile(profile: WorkerProfileCreate):
         supabase = get_supabase_admin()
         
         # Check if profile already exists for this user
-        existing = supabase.table('worker_profiles').select('id').eq('user_id', profile.userId).execute()
+        existing = await run_query(supabase.table('worker_profiles').select('id').eq('user_id', profile.userId))
         
         if existing.data and len(existing.data) > 0:
             # Profile exists, update it instead
@@ -99,7 +100,7 @@ async def create_worker_profile(profile: WorkerProfileCreate):
             # Remove None values
             update_data = {k: v for k, v in update_data.items() if v is not None}
             
-            result = supabase.table('worker_profiles').update(update_data).eq('id', profile_id).execute()
+            result = await run_query(supabase.table('worker_profiles').update(update_data).eq('id', profile_id))
             
             if not result.data or len(result.data) == 0:
                 raise HTTPException(
@@ -107,6 +108,7 @@ async def create_worker_profile(profile: WorkerProfileCreate):
                     detail="Failed to update profile"
                 )
             
+            search_index.index_profile(result.data[0])
             return result.data[0]
         
         # Create new profile
@@ -137,7 +139,7 @@ async def create_worker_profile(profile: WorkerProfileCreate):
         # Remove None values
         new_profile = {k: v for k, v in new_profile.items() if v is not None}
         
-        result = supabase.table('worker_profiles').insert(new_profile).execute()
+        result = await run_query(supabase.table('worker_profiles').insert(new_profile))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -145,6 +147,7 @@ async def create_worker_profile(profile: WorkerProfileCreate):
                 detail="Failed to create profile"
             )
         
+        search_index.index_profile(result.data[0])
         return result.data[0]
         
     except HTTPException:
@@ -164,7 +167,7 @@ async def get_worker_profile_by_user(user_id: str):
     try:
         supabase = get_supabase_admin()
         
-        response = supabase.table('worker_profiles').select('*').eq('user_id', user_id).execute()
+        response = await run_query(supabase.table('worker_profiles').select('*').eq('user_id', user_id))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -191,7 +194,7 @@ async def get_worker_profile(profile_id: str):
     try:
         supabase = get_supabase_admin()
         
-        response = supabase.table('worker_profiles').select('*').eq('id', profile_id).execute()
+        response = await run_query(supabase.table('worker_profiles').select('*').eq('id', profile_id))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
@@ -240,7 +243,7 @@ async def update_worker_profile(profile_id: str, updates: WorkerProfileUpdate):
         
         converted_data['updated_at'] = datetime.utcnow().isoformat()
         
-        result = supabase.table('worker_profiles').update(converted_data).eq('id', profile_id).execute()
+        result = await run_query(supabase.table('worker_profiles').update(converted_data).eq('id', profile_id))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -248,6 +251,7 @@ async def update_worker_profile(profile_id: str, updates: WorkerProfileUpdate):
                 detail="Profile not found"
             )
         
+        search_index.index_profile(result.data[0])
         return result.data[0]
         
     except HTTPException:
@@ -267,7 +271,7 @@ async def get_all_worker_profiles(skip: int = 0, limit: int = 50):
     try:
         supabase = get_supabase_admin()
         
-        response = supabase.table('worker_profiles').select('*').range(skip, skip + limit - 1).execute()
+        response = await run_query(supabase.table('worker_profiles').select('*').range(skip, skip + limit - 1))
         
         return response.data if response.data else []
         
@@ -286,7 +290,7 @@ async def delete_worker_profile(profile_id: str):
     try:
         supabase = get_supabase_admin()
         
-        result = supabase.table('worker_profiles').delete().eq('id', profile_id).execute()
+        result = await run_query(supabase.table('worker_profiles').delete().eq('id', profile_id))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -294,6 +298,7 @@ async def delete_worker_profile(profile_id: str):
                 detail="Profile not found"
             )
         
+        search_index.remove_profile(profile_id)
         return {"message": "Profile deleted successfully"}
         
     except HTTPException:
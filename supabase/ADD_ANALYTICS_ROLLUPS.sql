@@ -0,0 +1,186 @@
+-- Hourly rollups for analytics_events
+-- /analytics/stats and /analytics/funnel read per-event-name counts from
+-- analytics_event_counts() instead of pulling raw events into the API.
+-- Whole hours come from the rollup table (kept up by statement-level insert,
+-- delete and truncate triggers, so bulk writes cost one statement per batch);
+-- partial hours at the edges of a date range are counted from the raw table,
+-- so results are exact.
+
+CREATE TABLE IF NOT EXISTS analytics_event_rollups (
+    bucket_hour TIMESTAMPTZ NOT NULL,
+    event_name TEXT NOT NULL,
+    last_intent TEXT NOT NULL DEFAULT '',
+    event_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_hour, event_name, last_intent)
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_event_rollups_intent
+    ON analytics_event_rollups(last_intent, bucket_hour);
+
+-- Raw-table indexes for the partial-hour edges of a range
+CREATE INDEX IF NOT EXISTS idx_analytics_events_timestamp
+    ON analytics_events("timestamp");
+CREATE INDEX IF NOT EXISTS idx_analytics_events_intent_timestamp
+    ON analytics_events(last_intent, "timestamp");
+
+-- Roll newly inserted events up into their hour buckets
+CREATE OR REPLACE FUNCTION rollup_analytics_events()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO analytics_event_rollups (bucket_hour, event_name, last_intent, event_count)
+    SELECT
+        date_trunc('hour', e."timestamp"),
+        e.event_name,
+        COALESCE(e.last_intent, ''),
+        COUNT(*)
+    FROM new_events e
+    GROUP BY 1, 2, 3
+    ON CONFLICT (bucket_hour, event_name, last_intent)
+    DO UPDATE SET event_count = analytics_event_rollups.event_count + EXCLUDED.event_count;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Subtract deleted events (retention, cleanup) from their hour buckets
+CREATE OR REPLACE FUNCTION unroll_analytics_events()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE analytics_event_rollups r
+    SET event_count = r.event_count - removed.event_count
+    FROM (
+        SELECT
+            date_trunc('hour', e."timestamp") AS bucket_hour,
+            e.event_name,
+            COALESCE(e.last_intent, '') AS last_intent,
+            COUNT(*) AS event_count
+        FROM old_events e
+        GROUP BY 1, 2, 3
+    ) removed
+    WHERE r.bucket_hour = removed.bucket_hour
+    AND r.event_name = removed.event_name
+    AND r.last_intent = removed.last_intent;
+
+    -- Drop buckets that are now empty (only the ones this delete touched)
+    DELETE FROM analytics_event_rollups r
+    USING (
+        SELECT DISTINCT
+            date_trunc('hour', e."timestamp") AS bucket_hour,
+            e.event_name,
+            COALESCE(e.last_intent, '') AS last_intent
+        FROM old_events e
+    ) removed
+    WHERE r.bucket_hour = removed.bucket_hour
+    AND r.event_name = removed.event_name
+    AND r.last_intent = removed.last_intent
+    AND r.event_count <= 0;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRUNCATE fires no delete triggers; empty the rollups with the raw table
+CREATE OR REPLACE FUNCTION clear_analytics_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    TRUNCATE analytics_event_rollups;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers, truncate and backfill in one transaction: the lock keeps inserts
+-- from landing between the backfill and the trigger (lost or double-counted)
+BEGIN;
+
+LOCK TABLE analytics_events IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS rollup_analytics_events_trigger ON analytics_events;
+CREATE TRIGGER rollup_analytics_events_trigger
+    AFTER INSERT ON analytics_events
+    REFERENCING NEW TABLE AS new_events
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_analytics_events();
+
+DROP TRIGGER IF EXISTS unroll_analytics_events_trigger ON analytics_events;
+CREATE TRIGGER unroll_analytics_events_trigger
+    AFTER DELETE ON analytics_events
+    REFERENCING OLD TABLE AS old_events
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION unroll_analytics_events();
+
+DROP TRIGGER IF EXISTS clear_analytics_rollups_trigger ON analytics_events;
+CREATE TRIGGER clear_analytics_rollups_trigger
+    AFTER TRUNCATE ON analytics_events
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION clear_analytics_rollups();
+
+-- Backfill rollups from existing events
+TRUNCATE analytics_event_rollups;
+INSERT INTO analytics_event_rollups (bucket_hour, event_name, last_intent, event_count)
+SELECT date_trunc('hour', "timestamp"), event_name, COALESCE(last_intent, ''), COUNT(*)
+FROM analytics_events
+GROUP BY 1, 2, 3;
+
+COMMIT;
+
+-- Exact event counts by name for an optional intent and [p_start, p_end] range
+CREATE OR REPLACE FUNCTION analytics_event_counts(
+    p_intent TEXT DEFAULT NULL,
+    p_start TIMESTAMPTZ DEFAULT NULL,
+    p_end TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (
+    event_name TEXT,
+    event_count BIGINT
+) AS $$
+DECLARE
+    -- Whole-hour buckets fully inside the range: [full_start, full_end)
+    full_start TIMESTAMPTZ := CASE
+        WHEN p_start IS NULL THEN '-infinity'::TIMESTAMPTZ
+        WHEN p_start = date_trunc('hour', p_start) THEN p_start
+        ELSE date_trunc('hour', p_start) + INTERVAL '1 hour'
+    END;
+    full_end TIMESTAMPTZ := CASE
+        WHEN p_end IS NULL THEN 'infinity'::TIMESTAMPTZ
+        ELSE date_trunc('hour', p_end)
+    END;
+BEGIN
+    IF full_start >= full_end THEN
+        -- Range is inside a single hour: count raw events only
+        RETURN QUERY
+        SELECT e.event_name::TEXT, COUNT(*)::BIGINT
+        FROM analytics_events e
+        WHERE (p_intent IS NULL OR e.last_intent = p_intent)
+        AND (p_start IS NULL OR e."timestamp" >= p_start)
+        AND (p_end IS NULL OR e."timestamp" <= p_end)
+        GROUP BY e.event_name;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT counts.name, SUM(counts.n)::BIGINT
+    FROM (
+        SELECT r.event_name AS name, r.event_count AS n
+        FROM analytics_event_rollups r
+        WHERE (p_intent IS NULL OR r.last_intent = p_intent)
+        AND r.bucket_hour >= full_start
+        AND r.bucket_hour < full_end
+
+        UNION ALL
+
+        SELECT e.event_name::TEXT, 1
+        FROM analytics_events e
+        WHERE (p_intent IS NULL OR e.last_intent = p_intent)
+        AND (
+            (p_start IS NOT NULL AND e."timestamp" >= p_start AND e."timestamp" < full_start)
+            OR (p_end IS NOT NULL AND e."timestamp" >= full_end AND e."timestamp" <= p_end)
+        )
+    ) counts
+    GROUP BY counts.name;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Verify rollups match the raw table
+SELECT
+    (SELECT COUNT(*) FROM analytics_events) AS raw_events,
+    (SELECT COALESCE(SUM(event_count), 0) FROM analytics_event_rollups) AS rolled_up_events;
@@ -0,0 +1,162 @@
+-- Atomic, single-round-trip message send
+-- POST /messages calls send_message_atomic(), which finds or creates the
+-- conversation by its canonical participant-pair key, inserts the message,
+-- updates the last-message snapshot and increments the receiver's unread
+-- count in one transaction. Unread counts are tracked per participant in
+-- conversations.unread_counts ({"<user id>": n}) instead of one shared counter.
+-- Run after ADD_CONVERSATION_INBOX.sql.
+
+-- Canonical key for a pair of users, independent of who messaged first
+CREATE OR REPLACE FUNCTION conversation_participant_key(p_a TEXT, p_b TEXT)
+RETURNS TEXT AS $$
+    SELECT LEAST(p_a, p_b) || ':' || GREATEST(p_a, p_b);
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS participant_key TEXT,
+ADD COLUMN IF NOT EXISTS unread_counts JSONB NOT NULL DEFAULT '{}'::JSONB;
+
+-- Backfill keys for two-person conversations; if a pair already has several
+-- conversations, the most recently updated one keeps the key
+UPDATE conversations c
+SET participant_key = k.participant_key
+FROM (
+    SELECT DISTINCT ON (participant_key) id, participant_key
+    FROM (
+        SELECT id, updated_at,
+            conversation_participant_key(participants[1]::TEXT, participants[2]::TEXT) AS participant_key
+        FROM conversations
+        WHERE cardinality(participants) = 2
+    ) pairs
+    ORDER BY participant_key, updated_at DESC
+) k
+WHERE c.id = k.id
+AND c.participant_key IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversations_participant_key
+    ON conversations(participant_key);
+
+-- Backfill per-participant unread counts from unread messages
+UPDATE conversations c
+SET unread_counts = u.unread_counts
+FROM (
+    SELECT conversation_id, jsonb_object_agg(receiver_id::TEXT, unread) AS unread_counts
+    FROM (
+        SELECT conversation_id, receiver_id, COUNT(*) AS unread
+        FROM messages
+        WHERE is_read = FALSE
+        GROUP BY conversation_id, receiver_id
+    ) per_receiver
+    GROUP BY conversation_id
+) u
+WHERE c.id = u.conversation_id;
+
+-- mark_conversation_read() touches only a receiver's unread messages
+CREATE INDEX IF NOT EXISTS idx_messages_unread_receiver
+    ON messages(conversation_id, receiver_id)
+    WHERE is_read = FALSE;
+
+-- Send a message; returns the message row plus the receiver's new unread count.
+-- The conversation row is locked first, so concurrent sends and mark-read
+-- calls on the same conversation serialize instead of losing increments.
+CREATE OR REPLACE FUNCTION send_message_atomic(
+    p_sender_id UUID,
+    p_receiver_id UUID,
+    p_content TEXT,
+    p_conversation_id UUID DEFAULT NULL,
+    p_related_job_id UUID DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_conversation_id UUID;
+    v_message messages%ROWTYPE;
+    v_unread_counts JSONB;
+BEGIN
+    IF p_conversation_id IS NULL THEN
+        INSERT INTO conversations (id, participants, participant_key, unread_counts, created_at, updated_at)
+        VALUES (
+            uuid_generate_v4(),
+            ARRAY[p_sender_id, p_receiver_id],
+            conversation_participant_key(p_sender_id::TEXT, p_receiver_id::TEXT),
+            '{}'::JSONB,
+            NOW(),
+            NOW()
+        )
+        ON CONFLICT (participant_key) DO UPDATE SET updated_at = EXCLUDED.updated_at
+        RETURNING id INTO v_conversation_id;
+    ELSE
+        SELECT id INTO v_conversation_id
+        FROM conversations
+        WHERE id = p_conversation_id
+        AND participants @> ARRAY[p_sender_id, p_receiver_id]
+        FOR UPDATE;
+
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Conversation % not found for these participants', p_conversation_id
+                USING ERRCODE = 'P0002';
+        END IF;
+    END IF;
+
+    INSERT INTO messages (id, conversation_id, sender_id, receiver_id, content, related_job_id, is_read, created_at)
+    VALUES (uuid_generate_v4(), v_conversation_id, p_sender_id, p_receiver_id, p_content, p_related_job_id, FALSE, NOW())
+    RETURNING * INTO v_message;
+
+    UPDATE conversations
+    SET last_message_id = v_message.id,
+        last_message = jsonb_build_object(
+            'id', v_message.id,
+            'content', v_message.content,
+            'senderId', v_message.sender_id,
+            'createdAt', v_message.created_at
+        ),
+        unread_counts = unread_counts || jsonb_build_object(
+            p_receiver_id::TEXT,
+            COALESCE((unread_counts ->> p_receiver_id::TEXT)::INTEGER, 0) + 1
+        ),
+        updated_at = v_message.created_at
+    WHERE id = v_conversation_id
+    RETURNING unread_counts INTO v_unread_counts;
+
+    RETURN to_jsonb(v_message)
+        || jsonb_build_object('receiver_unread_count', (v_unread_counts ->> p_receiver_id::TEXT)::INTEGER);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mark a user's messages in a conversation read and zero their unread count;
+-- returns how many messages were marked
+CREATE OR REPLACE FUNCTION mark_conversation_read(
+    p_conversation_id UUID,
+    p_user_id UUID
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_marked INTEGER;
+BEGIN
+    PERFORM 1 FROM conversations WHERE id = p_conversation_id FOR UPDATE;
+
+    UPDATE messages
+    SET is_read = TRUE
+    WHERE conversation_id = p_conversation_id
+    AND receiver_id = p_user_id
+    AND is_read = FALSE;
+    GET DIAGNOSTICS v_marked = ROW_COUNT;
+
+    UPDATE conversations
+    SET unread_counts = unread_counts || jsonb_build_object(p_user_id::TEXT, 0)
+    WHERE id = p_conversation_id;
+
+    RETURN v_marked;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Total unread messages for a user across their conversations
+CREATE OR REPLACE FUNCTION unread_message_count(p_user_id UUID)
+RETURNS BIGINT AS $$
+    SELECT COALESCE(SUM((unread_counts ->> p_user_id::TEXT)::BIGINT), 0)
+    FROM conversations
+    WHERE participants @> ARRAY[p_user_id];
+$$ LANGUAGE sql STABLE;
+
+-- Verify functions were created
+SELECT proname FROM pg_proc
+WHERE proname IN ('conversation_participant_key', 'send_message_atomic', 'mark_conversation_read', 'unread_message_count');
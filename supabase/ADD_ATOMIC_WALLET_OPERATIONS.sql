@@ -0,0 +1,185 @@
+-- Atomic wallet money movements
+-- Cashouts, savings transfers and credit advances each run as one function
+-- call: the wallet row is locked, the balance check and update and the
+-- ledger insert happen in one transaction, and the updated wallet plus the new
+-- transaction come back in the same round trip. Concurrent requests for the
+-- same wallet serialize on the row lock, so balances cannot be double-spent
+-- or lose updates.
+--
+-- Business-rule failures are returned, not raised:
+--   {"error": "insufficient_balance" | "invalid_amount" | "daily_limit_exceeded" | "credit_limit_exceeded", ...}
+-- Success returns {"wallet": {...}, "transaction": {...}, ...}.
+
+-- Wallet row for a user, created on first use, locked until the caller's transaction ends
+CREATE OR REPLACE FUNCTION wallet_for_update(p_user_id UUID)
+RETURNS wallets AS $$
+DECLARE
+    v_wallet wallets;
+BEGIN
+    INSERT INTO wallets (user_id)
+    VALUES (p_user_id)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    SELECT * INTO v_wallet FROM wallets WHERE user_id = p_user_id FOR UPDATE;
+    RETURN v_wallet;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Instant cashouts complete immediately; standard ones move the amount to
+-- pending_balance. p_daily_limit caps today's (UTC) completed cashouts.
+CREATE OR REPLACE FUNCTION wallet_cashout(
+    p_user_id UUID,
+    p_amount NUMERIC,
+    p_method TEXT,
+    p_instant BOOLEAN,
+    p_daily_limit NUMERIC DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_wallet wallets;
+    v_transaction transactions;
+    v_today_total NUMERIC;
+BEGIN
+    IF p_amount IS NULL OR p_amount <= 0 THEN
+        RETURN jsonb_build_object('error', 'invalid_amount');
+    END IF;
+
+    v_wallet := wallet_for_update(p_user_id);
+
+    IF v_wallet.available_balance < p_amount THEN
+        RETURN jsonb_build_object('error', 'insufficient_balance');
+    END IF;
+
+    IF p_daily_limit IS NOT NULL THEN
+        SELECT COALESCE(SUM(amount), 0) INTO v_today_total
+        FROM transactions
+        WHERE wallet_id = v_wallet.id
+        AND transaction_type = 'cashout'
+        AND status = 'completed'
+        AND created_at >= date_trunc('day', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+
+        IF v_today_total + p_amount > p_daily_limit THEN
+            RETURN jsonb_build_object('error', 'daily_limit_exceeded');
+        END IF;
+    END IF;
+
+    UPDATE wallets
+    SET available_balance = available_balance - p_amount,
+        balance = CASE WHEN p_instant THEN available_balance - p_amount ELSE balance END,
+        pending_balance = CASE WHEN p_instant THEN pending_balance ELSE pending_balance + p_amount END,
+        updated_at = NOW()
+    WHERE id = v_wallet.id
+    RETURNING * INTO v_wallet;
+
+    INSERT INTO transactions (wallet_id, transaction_type, amount, description, status, payment_method)
+    VALUES (
+        v_wallet.id,
+        'cashout',
+        p_amount,
+        CASE WHEN p_instant THEN 'Instant cashout to ' ELSE 'Standard cashout to ' END || p_method,
+        (CASE WHEN p_instant THEN 'completed' ELSE 'pending' END)::payment_status,
+        p_method
+    )
+    RETURNING * INTO v_transaction;
+
+    RETURN jsonb_build_object('wallet', to_jsonb(v_wallet), 'transaction', to_jsonb(v_transaction));
+END;
+$$ LANGUAGE plpgsql;
+
+-- Enable savings and optionally move p_amount from the available balance into it
+CREATE OR REPLACE FUNCTION wallet_transfer_to_savings(
+    p_user_id UUID,
+    p_amount NUMERIC DEFAULT 0
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_wallet wallets;
+    v_transaction transactions;
+BEGIN
+    IF p_amount IS NULL OR p_amount < 0 THEN
+        RETURN jsonb_build_object('error', 'invalid_amount');
+    END IF;
+
+    v_wallet := wallet_for_update(p_user_id);
+
+    IF p_amount > 0 AND v_wallet.available_balance < p_amount THEN
+        RETURN jsonb_build_object('error', 'insufficient_balance');
+    END IF;
+
+    UPDATE wallets
+    SET savings_enabled = TRUE,
+        available_balance = available_balance - p_amount,
+        balance = CASE WHEN p_amount > 0 THEN available_balance - p_amount ELSE balance END,
+        savings_balance = savings_balance + p_amount,
+        updated_at = NOW()
+    WHERE id = v_wallet.id
+    RETURNING * INTO v_wallet;
+
+    IF p_amount > 0 THEN
+        INSERT INTO transactions (wallet_id, transaction_type, amount, description, status, payment_method)
+        VALUES (v_wallet.id, 'transfer', p_amount, 'Transfer to savings account', 'completed', 'wallet_balance')
+        RETURNING * INTO v_transaction;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'wallet', to_jsonb(v_wallet),
+        'transaction', CASE WHEN p_amount > 0 THEN to_jsonb(v_transaction) END
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Credit advance. Limit = credit score x 100, where the score starts at 650,
+-- +50 with more than 10 transactions and +30 with more than $1000 earned.
+CREATE OR REPLACE FUNCTION wallet_request_credit(
+    p_user_id UUID,
+    p_amount NUMERIC,
+    p_purpose TEXT
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_wallet wallets;
+    v_transaction transactions;
+    v_score INTEGER := 650;
+    v_max_credit NUMERIC;
+BEGIN
+    IF p_amount IS NULL OR p_amount <= 0 THEN
+        RETURN jsonb_build_object('error', 'invalid_amount');
+    END IF;
+
+    v_wallet := wallet_for_update(p_user_id);
+
+    IF (SELECT COUNT(*) FROM (SELECT 1 FROM transactions WHERE wallet_id = v_wallet.id LIMIT 11) recent) > 10 THEN
+        v_score := v_score + 50;
+    END IF;
+    IF v_wallet.total_earned > 1000 THEN
+        v_score := v_score + 30;
+    END IF;
+    v_max_credit := v_score * 100;
+
+    IF p_amount > v_max_credit - v_wallet.credit_used THEN
+        RETURN jsonb_build_object('error', 'credit_limit_exceeded', 'max_credit', v_max_credit);
+    END IF;
+
+    UPDATE wallets
+    SET credit_used = credit_used + p_amount,
+        available_balance = available_balance + p_amount,
+        balance = available_balance + p_amount,
+        updated_at = NOW()
+    WHERE id = v_wallet.id
+    RETURNING * INTO v_wallet;
+
+    INSERT INTO transactions (wallet_id, transaction_type, amount, description, status, payment_method)
+    VALUES (v_wallet.id, 'deposit', p_amount, 'Credit advance for: ' || p_purpose, 'completed', 'credit')
+    RETURNING * INTO v_transaction;
+
+    RETURN jsonb_build_object(
+        'wallet', to_jsonb(v_wallet),
+        'transaction', to_jsonb(v_transaction),
+        'max_credit', v_max_credit
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Verify functions were created
+SELECT proname FROM pg_proc
+WHERE proname IN ('wallet_for_update', 'wallet_cashout', 'wallet_transfer_to_savings', 'wallet_request_credit');
@@ -0,0 +1,34 @@
+-- Single-query conversation inbox
+-- GET /conversations/{userId} reads a denormalized last-message snapshot
+-- stored on each conversation (written by POST /messages) instead of looking
+-- up messages.last_message_id once per conversation, and pages through the
+-- inbox by (updated_at, id) cursor.
+
+ALTER TABLE conversations
+ADD COLUMN IF NOT EXISTS last_message JSONB;
+
+-- Backfill snapshots for conversations that predate the column
+UPDATE conversations c
+SET last_message = jsonb_build_object(
+    'id', m.id,
+    'content', m.content,
+    'senderId', m.sender_id,
+    'createdAt', m.created_at
+)
+FROM messages m
+WHERE m.id = c.last_message_id
+AND c.last_message IS NULL;
+
+-- participants @> ARRAY[user] filter, then newest-first keyset pages
+CREATE INDEX IF NOT EXISTS idx_conversations_participants
+    ON conversations USING GIN (participants);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at_id
+    ON conversations(updated_at DESC, id DESC);
+
+-- Verify column and indexes
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'conversations' AND column_name = 'last_message';
+
+SELECT indexname FROM pg_indexes
+WHERE tablename = 'conversations';
@@ -0,0 +1,80 @@
+-- Spatial index for QuickHire nearby-gig and nearby-worker lookups
+-- Radius queries run against an indexed geography column instead of loading
+-- every open gig / available worker into the API and filtering in Python.
+-- Requires the postgis extension (enabled in 01_extensions_and_setup.sql).
+
+-- Geography points derived from the existing latitude/longitude columns
+ALTER TABLE quickhire_gigs
+ADD COLUMN IF NOT EXISTS geo GEOGRAPHY(POINT, 4326)
+    GENERATED ALWAYS AS (
+        ST_SetSRID(ST_MakePoint(longitude::DOUBLE PRECISION, latitude::DOUBLE PRECISION), 4326)::GEOGRAPHY
+    ) STORED;
+
+ALTER TABLE worker_locations
+ADD COLUMN IF NOT EXISTS geo GEOGRAPHY(POINT, 4326)
+    GENERATED ALWAYS AS (
+        ST_SetSRID(ST_MakePoint(longitude::DOUBLE PRECISION, latitude::DOUBLE PRECISION), 4326)::GEOGRAPHY
+    ) STORED;
+
+-- Partial GiST indexes: only rows that can appear in a nearby search
+CREATE INDEX IF NOT EXISTS idx_quickhire_gigs_geo_open
+    ON quickhire_gigs USING GIST (geo)
+    WHERE status = 'open';
+
+CREATE INDEX IF NOT EXISTS idx_worker_locations_geo_available
+    ON worker_locations USING GIST (geo)
+    WHERE is_available = true;
+
+-- Open gigs within p_radius_miles of a point, nearest first.
+-- When p_use_gig_radius is true, each gig is also limited to its own service
+-- radius; p_radius_miles then acts as the upper bound used by the index scan.
+CREATE OR REPLACE FUNCTION nearby_quickhire_gigs(
+    p_lat DOUBLE PRECISION,
+    p_lon DOUBLE PRECISION,
+    p_radius_miles DOUBLE PRECISION,
+    p_category TEXT DEFAULT NULL,
+    p_use_gig_radius BOOLEAN DEFAULT FALSE
+)
+RETURNS SETOF JSONB AS $$
+DECLARE
+    origin GEOGRAPHY := ST_SetSRID(ST_MakePoint(p_lon, p_lat), 4326)::GEOGRAPHY;
+BEGIN
+    RETURN QUERY
+    SELECT
+        (to_jsonb(g) - 'geo')
+        || jsonb_build_object('distance', ROUND((ST_Distance(g.geo, origin, false) / 1609.344)::NUMERIC, 2))
+    FROM quickhire_gigs g
+    WHERE g.status = 'open'
+    AND ST_DWithin(g.geo, origin, p_radius_miles * 1609.344, false)
+    AND (p_category IS NULL OR g.category = p_category)
+    AND (NOT p_use_gig_radius OR ST_DWithin(g.geo, origin, COALESCE(g.radius, 5) * 1609.344, false))
+    ORDER BY g.geo <-> origin;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Available workers within p_radius_miles of a point, nearest first
+CREATE OR REPLACE FUNCTION nearby_workers(
+    p_lat DOUBLE PRECISION,
+    p_lon DOUBLE PRECISION,
+    p_radius_miles DOUBLE PRECISION
+)
+RETURNS SETOF JSONB AS $$
+DECLARE
+    origin GEOGRAPHY := ST_SetSRID(ST_MakePoint(p_lon, p_lat), 4326)::GEOGRAPHY;
+BEGIN
+    RETURN QUERY
+    SELECT
+        (to_jsonb(w) - 'geo')
+        || jsonb_build_object('distance', ROUND((ST_Distance(w.geo, origin, false) / 1609.344)::NUMERIC, 2))
+    FROM worker_locations w
+    WHERE w.is_available = true
+    AND ST_DWithin(w.geo, origin, p_radius_miles * 1609.344, false)
+    ORDER BY w.geo <-> origin;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Verify indexes were created
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename IN ('quickhire_gigs', 'worker_locations')
+AND indexname LIKE '%geo%';
@@ -0,0 +1,159 @@
+-- Full-text and trigram search indexes for jobs and worker profiles
+-- Backs the ranked search mode of /search/gigs, /search/talents and
+-- /search/advanced (search_jobs_ranked / search_workers_ranked) so text search
+-- no longer falls back to unindexed ILIKE '%q%' scans.
+-- Requires pg_trgm (enabled in 01_extensions_and_setup.sql) and
+-- worker_profiles.skills_lower (ADD_WORKER_SKILLS_LOWER.sql).
+
+-- array_to_string is only STABLE; generated columns need an IMMUTABLE expression
+CREATE OR REPLACE FUNCTION immutable_array_to_string(items TEXT[])
+RETURNS TEXT AS $$
+    SELECT COALESCE(array_to_string(items, ' '), '');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Weighted search documents: title/name > skills/category > description/bio
+ALTER TABLE jobs
+ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, COALESCE(title, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, COALESCE(category, '') || ' ' || immutable_array_to_string(skills_required)), 'B')
+        || setweight(to_tsvector('english'::regconfig, COALESCE(description, '')), 'C')
+    ) STORED;
+
+ALTER TABLE worker_profiles
+ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, COALESCE(name, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, immutable_array_to_string(skills)), 'B')
+        || setweight(to_tsvector('english'::regconfig, COALESCE(bio, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_search_vector ON jobs USING GIN(search_vector);
+CREATE INDEX IF NOT EXISTS idx_worker_profiles_search_vector ON worker_profiles USING GIN(search_vector);
+
+-- Trigram indexes for typo-tolerant matches on short fields
+CREATE INDEX IF NOT EXISTS idx_jobs_title_trgm ON jobs USING GIN(title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_worker_profiles_name_trgm ON worker_profiles USING GIN(name gin_trgm_ops);
+
+-- Ranked job search: one page of published jobs plus the exact total
+-- Returns {"total": n, "results": [job, ...]}; each job carries its "rank"
+CREATE OR REPLACE FUNCTION search_jobs_ranked(
+    search_query TEXT,
+    p_category TEXT DEFAULT NULL,
+    p_job_type TEXT DEFAULT NULL,
+    p_min_budget DECIMAL DEFAULT NULL,
+    p_max_budget DECIMAL DEFAULT NULL,
+    p_sort TEXT DEFAULT 'relevance',
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS JSONB AS $$
+    WITH matches AS (
+        SELECT
+            j.*,
+            GREATEST(
+                ts_rank_cd(j.search_vector, websearch_to_tsquery('english', search_query)),
+                similarity(j.title, search_query)
+            ) AS rank
+        FROM jobs j
+        WHERE j.status = 'published'
+        AND (
+            j.search_vector @@ websearch_to_tsquery('english', search_query)
+            OR j.title % search_query
+        )
+        AND (p_category IS NULL OR j.category = p_category)
+        AND (p_job_type IS NULL OR j.job_type::TEXT = p_job_type)
+        AND (p_min_budget IS NULL OR j.budget >= p_min_budget)
+        AND (p_max_budget IS NULL OR j.budget <= p_max_budget)
+    ),
+    page AS (
+        SELECT * FROM matches
+        ORDER BY
+            CASE WHEN p_sort = 'date' THEN created_at END DESC,
+            CASE WHEN p_sort = 'price' THEN budget END DESC NULLS LAST,
+            rank DESC,
+            created_at DESC
+        LIMIT p_limit OFFSET p_offset
+    )
+    SELECT jsonb_build_object(
+        'total', (SELECT COUNT(*) FROM matches),
+        'results', COALESCE(
+            (SELECT jsonb_agg(to_jsonb(page) - 'search_vector' ORDER BY
+                CASE WHEN p_sort = 'date' THEN created_at END DESC,
+                CASE WHEN p_sort = 'price' THEN budget END DESC NULLS LAST,
+                rank DESC,
+                created_at DESC
+            ) FROM page),
+            '[]'::JSONB
+        )
+    );
+$$ LANGUAGE sql STABLE;
+
+-- Ranked talent search over worker profiles joined with their user row
+-- Returns {"total": n, "results": [user + {"profile": ..., "rank": ...}, ...]}
+-- p_skills must be lower case; it is matched against skills_lower
+CREATE OR REPLACE FUNCTION search_workers_ranked(
+    search_query TEXT,
+    p_skills TEXT[] DEFAULT NULL,
+    p_min_rate DECIMAL DEFAULT NULL,
+    p_max_rate DECIMAL DEFAULT NULL,
+    p_sort TEXT DEFAULT 'relevance',
+    p_limit INTEGER DEFAULT 20,
+    p_offset INTEGER DEFAULT 0
+)
+RETURNS JSONB AS $$
+    WITH matches AS (
+        SELECT
+            u.id AS user_id,
+            u.created_at,
+            wp.hourly_rate,
+            wp.rating,
+            (to_jsonb(u) - 'password_hash')
+                || jsonb_build_object('profile', to_jsonb(wp) - 'search_vector' - 'skills_lower') AS talent,
+            GREATEST(
+                ts_rank_cd(wp.search_vector, websearch_to_tsquery('english', search_query)),
+                similarity(wp.name, search_query)
+            ) AS rank
+        FROM worker_profiles wp
+        JOIN users u ON u.id = wp.user_id
+        WHERE 'worker' = ANY(u.roles)
+        AND (
+            wp.search_vector @@ websearch_to_tsquery('english', search_query)
+            OR wp.name % search_query
+        )
+        AND (p_skills IS NULL OR wp.skills_lower && p_skills)
+        AND (p_min_rate IS NULL OR wp.hourly_rate >= p_min_rate)
+        AND (p_max_rate IS NULL OR wp.hourly_rate <= p_max_rate)
+    ),
+    page AS (
+        SELECT * FROM matches
+        ORDER BY
+            CASE WHEN p_sort = 'date' THEN created_at END DESC,
+            CASE WHEN p_sort = 'price' THEN hourly_rate END DESC NULLS LAST,
+            CASE WHEN p_sort = 'rating' THEN rating END DESC NULLS LAST,
+            rank DESC,
+            created_at DESC
+        LIMIT p_limit OFFSET p_offset
+    )
+    SELECT jsonb_build_object(
+        'total', (SELECT COUNT(*) FROM matches),
+        'results', COALESCE(
+            (SELECT jsonb_agg(talent || jsonb_build_object('rank', rank) ORDER BY
+                CASE WHEN p_sort = 'date' THEN created_at END DESC,
+                CASE WHEN p_sort = 'price' THEN hourly_rate END DESC NULLS LAST,
+                CASE WHEN p_sort = 'rating' THEN rating END DESC NULLS LAST,
+                rank DESC,
+                created_at DESC
+            ) FROM page),
+            '[]'::JSONB
+        )
+    );
+$$ LANGUAGE sql STABLE;
+
+-- Verify indexes were created
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE indexname IN (
+    'idx_jobs_search_vector', 'idx_worker_profiles_search_vector',
+    'idx_jobs_title_trgm', 'idx_worker_profiles_name_trgm'
+);
@@ -0,0 +1,115 @@
+-- Daily and monthly cashout limits from running per-wallet counters
+-- wallet_cashout() used to sum today's cashouts from the transactions table
+-- on every request. Each wallet now carries the totals for the current UTC
+-- day and month, updated in the same transaction as the balance and ledger
+-- row, so both limits are checked in O(1) under the wallet row lock. Both
+-- limits apply to every cashout, instant or standard.
+-- Run after ADD_ATOMIC_WALLET_OPERATIONS.sql.
+
+ALTER TABLE wallets
+ADD COLUMN IF NOT EXISTS cashout_day DATE,
+ADD COLUMN IF NOT EXISTS cashout_day_total DECIMAL(12, 2) NOT NULL DEFAULT 0,
+ADD COLUMN IF NOT EXISTS cashout_month DATE,
+ADD COLUMN IF NOT EXISTS cashout_month_total DECIMAL(12, 2) NOT NULL DEFAULT 0;
+
+-- Per-wallet, per-type history by date (backfill below, audits, /wallet/transactions?type=)
+CREATE INDEX IF NOT EXISTS idx_transactions_wallet_type_created
+    ON transactions(wallet_id, transaction_type, created_at DESC);
+
+-- Backfill the counters from this month's cashouts
+UPDATE wallets w
+SET cashout_day = (NOW() AT TIME ZONE 'UTC')::DATE,
+    cashout_day_total = totals.day_total,
+    cashout_month = date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE,
+    cashout_month_total = totals.month_total
+FROM (
+    SELECT
+        wallet_id,
+        COALESCE(SUM(amount) FILTER (
+            WHERE created_at >= date_trunc('day', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+        ), 0) AS day_total,
+        SUM(amount) AS month_total
+    FROM transactions
+    WHERE transaction_type = 'cashout'
+    AND status IN ('completed', 'pending')
+    AND created_at >= date_trunc('month', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+    GROUP BY wallet_id
+) totals
+WHERE w.id = totals.wallet_id;
+
+DROP FUNCTION IF EXISTS wallet_cashout(UUID, NUMERIC, TEXT, BOOLEAN, NUMERIC);
+
+-- Instant cashouts complete immediately; standard ones move the amount to
+-- pending_balance. Counters roll over when the stored day/month is not the
+-- current UTC one.
+CREATE OR REPLACE FUNCTION wallet_cashout(
+    p_user_id UUID,
+    p_amount NUMERIC,
+    p_method TEXT,
+    p_instant BOOLEAN,
+    p_daily_limit NUMERIC DEFAULT NULL,
+    p_monthly_limit NUMERIC DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_wallet wallets;
+    v_transaction transactions;
+    v_today DATE := (NOW() AT TIME ZONE 'UTC')::DATE;
+    v_month DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::DATE;
+    v_day_total NUMERIC;
+    v_month_total NUMERIC;
+BEGIN
+    IF p_amount IS NULL OR p_amount <= 0 THEN
+        RETURN jsonb_build_object('error', 'invalid_amount');
+    END IF;
+
+    v_wallet := wallet_for_update(p_user_id);
+
+    IF v_wallet.available_balance < p_amount THEN
+        RETURN jsonb_build_object('error', 'insufficient_balance');
+    END IF;
+
+    v_day_total := CASE WHEN v_wallet.cashout_day = v_today THEN v_wallet.cashout_day_total ELSE 0 END;
+    v_month_total := CASE WHEN v_wallet.cashout_month = v_month THEN v_wallet.cashout_month_total ELSE 0 END;
+
+    IF p_daily_limit IS NOT NULL AND v_day_total + p_amount > p_daily_limit THEN
+        RETURN jsonb_build_object('error', 'daily_limit_exceeded', 'remaining', GREATEST(p_daily_limit - v_day_total, 0));
+    END IF;
+    IF p_monthly_limit IS NOT NULL AND v_month_total + p_amount > p_monthly_limit THEN
+        RETURN jsonb_build_object('error', 'monthly_limit_exceeded', 'remaining', GREATEST(p_monthly_limit - v_month_total, 0));
+    END IF;
+
+    UPDATE wallets
+    SET available_balance = available_balance - p_amount,
+        balance = CASE WHEN p_instant THEN available_balance - p_amount ELSE balance END,
+        pending_balance = CASE WHEN p_instant THEN pending_balance ELSE pending_balance + p_amount END,
+        cashout_day = v_today,
+        cashout_day_total = v_day_total + p_amount,
+        cashout_month = v_month,
+        cashout_month_total = v_month_total + p_amount,
+        updated_at = NOW()
+    WHERE id = v_wallet.id
+    RETURNING * INTO v_wallet;
+
+    INSERT INTO transactions (wallet_id, transaction_type, amount, description, status, payment_method)
+    VALUES (
+        v_wallet.id,
+        'cashout',
+        p_amount,
+        CASE WHEN p_instant THEN 'Instant cashout to ' ELSE 'Standard cashout to ' END || p_method,
+        (CASE WHEN p_instant THEN 'completed' ELSE 'pending' END)::payment_status,
+        p_method
+    )
+    RETURNING * INTO v_transaction;
+
+    RETURN jsonb_build_object('wallet', to_jsonb(v_wallet), 'transaction', to_jsonb(v_transaction));
+END;
+$$ LANGUAGE plpgsql;
+
+-- Verify columns and index
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'wallets' AND column_name LIKE 'cashout_%';
+
+SELECT indexname FROM pg_indexes
+WHERE tablename = 'transactions' AND indexname = 'idx_transactions_wallet_type_created';
@@ -0,0 +1,29 @@
+-- Allow worker_locations to be written with a single bulk upsert
+-- (ON CONFLICT (worker_id)) by the location ingest pipeline instead of a
+-- select followed by an update or insert per GPS ping.
+
+-- Keep only the most recent row per worker before adding the constraint
+-- (rows without last_updated rank last, ties broken by id)
+DELETE FROM worker_locations
+WHERE id IN (
+    SELECT id
+    FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY worker_id
+            ORDER BY last_updated DESC NULLS LAST, id
+        ) AS position
+        FROM worker_locations
+    ) ranked
+    WHERE position > 1
+);
+
+ALTER TABLE worker_locations
+ALTER COLUMN id SET DEFAULT uuid_generate_v4();
+
+ALTER TABLE worker_locations
+ADD CONSTRAINT worker_locations_worker_id_key UNIQUE (worker_id);
+
+-- Verify constraint was added
+SELECT conname, pg_get_constraintdef(oid)
+FROM pg_constraint
+WHERE conrelid = 'worker_locations'::regclass;
@@ -0,0 +1,25 @@
+-- Case-insensitive skill matching for /search/talents
+-- worker_profiles.skills keeps the spelling users typed ("JavaScript"), so
+-- array overlap against it is case-sensitive. skills_lower is the same array
+-- lower-cased, kept in sync by Postgres, with its own GIN index; the API
+-- lower-cases requested skills and compares against it.
+
+-- lower() over an array; generated columns need an IMMUTABLE expression
+CREATE OR REPLACE FUNCTION immutable_lower_array(items TEXT[])
+RETURNS TEXT[] AS $$
+    SELECT COALESCE(array_agg(lower(item)), ARRAY[]::TEXT[]) FROM unnest(items) AS item;
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE worker_profiles
+ADD COLUMN IF NOT EXISTS skills_lower TEXT[]
+    GENERATED ALWAYS AS (immutable_lower_array(skills)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_worker_profiles_skills_lower ON worker_profiles USING GIN(skills_lower);
+
+-- Verify column and index
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'worker_profiles' AND column_name = 'skills_lower';
+
+SELECT indexname FROM pg_indexes
+WHERE indexname = 'idx_worker_profiles_skills_lower';
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Wallet Concurrency Stress Test
+Fires concurrent credit advances and cashouts at the wallet API and checks
+that no update was lost: the final balance must equal the starting balance
+plus/minus exactly the successful operations, the ledger must have one entry
+per success, and the balance must never go negative.
+
+Usage: WALLET_STRESS_BASE_URL=http://localhost:8001/api python wallet_stress_test.py
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Configuration
+BASE_URL = os.environ.get("WALLET_STRESS_BASE_URL", "https://hapployed-migrate.preview.emergentagent.com/api")
+CONCURRENCY = int(os.environ.get("WALLET_STRESS_CONCURRENCY", "25"))
+CREDIT_REQUESTS = 20
+CREDIT_AMOUNT = 5.0
+# More cashouts than the credited funds can cover, so some must be refused
+CASHOUT_REQUESTS = 40
+CASHOUT_AMOUNT = 3.0
+
+def get_wallet():
+    response = requests.get(f"{BASE_URL}/wallet/", timeout=30)
+    response.raise_for_status()
+    data = response.json()["data"]
+    return float(data["balance"]["available"])
+
+def count_transactions(type_=None):
+    url = f"{BASE_URL}/wallet/transactions?limit=1" + (f"&type={type_}" if type_ else "")
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.json()["data"]["pagination"]["total_transactions"]
+
+def fire(path, payload, count):
+    """POST payload `count` times concurrently; returns (successes, refusals, errors, seconds)"""
+    def one(_):
+        try:
+            response = requests.post(f"{BASE_URL}{path}", json=payload, timeout=60)
+            return response.status_code
+        except requests.RequestException:
+            return None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        codes = list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - started
+    return codes.count(200), codes.count(400), sum(1 for code in codes if code not in (200, 400)), elapsed
+
+def main():
+    print(f"📍 Base URL: {BASE_URL} (concurrency {CONCURRENCY})")
+    results = {"checks": {}}
+
+    start_balance = get_wallet()
+    start_deposits = count_transactions("deposit")
+    start_cashouts = count_transactions("cashout")
+
+    # Phase 1: concurrent credit advances (each adds CREDIT_AMOUNT)
+    ok, refused, errors, elapsed = fire(
+        "/wallet/credit/request", {"amount": CREDIT_AMOUNT, "purpose": "stress test"}, CREDIT_REQUESTS
+    )
+    results["credit"] = {"succeeded": ok, "refused": refused, "errors": errors, "seconds": round(elapsed, 2)}
+    after_credit = get_wallet()
+    expected = round(start_balance + ok * CREDIT_AMOUNT, 2)
+    results["checks"]["credit_balance"] = round(after_credit, 2) == expected
+    results["checks"]["credit_ledger"] = count_transactions("deposit") - start_deposits == ok
+    print(f"💳 credit: {ok} ok, {refused} refused, {errors} errors in {elapsed:.2f}s; "
+          f"balance {after_credit:.2f} (expected {expected:.2f})")
+
+    # Phase 2: concurrent instant cashouts racing for the same balance
+    ok, refused, errors, elapsed = fire(
+        "/wallet/cashout/instant",
+        {"amount": CASHOUT_AMOUNT, "method": "bank_transfer", "method_details": {"bank_name": "Stress", "account_last4": "0000"}},
+        CASHOUT_REQUESTS
+    )
+    results["cashout"] = {"succeeded": ok, "refused": refused, "errors": errors, "seconds": round(elapsed, 2)}
+    final_balance = get_wallet()
+    expected = round(after_credit - ok * CASHOUT_AMOUNT, 2)
+    results["checks"]["cashout_balance"] = round(final_balance, 2) == expected
+    results["checks"]["cashout_ledger"] = count_transactions("cashout") - start_cashouts == ok
+    results["checks"]["never_negative"] = final_balance >= 0
+    print(f"💸 cashout: {ok} ok, {refused} refused, {errors} errors in {elapsed:.2f}s; "
+          f"balance {final_balance:.2f} (expected {expected:.2f})")
+
+    for name, passed in results["checks"].items():
+        print(f"{'✅' if passed else '❌'} {name}")
+
+    with open("wallet_stress_test_results.json", "w") as f:
+        json.dump(results, f, indent=2)
+
+    return all(results["checks"].values())
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -41,7 +41,7 @@ class WalletTester:
         
         # Test 1: GET /api/wallet/ - Get or create wallet for demo user
         try:
-            response = requests.get(f"{BASE_URL}/wallet/")
+            response = requests.get(f"{BASE_URL}/wallet/?include_history=true")
             
             if response.status_code == 200:
                 data = response.json()